@@ -0,0 +1,63 @@
+# Benchmark: NumPy diff engine vs the original pandas groupby/merge path.
+# Runs offline on synthetic lines frames shaped like fetch_so_lines() output.
+#
+#   python bench/bench_diff_engine.py --lines 1000000 --items 50000 --repeat 3
+
+import argparse, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import pandas as pd
+
+import so_bomdiff_application as core
+
+def synth_lines(n_lines: int, n_items: int, n_sos: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    item_ids = rng.integers(1, n_items + 1, size=n_lines)
+    qty = rng.integers(1, 20, size=n_lines).astype("float64")
+    qty[rng.random(n_lines) < 0.02] *= -1          # a few reversal lines
+    df = pd.DataFrame({
+        "so_id": rng.integers(100000, 100000 + n_sos, size=n_lines),
+        "item_id": item_ids,
+        "item_name": pd.Series([f"ITEM-{i:06d}" for i in range(n_items + 1)], dtype=object).to_numpy()[item_ids],
+        "line_qty": qty,
+    })
+    return core._normalize_lines(df)
+
+def best_of(fn, repeat: int) -> tuple[float, pd.DataFrame]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--lines", type=int, default=1_000_000, help="lines per group")
+    ap.add_argument("--items", type=int, default=50_000, help="distinct items")
+    ap.add_argument("--sos", type=int, default=5_000, help="distinct SOs per group")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    a = synth_lines(args.lines, args.items, args.sos, seed=1)
+    b = synth_lines(args.lines, args.items, args.sos, seed=2)
+    print(f"Group A: {len(a):,} lines, Group B: {len(b):,} lines, {args.items:,} items")
+
+    t_pd, out_pd = best_of(lambda: core.diff_lines(a, b, engine="pandas"), args.repeat)
+    t_np, out_np = best_of(lambda: core.diff_lines(a, b, engine="numpy"), args.repeat)
+
+    same = (
+        out_pd.shape == out_np.shape
+        and (out_pd["item_id"].astype("int64").to_numpy() == out_np["item_id"].astype("int64").to_numpy()).all()
+        and all(np.allclose(out_pd[c].to_numpy(dtype="float64"), out_np[c].to_numpy(dtype="float64"))
+                for c in ("qty_A","qty_B","diff_A_minus_B"))
+    )
+    print(f"pandas: {t_pd * 1000:8.1f} ms")
+    print(f"numpy : {t_np * 1000:8.1f} ms   ({t_pd / t_np:.1f}x)")
+    print(f"identical output: {same} ({len(out_np):,} rows)")
+    return 0 if same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
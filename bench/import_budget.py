@@ -0,0 +1,67 @@
+# Import-time budget for the GUI entry point, from `python -X importtime`.
+# Fails (exit 1) when importing the module takes longer than the budget, or when it
+# pulls in heavy modules that should only load on the background thread.
+#
+#   python bench/import_budget.py                       # GUI entry point, default budget
+#   python bench/import_budget.py --budget-ms 150 --top 15
+#   python bench/import_budget.py --module so_bomdiff_application --no-forbid   # what the preload pays
+
+import argparse, os, re, subprocess, sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Loaded lazily by the GUI (preload thread); importing them up front delays the window
+FORBIDDEN = ("numpy", "pandas", "requests", "requests_oauthlib", "so_bomdiff_application")
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+def import_times(module: str) -> list[tuple[str, int, int, int]]:
+    """(name, self_us, cumulative_us, depth) per imported module, in import order."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"Importing {module} failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = LINE.match(line)
+        if m:
+            self_us, cum_us, indent, name = m.groups()
+            rows.append((name, int(self_us), int(cum_us), (len(indent) - 1) // 2))
+    return rows
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Import-time budget check")
+    ap.add_argument("--module", default="bomdiff_application_gui")
+    ap.add_argument("--budget-ms", type=float, default=150.0)
+    ap.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    ap.add_argument("--no-forbid", action="store_true", help="skip the heavy-module check")
+    args = ap.parse_args(argv)
+
+    rows = import_times(args.module)
+    top_level = [r for r in rows if r[3] == 0]
+    total_ms = sum(r[2] for r in top_level) / 1000
+    own = next((r for r in rows if r[0] == args.module), None)
+
+    print(f"{args.module}: {total_ms:.1f} ms total imports "
+          f"({own[2] / 1000:.1f} ms for the module itself)" if own else f"{args.module}: {total_ms:.1f} ms")
+    for name, _, cum, _ in sorted(top_level, key=lambda r: -r[2])[:args.top]:
+        print(f"  {cum / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if not args.no_forbid:
+        loaded = {r[0].split(".")[0] for r in rows} | {r[0] for r in rows}
+        heavy = [m for m in FORBIDDEN if m in loaded]
+        if heavy:
+            print("FAIL: heavy modules imported at startup:", ", ".join(heavy))
+            failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    if not failed:
+        print(f"OK: within the {args.budget_ms:.0f} ms budget")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+# Local HTTP stand-in for the NetSuite endpoints this tool calls:
+#   POST /services/rest/query/v1/suiteql            (limit/offset paging)
+#   GET  /services/rest/record/v1/salesorder/{id}   (expandSubResources / fields)
+#   GET  /services/rest/record/v1/salesorder/{id}/item   (item sublist: fields, limit/offset paging)
+# It answers the SuiteQL statement shapes issued by so_bomdiff_application (including the
+# itemmember lookups of BOM explosion and the item master sync) from a SyntheticAccount, and can inject latency,
+# throttling (429), transient 503s, an account concurrency limit, IN-list limits and
+# per-table access denials.
+# Unknown statements get a 400 so new query shapes fail loudly in benchmarks.
+
+import datetime as dt, json, random, re, threading, time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+SUITEQL_PATH = "/services/rest/query/v1/suiteql"
+RECORD_PREFIX = "/services/rest/record/v1/"
+# Lines per sublist page when the caller asks for more (or sets no limit)
+SUBLIST_PAGE_MAX = 1000
+
+def _ids_in(text: str) -> list[int]:
+    m = re.search(r"IN \(([\d,\s]+)\)", text)
+    return [int(x) for x in m.group(1).split(",") if x.strip()] if m else []
+
+def _suiteql_ts(d) -> str:
+    return d.strftime("%Y-%m-%d %H:%M:%S")
+
+def _rest_ts(d) -> str:
+    return d.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _num(v: float) -> str:
+    # SuiteQL returns numbers as strings; whole numbers without a decimal part
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+class StandInServer:
+    def __init__(self, account, *, host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0, jitter: float = 0.0,
+                 throttle_rate: float = 0.0, error_rate: float = 0.0,
+                 max_concurrency: int | None = None, max_in_list: int = 1000,
+                 denied_tables: tuple[str, ...] = (), seed: int = 0):
+        self.account = account
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.max_concurrency = max_concurrency
+        self.max_in_list = max_in_list
+        self.denied_tables = {t.lower() for t in denied_tables}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.stats = {"requests": 0, "suiteql": 0, "record": 0, "throttled": 0,
+                      "errors": 0, "bytes_out": 0, "peak_in_flight": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            for k in self.stats:
+                self.stats[k] = 0
+
+    # --- SuiteQL statement shapes ---
+    def _suiteql_rows(self, sql: str) -> list[dict]:
+        acct = self.account
+        q = " ".join(sql.split())
+        tables = set(re.findall(r'(?:FROM|JOIN) "?(\w+)"?', q, flags=re.I))
+        denied = {t.lower() for t in tables} & self.denied_tables
+        if denied:
+            raise _SuiteQLError(f"Record '{sorted(denied)[0]}' was not found.")
+        in_lists = re.findall(r"IN \(([\d,\s]+)\)", q)
+        if any(len(lst.split(",")) > self.max_in_list for lst in in_lists):
+            raise _SuiteQLError("Search error occurred: IN list too long.")
+
+        if re.match(r'SELECT 1 (AS ok|FROM)', q):
+            return [{"ok": "1"}] if "AS ok" in q else [{"expr1": "1"}]
+
+        if "lastmodifieddate" in q and 'FROM "transaction"' in q:
+            header = "tranid" in q[:q.index(" FROM ")]
+            return [{"id": str(i), **({"tranid": acct.orders[i]["tranid"], "type": "SalesOrd"} if header else {}),
+                     "last_modified": _suiteql_ts(acct.orders[i]["lastmodified"])}
+                    for i in _ids_in(q) if acct.has_so(i)]
+
+        if q.startswith('SELECT id, tranid, "type" FROM "transaction"'):
+            return [{"id": str(i), "tranid": acct.orders[i]["tranid"], "type": "SalesOrd"}
+                    for i in _ids_in(q) if acct.has_so(i)]
+
+        if 'FROM "itemmember"' in q:
+            return [{"parent_id": str(parent), "item_id": str(child), "qty": _num(qty)}
+                    for parent in dict.fromkeys(_ids_in(q)) for child, qty in acct.members.get(parent, [])]
+
+        if 'FROM "item"' in q:
+            items = acct.items.values()
+            if "WHERE id IN" in q:
+                wanted = set(_ids_in(q))
+                items = [it for it in items if it["id"] in wanted]
+            m = re.search(r"lastmodifieddate >= TO_DATE\('([\d\- :]+)'", q)
+            if m:
+                since = dt.datetime.fromisoformat(m.group(1))
+                items = [it for it in items if it["lastmodified"] >= since]
+            return [{"id": str(it["id"]), "itemid": it["itemid"], "displayname": f"Part {it['itemid']}",
+                     "itemtype": it["itemtype"], "last_modified": _suiteql_ts(it["lastmodified"])}
+                    for it in sorted(items, key=lambda it: it["id"])]
+
+        if q.startswith('SELECT t.id FROM "transaction" t'):
+            match = self._criteria(q)
+            return [{"id": str(so)} for so in sorted(acct.orders) if match(acct.orders[so])]
+
+        if 'FROM "transactionline" tl JOIN "transaction" t' in q and "tl.transaction IN (" not in q:
+            match = self._criteria(q)
+            return [{"so_id": str(so), "item_id": None if ln["item_id"] is None else str(ln["item_id"]),
+                     "line_qty": _num(ln["quantity"])}
+                    for so in sorted(acct.orders) if match(acct.orders[so]) for ln in acct.lines_for(so)]
+
+        if 'FROM "transactionline"' in q and "GROUP BY" in q:
+            return self._pushdown_rows(q)
+
+        if 'FROM "transactionline"' in q:
+            rows = []
+            for so in dict.fromkeys(_ids_in(q[q.index("WHERE"):])):
+                if "t.\"type\" = 'SalesOrd'" in q and acct.orders.get(so, {}).get("type") != "SalesOrd":
+                    continue
+                for ln in acct.lines_for(so):
+                    if "quantity < 0" in q and not ln["quantity"] < 0:
+                        continue
+                    rows.append({
+                        "so_id": str(so),
+                        "item_id": None if ln["item_id"] is None else str(ln["item_id"]),
+                        "line_qty": _num(ln["quantity"]),
+                    })
+            return rows
+
+        raise _SuiteQLError("Unsupported query in stand-in: " + q[:200])
+
+    @staticmethod
+    def _criteria(q: str):
+        """Order predicate for the GroupCriteria conditions on the transaction header `t`."""
+        tests = []
+        for op, day in re.findall(r"t\.trandate (>=|<=) TO_DATE\('(\d{4}-\d\d-\d\d)'", q):
+            bound = dt.datetime.fromisoformat(day)
+            tests.append((lambda o, b=bound: o["trandate"] >= b) if op == ">=" else
+                         (lambda o, b=bound: o["trandate"] <= b))
+        m = re.search(r"t\.entity IN \(([\d,\s]+)\)", q)
+        if m:
+            tests.append(lambda o, ids=set(_ids_in(m.group(0))): o["entity"] in ids)
+        m = re.search(r"ml\.subsidiary IN \(([\d,\s]+)\)", q)
+        if m:
+            tests.append(lambda o, ids=set(_ids_in(m.group(0))): o["subsidiary"] in ids)
+        m = re.search(r"t\.status IN \(([^)]*)\)", q)
+        if m:
+            tests.append(lambda o, codes=set(re.findall(r"'([^']*)'", m.group(1))): o["status"] in codes)
+        m = re.search(r"t\.tranid LIKE '((?:[^']|'')*)'", q)
+        if m:
+            pattern = re.compile("".join(".*" if c == "%" else "." if c == "_" else re.escape(c)
+                                         for c in m.group(1).replace("''", "'")), re.I)
+            tests.append(lambda o: pattern.fullmatch(o["tranid"]) is not None)
+        return lambda order: all(t(order) for t in tests)
+
+    def _pushdown_rows(self, q: str) -> list[dict]:
+        select = q[:q.index(" FROM ")]
+        def group(alias: str, text: str) -> tuple[set[int], bool]:
+            # Each group column is either "0" or SUM(CASE WHEN tl.transaction IN (...) THEN ... END)
+            m = re.search(r"(SUM\(CASE WHEN tl\.transaction IN \([\d,\s]+\) THEN .*?END\)|\b0)\s+AS " + alias, text)
+            expr = m.group(1)
+            return set(_ids_in(expr)), "ABS(" in expr
+        ids_a, abs_a = group("qty_a", select)
+        ids_b, abs_b = group("qty_b", select[select.index("AS qty_a"):])
+        absolute = abs_a or abs_b
+        totals: dict[int | None, list[float]] = {}
+        for so in dict.fromkeys(_ids_in(q[q.index("WHERE"):])):
+            for ln in self.account.lines_for(so):
+                qty = abs(ln["quantity"]) if absolute else ln["quantity"]
+                t = totals.setdefault(ln["item_id"], [0.0, 0.0])
+                if so in ids_a:
+                    t[0] += qty
+                if so in ids_b:
+                    t[1] += qty
+        having = "HAVING" in q
+        return [{"item_id": None if iid is None else str(iid), "qty_a": _num(a), "qty_b": _num(b)}
+                for iid, (a, b) in totals.items() if not having or a != b]
+
+    # --- REST Records ---
+    def _item_lines(self, so_id: int) -> list[dict]:
+        acct = self.account
+        so = acct.orders[so_id]
+        return [{
+            "links": [],
+            "line": k + 1,
+            "item": None if ln["item_id"] is None else {"id": str(ln["item_id"]), "refName": ln["item_name"]},
+            "quantity": ln["quantity"],
+            "isClosed": ln["is_closed"],
+            "description": f"Line {k + 1} of {so['tranid']}",
+            "rate": 12.5,
+            "amount": 12.5 * ln["quantity"],
+            "customFieldList": {f"custcol_{n}": "x" * 16 for n in range(8)},
+        } for k, ln in enumerate(acct.lines_for(so_id))]
+
+    def _salesorder(self, so_id: int, params: dict) -> dict | None:
+        acct = self.account
+        if not acct.has_so(so_id):
+            return None
+        so = acct.orders[so_id]
+        fields = params.get("fields", [None])[0]
+        if fields:
+            wanted = set(fields.split(","))
+            full = {"id": str(so_id), "tranId": so["tranid"], "lastModifiedDate": _rest_ts(so["lastmodified"])}
+            return {k: v for k, v in full.items() if k in wanted}
+        lines = self._item_lines(so_id)
+        return {
+            "links": [{"rel": "self", "href": f"{self.url}{RECORD_PREFIX}salesorder/{so_id}"}],
+            "id": str(so_id),
+            "tranId": so["tranid"],
+            "tranDate": so["trandate"].strftime("%Y-%m-%d"),
+            "lastModifiedDate": _rest_ts(so["lastmodified"]),
+            "entity": {"id": str(so["entity"]), "refName": f"Customer {so['entity']}"},
+            "subsidiary": {"id": str(so["subsidiary"])},
+            "billingAddress": {"addr1": "1 Main St", "city": "Springfield", "zip": "00000"},
+            "shippingAddress": {"addr1": "1 Main St", "city": "Springfield", "zip": "00000"},
+            "customFieldList": {f"custbody_{n}": "y" * 32 for n in range(20)},
+            "item": {"links": [], "count": len(lines), "hasMore": False, "offset": 0,
+                     "totalResults": len(lines), "items": lines},
+        }
+
+    def _item_sublist(self, so_id: int, params: dict) -> dict | None:
+        if not self.account.has_so(so_id):
+            return None
+        lines = self._item_lines(so_id)
+        limit = min(SUBLIST_PAGE_MAX, int(params.get("limit", [SUBLIST_PAGE_MAX])[0]))
+        offset = int(params.get("offset", ["0"])[0])
+        page = lines[offset:offset + limit]
+        if params.get("expandSubResources", ["false"])[0] != "true":
+            # Unexpanded sublists only link to their lines
+            page = [{"links": ln["links"]} for ln in page]
+        elif params.get("fields"):
+            wanted = set(params["fields"][0].split(","))
+            page = [{k: v for k, v in ln.items() if k in wanted} for ln in page]
+        has_more = offset + limit < len(lines)
+        links = []
+        if has_more:
+            query = {k: v[0] for k, v in params.items()}
+            query.update(limit=str(limit), offset=str(offset + limit))
+            href = f"{self.url}{RECORD_PREFIX}salesorder/{so_id}/item?" + "&".join(f"{k}={v}" for k, v in query.items())
+            links.append({"rel": "next", "href": href})
+        return {"links": links, "count": len(page), "hasMore": has_more, "offset": offset,
+                "totalResults": len(lines), "items": page}
+
+    # --- HTTP plumbing ---
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, obj=None, headers: dict | None = None):
+                body = json.dumps(obj).encode() if obj is not None else b""
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(body)
+                with server._lock:
+                    server.stats["bytes_out"] += len(body)
+
+            def _enter(self) -> bool:
+                """Apply latency and fault injection; False if the request was rejected."""
+                with server._lock:
+                    server.stats["requests"] += 1
+                    server._in_flight += 1
+                    server.stats["peak_in_flight"] = max(server.stats["peak_in_flight"], server._in_flight)
+                    over_limit = server.max_concurrency is not None and server._in_flight > server.max_concurrency
+                    roll = server._rng.random()
+                    delay = server.latency + (server._rng.random() * server.jitter if server.jitter else 0)
+                if delay:
+                    time.sleep(delay)
+                if over_limit or roll < server.throttle_rate:
+                    with server._lock:
+                        server.stats["throttled"] += 1
+                    self._send(429, {"title": "Too Many Requests",
+                                     "o:errorDetails": [{"errorCode": "CONCURRENCY_LIMIT_EXCEEDED"}]},
+                               headers={"Retry-After": "0.2"})
+                    return False
+                if roll < server.throttle_rate + server.error_rate:
+                    with server._lock:
+                        server.stats["errors"] += 1
+                    self._send(503, {"title": "Service Unavailable"})
+                    return False
+                return True
+
+            def _leave(self):
+                with server._lock:
+                    server._in_flight -= 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                try:
+                    if not self._enter():
+                        return
+                    url = urlparse(self.path)
+                    if url.path != SUITEQL_PATH:
+                        return self._send(404, {"title": "Not Found"})
+                    with server._lock:
+                        server.stats["suiteql"] += 1
+                    qs = parse_qs(url.query)
+                    limit = min(1000, int(qs.get("limit", ["1000"])[0]))
+                    offset = int(qs.get("offset", ["0"])[0])
+                    try:
+                        rows = server._suiteql_rows(json.loads(body)["q"])
+                    except _SuiteQLError as e:
+                        return self._send(400, {"title": "Bad Request", "o:errorDetails": [{"detail": str(e)}]})
+                    page = [dict(r, links=[]) for r in rows[offset:offset + limit]]
+                    self._send(200, {
+                        "links": [], "count": len(page), "offset": offset, "totalResults": len(rows),
+                        "hasMore": offset + limit < len(rows), "items": page,
+                    })
+                finally:
+                    self._leave()
+
+            def do_GET(self):
+                try:
+                    if not self._enter():
+                        return
+                    url = urlparse(self.path)
+                    m = re.fullmatch(re.escape(RECORD_PREFIX) + r"salesorder/(\d+)(/item)?", url.path)
+                    if not m:
+                        return self._send(404, {"title": "Not Found"})
+                    with server._lock:
+                        server.stats["record"] += 1
+                    fetch = server._item_sublist if m.group(2) else server._salesorder
+                    rec = fetch(int(m.group(1)), parse_qs(url.query))
+                    if rec is None:
+                        return self._send(404, {"title": "Record not found"})
+                    self._send(200, rec)
+                finally:
+                    self._leave()
+
+        return Handler
+
+class _SuiteQLError(Exception):
+    pass
@@ -0,0 +1,144 @@
+# End-to-end offline benchmark: run_diff against the local NetSuite stand-in.
+# Times each scenario (backend x cold/warm cache, plus a repeat served by the in-process
+# result memo) end to end and per phase, and reports the request count, bytes served and throttling seen by the stand-in.
+#
+#   python bench/run_bench.py --sos 2000 --group-size 400 --latency 0.05
+#   python bench/run_bench.py --throttle-rate 0.1 --max-concurrency 5 --json bench_output.json
+
+import argparse, contextlib, io, json, os, sys, tempfile, time
+from collections import defaultdict
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+sys.path.insert(0, HERE)
+
+# Keep benchmark caches away from the user's real cache
+os.environ.setdefault("BOMDIFF_CACHE_DIR", tempfile.mkdtemp(prefix="bomdiff-bench-"))
+
+import so_bomdiff_application as core
+from bomdiff_metrics import METRICS
+from ns_standin import StandInServer
+from synth import SyntheticAccount
+
+# Functions timed as phases (looked up on the core module at call time by run_diff)
+PHASES = (
+    "probe_backend", "verify_so_ids", "verify_so_ids_rest", "so_last_modified",
+    "fetch_so_data", "fetch_so_lines", "fetch_salesorders_rest", "compare_groups_a_minus_b_pushdown",
+    "diff_lines", "write_outputs",
+)
+
+class PhaseTimer:
+    """Wraps core functions so each call's wall time is accumulated under its name."""
+
+    def __init__(self, module, names):
+        self.module = module
+        self.names = [n for n in names if hasattr(module, n)]
+        self.totals = defaultdict(float)
+        self._orig = {}
+
+    def __enter__(self):
+        for name in self.names:
+            fn = self._orig[name] = getattr(self.module, name)
+            setattr(self.module, name, self._wrap(name, fn))
+        return self
+
+    def __exit__(self, *exc):
+        for name, fn in self._orig.items():
+            setattr(self.module, name, fn)
+
+    def _wrap(self, name, fn):
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.totals[name] += time.perf_counter() - t0
+        return timed
+
+def point_core_at(server: StandInServer) -> None:
+    """Aim the core module's shared client at the stand-in with dummy credentials."""
+    core.REALM, core.DOMAIN = "BENCH_SB1", server.url
+    core.CK, core.CS, core.TID, core.TS = "bench-ck", "bench-cs", "bench-tid", "bench-ts"
+    if core._client is not None:
+        core._client.close()
+    core._client = None
+
+def run_scenario(name: str, server: StandInServer, group_a, group_b, out_dir: str, *,
+                 keep_memo: bool = False, **run_kwargs) -> dict:
+    server.reset_stats()
+    # A fresh client also drops the in-flight request table (SingleFlight)
+    point_core_at(server)
+    if not keep_memo:
+        # Otherwise a warm run returns the previous scenario's result without fetching
+        core._result_memo.clear()
+    METRICS.reset()
+    csv_path = os.path.join(out_dir, f"{name}.csv")
+    with PhaseTimer(core, PHASES) as timer, contextlib.redirect_stdout(io.StringIO()):
+        t0 = time.perf_counter()
+        result = core.run_diff(group_a, group_b, csv_path, **run_kwargs)
+        wall = time.perf_counter() - t0
+    return {
+        "scenario": name,
+        "wall_s": round(wall, 4),
+        "rows": int(len(result)),
+        "phases_s": {k: round(v, 4) for k, v in timer.totals.items() if v},
+        "server": dict(server.stats),
+        "client": dict(core.get_client().governor.stats),
+        "latency_ms": METRICS.summary()["requests"]["latency_ms"],
+        "cache": METRICS.summary()["cache"],
+    }
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline end-to-end benchmark for run_diff")
+    ap.add_argument("--sos", type=int, default=2000, help="Sales Orders in the synthetic account")
+    ap.add_argument("--lines-per-so", type=int, default=25)
+    ap.add_argument("--items", type=int, default=5000)
+    ap.add_argument("--group-size", type=int, default=400, help="SOs per group")
+    ap.add_argument("--overlap", type=int, default=50, help="SOs shared by both groups")
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds added to every request")
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 503")
+    ap.add_argument("--max-concurrency", type=int, default=None, help="stand-in account concurrency limit")
+    ap.add_argument("--backends", nargs="+", default=["suiteql", "rest"], choices=["suiteql", "pushdown", "rest"])
+    ap.add_argument("--json", help="also write the results to this JSON file")
+    args = ap.parse_args(argv)
+
+    account = SyntheticAccount(args.sos, args.lines_per_so, args.items)
+    group_a, group_b = account.pick_groups(args.group_size, args.group_size, overlap=args.overlap)
+    print(f"Account: {args.sos:,} SOs, {account.n_lines:,} lines, {args.items:,} items; "
+          f"groups of {args.group_size} SOs ({args.overlap} shared)")
+
+    results = []
+    out_dir = tempfile.mkdtemp(prefix="bomdiff-bench-out-")
+    for backend in args.backends:
+        server = StandInServer(
+            account, latency=args.latency, jitter=args.jitter,
+            throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+            max_concurrency=args.max_concurrency,
+            # A REST-only role: SuiteQL cannot see the line table
+            denied_tables=("transactionline",) if backend == "rest" else (),
+        ).start()
+        try:
+            opts = {"pushdown": backend == "pushdown"}
+            results.append(run_scenario(f"{backend}-cold", server, group_a, group_b, out_dir,
+                                        refresh=True, reprobe=True, **opts))
+            results.append(run_scenario(f"{backend}-warm", server, group_a, group_b, out_dir, **opts))
+            results.append(run_scenario(f"{backend}-memo-warm", server, group_a, group_b, out_dir,
+                                        keep_memo=True, **opts))
+        finally:
+            server.stop()
+
+    print(f"\n{'scenario':<19}{'wall s':>9}{'rows':>7}{'reqs':>7}{'429s':>6}{'KB out':>10}   phases (s)")
+    for r in results:
+        phases = ", ".join(f"{k}={v:.3f}" for k, v in sorted(r["phases_s"].items(), key=lambda kv: -kv[1]))
+        print(f"{r['scenario']:<19}{r['wall_s']:>9.3f}{r['rows']:>7}{r['server']['requests']:>7}"
+              f"{r['server']['throttled']:>6}{r['server']['bytes_out'] / 1024:>10.0f}   {phases}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"args": vars(args), "results": results}, fh, indent=2)
+        print("\nWrote", os.path.abspath(args.json))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+# Synthetic NetSuite data for offline benchmarks: items, Sales Orders and their lines.
+# Item popularity is Zipf-like (a few parts appear on most orders), a small share of
+# lines are negative reversals or closed, and some lines carry no item at all.
+# Assembly items have member lists (item -> components) that nest several levels deep.
+
+import datetime as dt
+
+import numpy as np
+
+class SyntheticAccount:
+    def __init__(self, n_sos: int = 1000, lines_per_so: int = 25, n_items: int = 5000, *,
+                 first_so_id: int = 600000, first_item_id: int = 1000, seed: int = 7,
+                 negative_share: float = 0.02, closed_share: float = 0.03, no_item_share: float = 0.01):
+        rng = np.random.default_rng(seed)
+        self.seed = seed
+
+        # --- items ---
+        self.item_ids = np.arange(first_item_id, first_item_id + n_items, dtype=np.int64)
+        prefixes = np.array(["100ACR", "100BLO", "100DUC", "100ENC", "200CAB", "300PNL", "400KIT"])
+        self.items: dict[int, dict] = {}
+        base = dt.datetime(2023, 1, 1)
+        for k, iid in enumerate(self.item_ids):
+            self.items[int(iid)] = {
+                "id": int(iid),
+                "itemid": f"{prefixes[k % len(prefixes)]}-{int(iid):05d}",
+                "itemtype": "Assembly" if k % 17 == 0 else "InvtPart",
+                "lastmodified": base + dt.timedelta(hours=int(rng.integers(0, 24 * 365))),
+            }
+
+        # --- assembly members: children always have a higher index, so the BOM graph is acyclic ---
+        self.members: dict[int, list[tuple[int, float]]] = {}
+        for k, iid in enumerate(self.item_ids):
+            if self.items[int(iid)]["itemtype"] != "Assembly" or k + 1 >= n_items:
+                continue
+            pool = np.arange(k + 1, min(n_items, k + 60))
+            children = rng.choice(pool, size=min(int(rng.integers(2, 7)), len(pool)), replace=False)
+            self.members[int(iid)] = [(int(self.item_ids[c]), float(rng.integers(1, 5))) for c in children]
+
+        # --- sales orders ---
+        self.so_ids = np.arange(first_so_id, first_so_id + n_sos, dtype=np.int64)
+        self.orders: dict[int, dict] = {}
+        for k, so in enumerate(self.so_ids):
+            trandate = base + dt.timedelta(days=int(rng.integers(0, 600)))
+            self.orders[int(so)] = {
+                "id": int(so),
+                "tranid": f"SO{int(so)}",
+                "type": "SalesOrd",
+                "trandate": trandate,
+                "entity": int(rng.integers(5000, 5200)),
+                "subsidiary": int(rng.integers(1, 4)),
+                "status": str(rng.choice(["B", "D", "F", "G", "H"])),
+                "lastmodified": trandate + dt.timedelta(hours=int(rng.integers(1, 24 * 90))),
+            }
+
+        # --- lines (columnar) ---
+        counts = np.maximum(1, rng.poisson(lines_per_so, size=n_sos))
+        n_lines = int(counts.sum())
+        weights = 1.0 / np.arange(1, n_items + 1) ** 1.1
+        weights /= weights.sum()
+        self.line_so = np.repeat(self.so_ids, counts)
+        self.line_item = self.item_ids[rng.choice(n_items, size=n_lines, p=weights)]
+        self.line_qty = rng.integers(1, 12, size=n_lines).astype(np.float64)
+        self.line_qty[rng.random(n_lines) < negative_share] *= -1
+        self.line_closed = rng.random(n_lines) < closed_share
+        self.line_has_item = rng.random(n_lines) >= no_item_share
+        # Line index ranges per SO (lines are grouped by SO)
+        ends = np.cumsum(counts)
+        self._so_range = {int(so): (int(e - c), int(e)) for so, c, e in zip(self.so_ids, counts, ends)}
+
+    @property
+    def n_lines(self) -> int:
+        return len(self.line_so)
+
+    def has_so(self, so_id: int) -> bool:
+        return int(so_id) in self._so_range
+
+    def lines_for(self, so_id: int) -> list[dict]:
+        """Non-mainline lines of one SO as plain dicts (item_id None for item-less lines)."""
+        if not self.has_so(so_id):
+            return []
+        start, end = self._so_range[int(so_id)]
+        out = []
+        for k in range(start, end):
+            iid = int(self.line_item[k]) if self.line_has_item[k] else None
+            out.append({
+                "so_id": int(so_id),
+                "item_id": iid,
+                "item_name": self.items[iid]["itemid"] if iid is not None else None,
+                "quantity": float(self.line_qty[k]),
+                "is_closed": bool(self.line_closed[k]),
+            })
+        return out
+
+    def touch(self, so_id: int) -> None:
+        """Bump an SO's last-modified time (simulates an edit in NetSuite)."""
+        self.orders[int(so_id)]["lastmodified"] += dt.timedelta(minutes=1)
+
+    def pick_groups(self, size_a: int, size_b: int, *, overlap: int = 0, seed: int = 1):
+        """Two random SO id groups with `overlap` shared orders."""
+        rng = np.random.default_rng(seed)
+        picked = rng.choice(self.so_ids, size=size_a + size_b - overlap, replace=False).tolist()
+        group_a = picked[:size_a]
+        group_b = picked[size_a - overlap:]
+        return group_a, group_b
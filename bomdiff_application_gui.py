@@ -1,13 +1,29 @@
-import os, sys, platform
+import os, sys, platform, queue, threading, time
 from pathlib import Path
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 
 core = None  # deferred import
 DEFAULT_CSV_NAME = "bomdiff_A_minus_B.csv"
 
 APP_VERSION = "v0.1.0"
 
+# Worker -> UI events (the worker thread never touches Tk widgets directly)
+POLL_MS = 100
+_events: "queue.Queue[tuple]" = queue.Queue()
+_cancel_event: threading.Event | None = None
+_worker: threading.Thread | None = None
+_run_state = {"started": 0.0, "phase": "", "done": None, "total": None}
+
+# Kept across runs: editing the ID lists only fetches/applies the SOs that changed
+_session = None
+# Metrics summary of the last finished run (see show_metrics)
+_last_metrics: dict | None = None
+
+# The core (pandas/numpy/requests) is imported on a background thread after the window shows
+_core_lock = threading.Lock()
+_core_error: Exception | None = None
+
 def parse_id_list(text: str) -> list[int]:
     ids: list[int] = []
     for part in text.replace("\n", ",").split(","):
@@ -19,6 +35,11 @@ def parse_id_list(text: str) -> list[int]:
         ids.append(int(part))
     return ids
 
+def parse_group_text(text: str):
+    """A group box holds either SO internal IDs or criteria such as 'date>=2024-01-01 customer=123'."""
+    from bomdiff_criteria import looks_like_criteria, parse_criteria
+    return parse_criteria(text) if looks_like_criteria(text) else parse_id_list(text)
+
 def choose_output_file():
     path = filedialog.asksaveasfilename(
         title="Select CSV output",
@@ -29,23 +50,59 @@ def choose_output_file():
     if path:
         output_var.set(path)
 
-def ensure_core_loaded() -> bool:
-    global core
-    if core is not None:
-        return True
-    try:
-        # Load .env first (optional if you rely on it)
+def ensure_core_loaded(*, show_errors: bool = True) -> bool:
+    """Import the core module once; a caller racing the background preload waits for it."""
+    global core, _core_error
+    with _core_lock:
+        if core is not None:
+            return True
         try:
-            from dotenv import load_dotenv
-            load_dotenv()
-        except ImportError:
-            pass  # fine if not present
-        import so_bomdiff_application as core_mod
-        core = core_mod
-        return True
-    except Exception as e:
-        messagebox.showerror("Import Error", f"Could not load core module:\n{e}")
-        return False
+            # Load .env first (optional if you rely on it)
+            try:
+                from dotenv import load_dotenv
+                load_dotenv()
+            except ImportError:
+                pass  # fine if not present
+            import so_bomdiff_application as core_mod
+            core = core_mod
+            _core_error = None
+            return True
+        except Exception as e:
+            _core_error = e
+            if show_errors:
+                messagebox.showerror("Import Error", f"Could not load core module:\n{e}")
+            return False
+
+def preload_core():
+    """Start importing the core off the Tk thread; the UI picks up its defaults when ready."""
+    def work():
+        if DIAGNOSTICS:
+            run_diagnostics()
+        if not SERVICE_URL:
+            ensure_core_loaded(show_errors=False)
+
+    threading.Thread(target=work, name="bomdiff-preload", daemon=True).start()
+    root.after(POLL_MS, apply_core_defaults)
+
+def apply_core_defaults():
+    if SERVICE_URL:
+        # Thin client: the diff service holds the core, so nothing is imported here
+        run_button.config(state="normal")
+        status_var.set(f"Idle (diff service {SERVICE_URL})")
+        return
+    if core is None and _core_error is None:
+        root.after(POLL_MS, apply_core_defaults)
+        return
+    run_button.config(state="normal")
+    if core is None:
+        status_var.set(f"Core module failed to load: {_core_error}")
+        return
+    # Fill the default IDs only if the user has not started typing
+    for widget, name in ((a_text, "GROUP_A_SO_IDS"), (b_text, "GROUP_B_SO_IDS")):
+        defaults = getattr(core, name, []) or []
+        if defaults and not widget.get("1.0", "end").strip():
+            widget.insert("1.0", ",".join(str(i) for i in defaults))
+    status_var.set("Idle")
 
 def run_clicked():
     try:
@@ -62,21 +119,12 @@ def launch():
     root = tk.Tk()
     root.title("BoM Diff (A - B)")
 
-    defaults_a = defaults_b = []
-    try:
-        if ensure_core_loaded():
-            defaults_a = getattr(core, "GROUP_A_SO_IDS", []) or []
-            defaults_b = getattr(core, "GROUP_B_SO_IDS", []) or []
-    except:
-        pass
-
-    tk.Label(root, text="Group A SO Internal IDs (comma or newline separated):").grid(row=0, column=0, sticky="w", padx=8, pady=(8,2))
+    tk.Label(root, text="Group A SO Internal IDs (comma or newline separated),\n"
+                        "or criteria, e.g. date>=2024-01-01 customer=123 status=B:", justify="left").grid(row=0, column=0, sticky="w", padx=8, pady=(8,2))
     a_text = tk.Text(root, width=55, height=4); a_text.grid(row=1, column=0, padx=8, pady=2)
-    if defaults_a: a_text.insert("1.0", ",".join(str(i) for i in defaults_a))
 
-    tk.Label(root, text="Group B SO Internal IDs:").grid(row=2, column=0, sticky="w", padx=8, pady=(10,2))
+    tk.Label(root, text="Group B SO Internal IDs or criteria:").grid(row=2, column=0, sticky="w", padx=8, pady=(10,2))
     b_text = tk.Text(root, width=55, height=4); b_text.grid(row=3, column=0, padx=8, pady=2)
-    if defaults_b: b_text.insert("1.0", ",".join(str(i) for i in defaults_b))
 
     tk.Label(root, text="Output CSV File:").grid(row=4, column=0, sticky="w", padx=8, pady=(10,2))
     frame = tk.Frame(root); frame.grid(row=5, column=0, padx=8, pady=2, sticky="we")
@@ -85,15 +133,68 @@ def launch():
     tk.Entry(frame, textvariable=output_var, width=42).pack(side="left", fill="x", expand=True)
     tk.Button(frame, text="Browse…", command=choose_output_file).pack(side="left", padx=4)
 
-    tk.Button(root, text="Run Diff", command=run_clicked, width=20).grid(row=6, column=0, pady=12)
+    global explode_var
+    explode_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(root, text="Explode assemblies/kits into components", variable=explode_var,
+                   anchor="w").grid(row=6, column=0, sticky="w", padx=8, pady=(6,0))
+
+    global run_button, cancel_button, metrics_button, progress_bar
+    buttons = tk.Frame(root); buttons.grid(row=7, column=0, pady=12)
+    run_button = tk.Button(buttons, text="Run Diff", command=run_clicked, width=20, state="disabled")
+    run_button.pack(side="left", padx=4)
+    cancel_button = tk.Button(buttons, text="Cancel", command=cancel_clicked, width=10, state="disabled")
+    cancel_button.pack(side="left", padx=4)
+    metrics_button = tk.Button(buttons, text="Metrics…", command=show_metrics, width=10, state="disabled")
+    metrics_button.pack(side="left", padx=4)
+
+    progress_bar = ttk.Progressbar(root, mode="determinate", maximum=1.0)
+    progress_bar.grid(row=8, column=0, sticky="we", padx=8, pady=(0,4))
 
     global status_var
-    status_var = tk.StringVar(value="Idle")
-    tk.Label(root, textvariable=status_var, anchor="w", fg="blue").grid(row=7, column=0, sticky="we", padx=8, pady=(0,8))
+    status_var = tk.StringVar(value="Loading NetSuite libraries…")
+    tk.Label(root, textvariable=status_var, anchor="w", fg="blue").grid(row=9, column=0, sticky="we", padx=8, pady=(0,8))
 
+    root.protocol("WM_DELETE_WINDOW", on_close)
     root.resizable(False, False)
+    preload_core()
     root.mainloop()
 
+def cancel_clicked():
+    if _cancel_event is not None and not _cancel_event.is_set():
+        _cancel_event.set()
+        cancel_button.config(state="disabled")
+        status_var.set("Cancelling… (waiting for in-flight requests)")
+
+def show_metrics():
+    """Panel with the last run's phase timings, request stats and cache hit rates."""
+    from bomdiff_metrics import METRICS
+    if _last_metrics is None:
+        return
+    win = tk.Toplevel(root)
+    win.title("Run metrics")
+    text = tk.Text(win, width=96, height=26, font=("Courier", 9))
+    text.insert("1.0", METRICS.format_summary(_last_metrics))
+    text.config(state="disabled")
+    text.pack(fill="both", expand=True, padx=8, pady=(8,4))
+
+    def save(write, title):
+        path = filedialog.asksaveasfilename(parent=win, title=title, defaultextension=".json",
+                                            filetypes=[("JSON Files","*.json"),("All Files","*.*")])
+        if path:
+            write(path)
+
+    row = tk.Frame(win); row.pack(pady=(0,8))
+    tk.Button(row, text="Save JSON…", command=lambda: save(METRICS.write_json, "Save metrics JSON")).pack(side="left", padx=4)
+    tk.Button(row, text="Save Chrome trace…",
+              command=lambda: save(METRICS.write_chrome_trace, "Save Chrome trace")).pack(side="left", padx=4)
+    tk.Button(row, text="Close", command=win.destroy).pack(side="left", padx=4)
+
+def on_close():
+    # Stop issuing requests before the window goes; the worker is a daemon thread
+    if _cancel_event is not None:
+        _cancel_event.set()
+    root.destroy()
+
 def load_env():
     """
     Load first config file found (priority order):
@@ -136,12 +237,18 @@ load_env()
 print(f"[startup] BomDiff {APP_VERSION} python={platform.python_version()} "
       f"arch={platform.machine()} sys.executable={sys.executable}")
 
-# Quick numpy availability check (helps confirm PyInstaller collected binaries)
-try:
-    import numpy as _np  # noqa
-    print(f"[check] numpy OK version={_np.__version__}")
-except Exception as e:
-    print(f"[check] numpy import failed: {e}")
+# Packaging diagnostics (numpy binary checks) only run with --diag or BOMDIFF_DIAG=1;
+# they import numpy, which would otherwise delay the window on every launch.
+DIAGNOSTICS = "--diag" in sys.argv or (os.getenv("BOMDIFF_DIAG") or "").strip().lower() in ("1", "true", "yes", "on")
+
+def run_diagnostics():
+    # Quick numpy availability check (helps confirm PyInstaller collected binaries)
+    try:
+        import numpy as _np  # noqa
+        print(f"[check] numpy OK version={_np.__version__}")
+    except Exception as e:
+        print(f"[check] numpy import failed: {e}")
+    _diag_numpy()
 
 def _diag_numpy():
     try:
@@ -151,7 +258,6 @@ def _diag_numpy():
         print(f"[check] numpy OK version={_np.__version__} core={p.name}")
     except Exception as e:
         print(f"[check] numpy import FAILED: {e}")
-_diag_numpy()
 
 # Retrieve env vars (keep fallback names if you had older naming)
 ACCOUNT_ID = os.getenv("NS_ACCOUNT_REALM") or os.getenv("NETSUITE_ACCOUNT_ID")
@@ -160,13 +266,15 @@ CONSUMER_KEY = os.getenv("NS_CONSUMER_KEY") or os.getenv("NETSUITE_CONSUMER_KEY"
 CONSUMER_SECRET = os.getenv("NS_CONSUMER_SECRET") or os.getenv("NETSUITE_CONSUMER_SECRET")
 TOKEN_ID = os.getenv("NS_TOKEN_ID") or os.getenv("NETSUITE_TOKEN_ID")
 TOKEN_SECRET = os.getenv("NS_TOKEN_SECRET") or os.getenv("NETSUITE_TOKEN_SECRET")
+# When set, diffs run in a local diff service (see bomdiff_service) instead of this process
+SERVICE_URL = (os.getenv("BOMDIFF_SERVICE_URL") or "").strip()
 
 def perform_diff():
     """
-    Parse inputs, call core diff, write CSV, update status.
+    Parse inputs and start the core diff on a worker thread (see start_worker).
     Tries several possible core function names; adjust once you know the real one.
     """
-    if not ensure_core_loaded():
+    if not SERVICE_URL and not ensure_core_loaded():
         return
     out_path = output_var.get().strip()
     if not out_path:
@@ -174,10 +282,10 @@ def perform_diff():
         return
 
     try:
-        group_a = parse_id_list(a_text.get("1.0", "end"))
-        group_b = parse_id_list(b_text.get("1.0", "end"))
+        group_a = parse_group_text(a_text.get("1.0", "end"))
+        group_b = parse_group_text(b_text.get("1.0", "end"))
     except ValueError as ve:
-        messagebox.showerror("Invalid IDs", str(ve))
+        messagebox.showerror("Invalid IDs or criteria", str(ve))
         return
 
     if not group_a:
@@ -187,34 +295,163 @@ def perform_diff():
         messagebox.showerror("Input Required", "Group B list is empty.")
         return
 
-    status_var.set("Running...")
-    root.update_idletasks()
+    if _worker is not None and _worker.is_alive():
+        return
 
+    # Try to locate a core diff function (adjust to the real one in so_bomdiff_application.py)
+    # The incremental session works on ID lists; criteria groups go through a full run
+    by_ids = isinstance(group_a, list) and isinstance(group_b, list)
+    if SERVICE_URL:
+        fn = run_service_diff
+    else:
+        fn = run_session_diff if by_ids and hasattr(core, "write_outputs") else None
+    for name in ("run_diff", "bomdiff", "perform_diff", "diff_boms", "main"):
+        if fn is None and hasattr(core, name):
+            cand = getattr(core, name)
+            if callable(cand):
+                fn = cand
+                break
+    if fn is None:
+        raise RuntimeError("No diff function found in core module (expected one of run_diff/bomdiff/perform_diff/diff_boms/main).")
+
+    start_worker(fn, group_a, group_b, out_path)
+
+def run_session_diff(group_a: list[int], group_b: list[int], out_path: str, *,
+                     explode: bool = False, progress=None, cancel: threading.Event | None = None):
+    """
+    Incremental run through a DiffSession kept across clicks: SOs edited in NetSuite since
+    they were fetched are dropped first (checked at most once per BOMDIFF_RESULT_TTL_SECONDS,
+    see DiffSession.revalidate), then only SOs that are
+    new to the session are fetched, removed ones are subtracted, and the outputs are
+    rewritten. Changing the explode option starts a fresh session.
+    """
+    global _session
+    from bomdiff_session import DiffSession
+    if _session is None or _session.explode != explode:
+        _session = DiffSession(explode=explode)
+    if progress is not None:
+        progress("Checking for edited Sales Orders")
+    _session.revalidate(group_a + group_b, cancel=cancel)
+    missing = _session.set_groups(group_a, group_b, progress=progress, cancel=cancel)
+    if missing:
+        print("Not found as Sales Orders:", ", ".join(map(str, missing)))
+    result = _session.result()
+    print(f"Rows in A − B with non-zero diff: {len(result)}")
+    if progress is not None:
+        progress("Writing outputs")
+    core.write_outputs(result, out_path, "")
+    return result
+
+def run_service_diff(group_a, group_b, out_path: str, *, explode: bool = False, progress=None):
+    """Run the diff in the diff service at BOMDIFF_SERVICE_URL and write its CSV."""
+    from bomdiff_service import ServiceClient
+    if progress is not None:
+        progress("Computing diff in the diff service")
+    rows = ServiceClient(SERVICE_URL).diff_to_csv(group_a, group_b, out_path, explode=explode)
+    print(f"Rows in A − B with non-zero diff: {rows}")
+    return rows
+
+def run_job(fn, group_a, group_b, out_path: str, kwargs: dict, cancel: threading.Event) -> None:
+    """
+    Worker thread body: always posts exactly one "done", "cancelled" or "error" event.
+    The core reports access/configuration problems as SystemExit, which a thread would
+    otherwise swallow silently (leaving the window stuck on "Running...").
+    """
     try:
-        # Try to locate a core diff function (adjust to the real one in so_bomdiff_application.py)
-        fn = None
-        for name in ("run_diff", "bomdiff", "perform_diff", "diff_boms", "main"):
-            if hasattr(core, name):
-                cand = getattr(core, name)
-                if callable(cand):
-                    fn = cand
-                    break
-        if fn is None:
-            raise RuntimeError("No diff function found in core module (expected one of run_diff/bomdiff/perform_diff/diff_boms/main).")
-
-        # Call the core function.
         # Adapt signature if needed; this assumes (group_a_ids, group_b_ids, output_path)
-        result = fn(group_a, group_b, out_path)
+        result = fn(group_a, group_b, out_path, **kwargs)
+        _events.put(("done", result))
+    except (Exception, SystemExit) as e:
+        if cancel.is_set() or isinstance(e, getattr(core, "Cancelled", ())):
+            _events.put(("cancelled",))
+            return
+        import traceback
+        _events.put(("error", e, traceback.format_exc()))
+
+def start_worker(fn, group_a: list[int], group_b: list[int], out_path: str):
+    """Run the diff on a background thread; progress and the outcome come back through _events."""
+    global _cancel_event, _worker
+    from bomdiff_metrics import METRICS
+    METRICS.reset()
+    _cancel_event = threading.Event()
+    _run_state.update(started=time.monotonic(), phase="Starting", done=None, total=None)
+    kwargs = {}
+    try:
+        import inspect
+        params = inspect.signature(fn).parameters
+        if "progress" in params:
+            kwargs["progress"] = lambda phase, done=None, total=None: _events.put(("progress", phase, done, total))
+        if "cancel" in params:
+            kwargs["cancel"] = _cancel_event
+        if "explode" in params and explode_var.get():
+            kwargs["explode"] = True
+    except (TypeError, ValueError):
+        pass
+
+    run_button.config(state="disabled")
+    metrics_button.config(state="disabled")
+    cancel_button.config(state="normal" if "cancel" in kwargs else "disabled")
+    progress_bar.config(mode="indeterminate")
+    progress_bar.start(15)
+    status_var.set("Running...")
+    _worker = threading.Thread(target=run_job, args=(fn, group_a, group_b, out_path, kwargs, _cancel_event),
+                               name="bomdiff-worker", daemon=True)
+    _worker.start()
+    root.after(POLL_MS, poll_events, out_path)
+
+def _status_text() -> str:
+    elapsed = time.monotonic() - _run_state["started"]
+    text = _run_state["phase"]
+    if _run_state["total"]:
+        text += f": {_run_state['done'] or 0}/{_run_state['total']} SOs"
+    return f"{text} — {elapsed:.0f}s"
+
+def poll_events(out_path: str):
+    """Drain worker events on the Tk thread; reschedules itself until the run finishes."""
+    global _last_metrics
+    finished = None
+    while True:
+        try:
+            event = _events.get_nowait()
+        except queue.Empty:
+            break
+        if event[0] == "progress":
+            _, phase, done, total = event
+            _run_state.update(phase=phase, done=done, total=total)
+            if total:
+                progress_bar.stop()
+                progress_bar.config(mode="determinate", value=(done or 0) / total)
+            else:
+                progress_bar.config(mode="indeterminate")
+                progress_bar.start(15)
+        else:
+            finished = event
 
-        status_var.set(f"Done: {out_path}")
+    if finished is None:
+        if not (_cancel_event and _cancel_event.is_set()):
+            status_var.set(_status_text())
+        root.after(POLL_MS, poll_events, out_path)
+        return
+
+    progress_bar.stop()
+    progress_bar.config(mode="determinate", value=0)
+    run_button.config(state="normal")
+    cancel_button.config(state="disabled")
+    from bomdiff_metrics import METRICS
+    _last_metrics = METRICS.summary()
+    metrics_button.config(state="normal")
+    elapsed = time.monotonic() - _run_state["started"]
+    if finished[0] == "done":
+        progress_bar.config(value=1.0)
+        status_var.set(f"Done in {elapsed:.0f}s: {out_path}")
         messagebox.showinfo("Success", f"Diff written to:\n{out_path}")
-    except Exception as e:
-        import traceback, io
-        buf = io.StringIO()
-        traceback.print_exc(file=buf)
+    elif finished[0] == "cancelled":
+        status_var.set(f"Cancelled after {elapsed:.0f}s (no output written)")
+    else:
+        _, e, tb = finished
         status_var.set("Error")
         messagebox.showerror("Error",
-            f"Diff failed:\n{e}\n\nTraceback (truncated):\n{buf.getvalue()[:1500]}")
+            f"Diff failed:\n{e}\n\nTraceback (truncated):\n{tb[:1500]}")
 
 if __name__ == "__main__":
     launch()
\ No newline at end of file
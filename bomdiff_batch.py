@@ -0,0 +1,223 @@
+# Batch mode: run many A/B diffs from one job file with a single fetch of every distinct SO.
+#   python so_bomdiff.py --batch nightly_jobs.csv
+# Job files:
+#   CSV   columns name, group_a, group_b, output_csv[, output_xlsx]; IDs separated by spaces, ';' or '|'
+#   JSON  a list of job objects with the same keys (IDs as a list or a string), or {"jobs": [...]}
+#   YAML  same shape as JSON (needs PyYAML)
+# Relative output paths are resolved against the job file's folder. Finished jobs are
+# appended to a checkpoint file next to the job file, so an interrupted batch resumes
+# where it stopped.
+
+import csv, hashlib, json, os, re, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+import so_bomdiff_application as core
+from bomdiff_metrics import timed
+
+# Jobs computed and written concurrently once every SO has been fetched
+BATCH_WORKERS = int(os.getenv("BOMDIFF_BATCH_WORKERS") or 4)
+
+@dataclass(frozen=True)
+class BatchJob:
+    name: str
+    group_a: tuple[int, ...]
+    group_b: tuple[int, ...]
+    output_csv: str
+    output_xlsx: str = ""
+
+    @property
+    def so_ids(self) -> tuple[int, ...]:
+        return self.group_a + self.group_b
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the job's inputs, outputs or counting mode change."""
+        key = json.dumps([self.group_a, self.group_b, self.output_csv, self.output_xlsx,
+                          core.COUNT_ABSOLUTE_LINE_QTY])
+        return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+def _parse_ids(value) -> tuple[int, ...]:
+    if value is None:
+        return ()
+    if isinstance(value, int):
+        return (value,)
+    if isinstance(value, (list, tuple)):
+        return tuple(int(v) for v in value)
+    return tuple(int(x) for x in re.findall(r"\d+", str(value)))
+
+def _read_job_file(path: str) -> list[dict]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as fh:
+            return list(csv.DictReader(fh))
+    if ext == ".json":
+        with open(path, encoding="utf-8") as fh:
+            raw = json.load(fh)
+    elif ext in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise SystemExit("YAML job files need PyYAML (pip install pyyaml); or use a CSV/JSON job file.")
+        with open(path, encoding="utf-8") as fh:
+            raw = yaml.safe_load(fh)
+    else:
+        raise SystemExit(f"Unsupported job file {path!r}: use .csv, .json or .yaml")
+    if isinstance(raw, dict):
+        raw = raw.get("jobs") or []
+    return list(raw or [])
+
+def load_jobs(path: str) -> list[BatchJob]:
+    """Read a job file into BatchJob entries (see the module header for the formats)."""
+    base = os.path.dirname(os.path.abspath(path))
+    jobs: list[BatchJob] = []
+    for n, row in enumerate(_read_job_file(path), start=1):
+        row = {str(k).strip().lower(): v for k, v in (row or {}).items() if k}
+        name = str(row.get("name") or f"job{n}").strip()
+        group_a, group_b = _parse_ids(row.get("group_a")), _parse_ids(row.get("group_b"))
+        if not group_a and not group_b:
+            raise SystemExit(f"Job {name!r} in {path} has no SO IDs in group_a or group_b")
+        out_csv = str(row.get("output_csv") or f"{name}.csv").strip()
+        out_xlsx = str(row.get("output_xlsx") or "").strip()
+        jobs.append(BatchJob(
+            name=name, group_a=group_a, group_b=group_b,
+            output_csv=os.path.join(base, out_csv),
+            output_xlsx=os.path.join(base, out_xlsx) if out_xlsx else "",
+        ))
+    names = [j.name for j in jobs]
+    dupes = sorted({n for n in names if names.count(n) > 1})
+    if dupes:
+        raise SystemExit(f"Job names must be unique in {path}; repeated: {', '.join(dupes)}")
+    return jobs
+
+def default_checkpoint_path(job_path: str) -> str:
+    return os.path.abspath(job_path) + ".checkpoint.jsonl"
+
+class Checkpoint:
+    """
+    Append-only record of finished jobs (one JSON line each). A job counts as done
+    when its name and fingerprint match and its CSV output still exists.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._done: dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by an interrupted run
+                    self._done[entry["name"]] = entry["fingerprint"]
+
+    def is_done(self, job: BatchJob) -> bool:
+        return self._done.get(job.name) == job.fingerprint and os.path.exists(job.output_csv)
+
+    def mark_done(self, job: BatchJob, rows: int) -> None:
+        entry = {"name": job.name, "fingerprint": job.fingerprint, "rows": rows,
+                 "output_csv": job.output_csv, "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(entry) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+            self._done[job.name] = job.fingerprint
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._done.clear()
+
+def fetch_plan(jobs: list[BatchJob]) -> list[int]:
+    """Distinct SO IDs across all jobs, in first-seen order: each is fetched exactly once."""
+    return list(dict.fromkeys(int(i) for job in jobs for i in job.so_ids))
+
+def fetch_plan_lines(so_ids: list[int], *, use_cache: bool | None = None, refresh: bool = False,
+                     reprobe: bool = False) -> tuple[pd.DataFrame, set[int]]:
+    """
+    Fetch lines for every planned SO with the backend the probe picks.
+    Returns (lines, found) where found is the set of IDs that exist as Sales Orders.
+    """
+    if core.probe_backend(refresh=reprobe) == "suiteql":
+        data = core.fetch_so_data(so_ids, use_cache=use_cache, refresh=refresh)
+        found, lines = data.found, data.lines
+    else:
+        records = core.fetch_salesorders_rest(so_ids, use_cache=use_cache, refresh=refresh)
+        found = {so for so, data in records.items() if not data.get("_not_found")}
+        lines = core.fetch_so_lines_rest(so_ids, records)
+    return lines, found
+
+class _LineIndex:
+    """Row positions per SO in the shared lines frame, so each job slices without copying the plan."""
+
+    def __init__(self, lines: pd.DataFrame):
+        self.lines = lines
+        self._rows = {int(so): rows for so, rows in lines.groupby("so_id", sort=False).indices.items()}
+
+    def for_sos(self, so_ids) -> pd.DataFrame:
+        parts = [self._rows[i] for i in dict.fromkeys(int(s) for s in so_ids) if i in self._rows]
+        rows = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return self.lines.iloc[rows]
+
+def _run_job(job: BatchJob, index: _LineIndex, found: set[int], checkpoint: Checkpoint) -> dict:
+    result = core.diff_lines(index.for_sos(job.group_a), index.for_sos(job.group_b))
+    for path in (job.output_csv, job.output_xlsx):
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    core.write_outputs(result, job.output_csv, job.output_xlsx)
+    checkpoint.mark_done(job, len(result))
+    missing = [i for i in dict.fromkeys(job.so_ids) if i not in found]
+    return {"name": job.name, "status": "done", "rows": len(result), "missing": missing}
+
+@timed("run")
+def run_batch(job_path: str, *, checkpoint_path: str | None = None, resume: bool = True,
+              workers: int = BATCH_WORKERS, use_cache: bool | None = None,
+              refresh: bool = False, reprobe: bool = False) -> list[dict]:
+    """
+    Run every job in `job_path`: one fetch of the distinct SOs across all pending jobs,
+    then each job's diff computed and written concurrently. Finished jobs are checkpointed;
+    with resume=True (default) jobs already in the checkpoint are skipped.
+    Returns one status dict per job (done / skipped / failed).
+    """
+    jobs = load_jobs(job_path)
+    checkpoint = Checkpoint(checkpoint_path or default_checkpoint_path(job_path))
+    if not resume:
+        checkpoint.clear()
+    pending = [j for j in jobs if not checkpoint.is_done(j)]
+    statuses = {j.name: {"name": j.name, "status": "skipped"} for j in jobs if j not in pending}
+
+    plan = fetch_plan(pending)
+    total_refs = sum(len(j.so_ids) for j in pending)
+    print(f"Batch: {len(jobs)} jobs, {len(statuses)} already done, {len(pending)} to run; "
+          f"{len(plan)} distinct SOs for {total_refs} SO references")
+    if pending:
+        lines, found = fetch_plan_lines(plan, use_cache=use_cache, refresh=refresh, reprobe=reprobe)
+        index = _LineIndex(lines)
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pending)))) as pool:
+            futures = {pool.submit(_run_job, job, index, found, checkpoint): job for job in pending}
+            for fut in as_completed(futures):
+                job = futures[fut]
+                try:
+                    statuses[job.name] = fut.result()
+                except Exception as e:
+                    # One bad job (e.g. an unwritable output path) must not sink the batch
+                    statuses[job.name] = {"name": job.name, "status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+    results = [statuses[j.name] for j in jobs]
+    counts = {s: sum(r["status"] == s for r in results) for s in ("done", "skipped", "failed")}
+    print(f"Batch finished: {counts['done']} done, {counts['skipped']} skipped, {counts['failed']} failed")
+    for r in results:
+        if r["status"] == "failed":
+            print(f"  FAILED {r['name']}: {r['error']}")
+        elif r.get("missing"):
+            print(f"  {r['name']}: {len(r['missing'])} SO IDs not found: {', '.join(map(str, r['missing'][:10]))}")
+    if pending:
+        print("NetSuite:", core.get_client().governor.summary())
+    print("Checkpoint:", checkpoint.path)
+    return results
@@ -0,0 +1,106 @@
+# Multi-level BOM explosion: assembly/kit lines are replaced by their leaf components,
+# with quantities multiplied down the tree. Component lists are looked up one tree level
+# at a time (one batched query per level, never one per item) and memoized per assembly,
+# in memory for the run and in the local cache across runs, so shared subassemblies
+# resolve once.
+
+import pandas as pd
+
+from bomdiff_metrics import METRICS
+
+# Deeper trees than this are treated as a cycle in the item member records
+MAX_BOM_DEPTH = 25
+
+class BOMExploder:
+    """
+    `fetch_members(parent_ids) -> {parent_id: [(child_id, child_name, qty), ...]}` looks up
+    one level of members for many items at once; items it returns nothing for are leaves.
+    `cache` is an optional BOMCache (see bomdiff_cache) keyed by `realm`; refresh=True
+    ignores cached member lists and refetches them.
+    """
+
+    def __init__(self, fetch_members, *, cache=None, realm: str = "", refresh: bool = False,
+                 max_depth: int = MAX_BOM_DEPTH):
+        self.fetch_members = fetch_members
+        self.cache = cache
+        self.realm = realm
+        self.refresh = refresh
+        self.max_depth = max_depth
+        self._members: dict[int, list] = {}
+        self._names: dict[int, str | None] = {}
+        self._leaves: dict[int, dict[int, float]] = {}
+        self.stats = {"levels": 0, "cached": 0, "fetched": 0}
+
+    def load(self, item_ids) -> None:
+        """Resolve member lists for `item_ids` and everything below them, level by level."""
+        frontier = [i for i in dict.fromkeys(int(i) for i in item_ids) if i not in self._members]
+        depth = 0
+        while frontier:
+            if depth > self.max_depth:
+                raise ValueError(f"BOM deeper than {self.max_depth} levels; check the item member "
+                                 f"records for a cycle (e.g. item {frontier[0]})")
+            known = {} if self.refresh or self.cache is None else self.cache.get_many(self.realm, frontier)
+            missing = [i for i in frontier if i not in known]
+            fetched = self.fetch_members(missing) if missing else {}
+            fetched = {i: [list(m) for m in fetched.get(i, [])] for i in missing}
+            if self.cache is not None and fetched:
+                self.cache.put_many(self.realm, fetched)
+            self.stats["levels"] += 1
+            self.stats["cached"] += len(known)
+            self.stats["fetched"] += len(missing)
+            METRICS.cache("bom", hits=len(known), misses=len(missing))
+
+            children = []
+            for parent, members in {**known, **fetched}.items():
+                self._members[parent] = members
+                for child, name, _ in members:
+                    self._names.setdefault(int(child), name)
+                    children.append(int(child))
+            frontier = [c for c in dict.fromkeys(children) if c not in self._members]
+            depth += 1
+
+    def leaves(self, item_id: int, _path: tuple = ()) -> dict[int, float]:
+        """{leaf_item_id: quantity per one unit of item_id}; a leaf maps to itself."""
+        hit = self._leaves.get(item_id)
+        if hit is not None:
+            return hit
+        members = self._members.get(item_id) or []
+        if not members:
+            out = {item_id: 1.0}
+        else:
+            if item_id in _path:
+                raise ValueError(f"BOM cycle through item {item_id}")
+            out: dict[int, float] = {}
+            for child, _, qty in members:
+                per_unit = float(qty or 0)
+                for leaf, factor in self.leaves(int(child), _path + (item_id,)).items():
+                    out[leaf] = out.get(leaf, 0.0) + per_unit * factor
+        self._leaves[item_id] = out
+        return out
+
+    def explode(self, lines: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace assembly/kit lines of a lines frame (so_id, item_id, item_name, line_qty)
+        with one line per leaf component, line_qty multiplied by the per-unit quantity.
+        Lines without an item and leaf items pass through unchanged.
+        """
+        if lines.empty:
+            return lines
+        ids = [int(i) for i in lines["item_id"].dropna().unique()]
+        self.load(ids)
+        rows = [(iid, leaf, self._names.get(leaf), factor)
+                for iid in ids if self._members.get(iid)
+                for leaf, factor in self.leaves(iid).items()]
+        if not rows:
+            return lines
+        table = pd.DataFrame(rows, columns=["item_id", "leaf_id", "leaf_name", "factor"])
+        table["item_id"] = table["item_id"].astype("Int64")
+        is_assembly = lines["item_id"].isin(table["item_id"]).fillna(False).astype(bool)
+        parts = lines[is_assembly].merge(table, on="item_id", how="inner")
+        exploded = pd.DataFrame({
+            "so_id": parts["so_id"].astype("Int64"),
+            "item_id": parts["leaf_id"].astype("Int64"),
+            "item_name": parts["leaf_name"],
+            "line_qty": (parts["line_qty"] * parts["factor"]).astype("float64"),
+        })
+        return pd.concat([lines[~is_assembly], exploded], ignore_index=True)
@@ -0,0 +1,356 @@
+# Local on-disk cache (SQLite) for per-Sales-Order data, assembly member lists, the item
+# master and account capabilities, plus an in-process memo of finished diff results.
+# SO entries are keyed by (realm, kind, so_id) and stamped with the SO's lastModifiedDate,
+# so a run only refetches orders that changed since they were cached.
+
+import json, os, sqlite3, threading, time
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("BOMDIFF_CACHE_DIR") or Path.home() / ".bomdiff")
+CACHE_MAX_AGE_DAYS = float(os.getenv("BOMDIFF_CACHE_MAX_AGE_DAYS") or 30)
+CACHE_MAX_ENTRIES = int(os.getenv("BOMDIFF_CACHE_MAX_ENTRIES") or 20000)
+PROBE_TTL_HOURS = float(os.getenv("BOMDIFF_PROBE_TTL_HOURS") or 12)
+BOM_TTL_HOURS = float(os.getenv("BOMDIFF_BOM_TTL_HOURS") or 24)
+ITEM_SYNC_MINUTES = float(os.getenv("BOMDIFF_ITEM_SYNC_MINUTES") or 15)
+# Finished diff results kept in memory (0 disables) and for how long
+RESULT_MEMO_SIZE = int(os.getenv("BOMDIFF_RESULT_MEMO_SIZE") or 32)
+RESULT_TTL_SECONDS = float(os.getenv("BOMDIFF_RESULT_TTL_SECONDS") or 300)
+
+def default_cache_path() -> Path:
+    return CACHE_DIR / "cache.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS so_cache (
+    realm         TEXT    NOT NULL,
+    kind          TEXT    NOT NULL,
+    so_id         INTEGER NOT NULL,
+    last_modified TEXT    NOT NULL,
+    payload       TEXT    NOT NULL,
+    fetched_at    REAL    NOT NULL,
+    accessed_at   REAL    NOT NULL,
+    PRIMARY KEY (realm, kind, so_id)
+);
+CREATE INDEX IF NOT EXISTS so_cache_accessed ON so_cache (accessed_at);
+CREATE TABLE IF NOT EXISTS capability_cache (
+    realm      TEXT NOT NULL,
+    identity   TEXT NOT NULL,
+    backend    TEXT NOT NULL,
+    detail     TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    PRIMARY KEY (realm, identity)
+);
+CREATE TABLE IF NOT EXISTS bom_cache (
+    realm      TEXT    NOT NULL,
+    item_id    INTEGER NOT NULL,
+    members    TEXT    NOT NULL,
+    fetched_at REAL    NOT NULL,
+    PRIMARY KEY (realm, item_id)
+);
+CREATE TABLE IF NOT EXISTS item_cache (
+    realm         TEXT    NOT NULL,
+    item_id       INTEGER NOT NULL,
+    itemid        TEXT,
+    displayname   TEXT,
+    itemtype      TEXT,
+    last_modified TEXT,
+    PRIMARY KEY (realm, item_id)
+);
+CREATE TABLE IF NOT EXISTS item_sync (
+    realm          TEXT PRIMARY KEY,
+    synced_through TEXT NOT NULL,
+    synced_at      REAL NOT NULL
+);
+"""
+
+class SOCache:
+    """
+    Per-SO payload cache. `kind` separates payload shapes (e.g. SuiteQL line rows vs
+    slim REST records). Eviction drops entries older than `max_age_days` and then the
+    least recently used entries beyond `max_entries`.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None, *,
+                 max_age_days: float = CACHE_MAX_AGE_DAYS,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = Path(path) if path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age_days = max_age_days
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self.evict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_many(self, realm: str, kind: str, so_ids: list[int]) -> dict[int, tuple[str, object]]:
+        """Return {so_id: (last_modified, payload)} for the cached subset of `so_ids`."""
+        ids = list(dict.fromkeys(int(i) for i in so_ids))
+        out: dict[int, tuple[str, object]] = {}
+        if not ids:
+            return out
+        now = time.time()
+        with self._lock:
+            # SQLite caps bound parameters per statement; stay well below it
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"SELECT so_id, last_modified, payload FROM so_cache "
+                    f"WHERE realm = ? AND kind = ? AND so_id IN ({marks})",
+                    [realm, kind, *chunk],
+                )
+                for so_id, last_modified, payload in cur:
+                    out[int(so_id)] = (last_modified, json.loads(payload))
+                self._conn.execute(
+                    f"UPDATE so_cache SET accessed_at = ? "
+                    f"WHERE realm = ? AND kind = ? AND so_id IN ({marks})",
+                    [now, realm, kind, *chunk],
+                )
+            self._conn.commit()
+        return out
+
+    def put_many(self, realm: str, kind: str, entries: dict[int, tuple[str, object]]) -> None:
+        """Store {so_id: (last_modified, payload)}; payloads must be JSON-serializable."""
+        if not entries:
+            return
+        now = time.time()
+        rows = [(realm, kind, int(so_id), str(lm), json.dumps(payload), now, now)
+                for so_id, (lm, payload) in entries.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO so_cache "
+                "(realm, kind, so_id, last_modified, payload, fetched_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+        self.evict()
+
+    def evict(self) -> int:
+        """Apply the age and size limits. Returns the number of entries removed."""
+        removed = 0
+        with self._lock:
+            if self.max_age_days and self.max_age_days > 0:
+                cutoff = time.time() - self.max_age_days * 86400
+                removed += self._conn.execute(
+                    "DELETE FROM so_cache WHERE fetched_at < ?", (cutoff,)).rowcount
+            if self.max_entries and self.max_entries > 0:
+                removed += self._conn.execute(
+                    "DELETE FROM so_cache WHERE rowid IN ("
+                    "  SELECT rowid FROM so_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)).rowcount
+            self._conn.commit()
+        return removed
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM so_cache")
+            self._conn.commit()
+
+class ProbeCache:
+    """
+    Remembers which backend (SuiteQL or REST Records) works for a realm + token
+    identity, so runs and GUI launches within `ttl_hours` skip the table probes.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None, *, ttl_hours: float = PROBE_TTL_HOURS):
+        self.path = Path(path) if path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_hours = ttl_hours
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get(self, realm: str, identity: str) -> tuple[str, dict] | None:
+        """Return (backend, detail) if a probe result younger than the TTL exists."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT backend, detail, checked_at FROM capability_cache WHERE realm = ? AND identity = ?",
+                (realm, identity)).fetchone()
+        if row is None:
+            return None
+        backend, detail, checked_at = row
+        if time.time() - checked_at > self.ttl_hours * 3600:
+            return None
+        return backend, json.loads(detail)
+
+    def put(self, realm: str, identity: str, backend: str, detail: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO capability_cache (realm, identity, backend, detail, checked_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (realm, identity, backend, json.dumps(detail), time.time()))
+            self._conn.commit()
+
+    def forget(self, realm: str, identity: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM capability_cache WHERE realm = ? AND identity = ?", (realm, identity))
+            self._conn.commit()
+
+class BOMCache:
+    """
+    One level of item members per item: [[child_id, child_name, qty], ...], with an
+    empty list for leaf items so they are not looked up again. Item member records carry
+    no modification stamp, so entries simply expire after `ttl_hours`.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None, *, ttl_hours: float = BOM_TTL_HOURS):
+        self.path = Path(path) if path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_hours = ttl_hours
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_many(self, realm: str, item_ids: list[int]) -> dict[int, list]:
+        """Return {item_id: members} for the subset of `item_ids` cached within the TTL."""
+        ids = list(dict.fromkeys(int(i) for i in item_ids))
+        out: dict[int, list] = {}
+        cutoff = time.time() - self.ttl_hours * 3600
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"SELECT item_id, members FROM bom_cache "
+                    f"WHERE realm = ? AND fetched_at >= ? AND item_id IN ({marks})",
+                    [realm, cutoff, *chunk],
+                )
+                for item_id, members in cur:
+                    out[int(item_id)] = json.loads(members)
+        return out
+
+    def put_many(self, realm: str, entries: dict[int, list]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        rows = [(realm, int(item_id), json.dumps(members), now) for item_id, members in entries.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO bom_cache (realm, item_id, members, fetched_at) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM bom_cache")
+            self._conn.commit()
+
+class ItemCache:
+    """
+    Item master rows (item_id -> itemid, display name, item type) plus a per-realm sync
+    watermark: the newest lastmodifieddate loaded so far and when the last sync ran.
+    """
+
+    def __init__(self, path: str | os.PathLike | None = None):
+        self.path = Path(path) if path else default_cache_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_many(self, realm: str, item_ids: list[int]) -> dict[int, tuple]:
+        """Return {item_id: (itemid, displayname, itemtype)} for the cached subset of `item_ids`."""
+        ids = list(dict.fromkeys(int(i) for i in item_ids))
+        out: dict[int, tuple] = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                cur = self._conn.execute(
+                    f"SELECT item_id, itemid, displayname, itemtype FROM item_cache "
+                    f"WHERE realm = ? AND item_id IN ({marks})",
+                    [realm, *chunk],
+                )
+                for item_id, itemid, displayname, itemtype in cur:
+                    out[int(item_id)] = (itemid, displayname, itemtype)
+        return out
+
+    def put_many(self, realm: str, rows: list[tuple]) -> None:
+        """Store (item_id, itemid, displayname, itemtype, last_modified) rows."""
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO item_cache "
+                "(realm, item_id, itemid, displayname, itemtype, last_modified) VALUES (?, ?, ?, ?, ?, ?)",
+                [(realm, int(r[0]), *r[1:5]) for r in rows],
+            )
+            self._conn.commit()
+
+    def sync_state(self, realm: str) -> tuple[str, float] | None:
+        """(synced_through, synced_at) of the last sync, or None before the first bulk load."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT synced_through, synced_at FROM item_sync WHERE realm = ?", (realm,)).fetchone()
+
+    def set_sync_state(self, realm: str, synced_through: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO item_sync (realm, synced_through, synced_at) VALUES (?, ?, ?)",
+                (realm, synced_through, time.time()))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM item_cache")
+            self._conn.execute("DELETE FROM item_sync")
+            self._conn.commit()
+
+class ResultMemo:
+    """
+    In-process LRU of finished results with a time-to-live: at most `size` entries, each
+    served for `ttl_seconds` after it was stored. Keys must be hashable; size=0 disables it.
+    """
+
+    def __init__(self, size: int = RESULT_MEMO_SIZE, ttl_seconds: float = RESULT_TTL_SECONDS):
+        self.size = max(0, int(size))
+        self.ttl_seconds = float(ttl_seconds)
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()   # key -> (stored_at, value)
+
+    def get(self, key):
+        """The stored value, or None when absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value) -> None:
+        if not self.size:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
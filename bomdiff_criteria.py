@@ -0,0 +1,125 @@
+# Sales Order groups defined by criteria (date range, customer, subsidiary, status, tranid
+# pattern) instead of pasted ID lists. The criteria render to a SuiteQL WHERE clause on the
+# "transaction" header, so the line query selects the group itself (no ID round-trip).
+# Stdlib only: the GUI parses criteria text without loading the core.
+#
+#   parse_criteria("date>=2024-01-01 date<=2024-03-31 customer=5012,5013 status=B,D tranid=SO6*")
+
+import datetime as dt
+import re
+from dataclasses import dataclass
+
+# Text keys accepted by parse_criteria (aliases map to one field)
+_KEYS = {
+    "date": "date", "trandate": "date",
+    "customer": "customers", "entity": "customers",
+    "subsidiary": "subsidiaries",
+    "status": "statuses",
+    "tranid": "tranid",
+}
+_TOKEN = re.compile(r"^(\w+)\s*(>=|<=|=|>|<)\s*(.+)$")
+_STATUS = re.compile(r"^[A-Za-z0-9_:]+$")
+
+@dataclass(frozen=True)
+class GroupCriteria:
+    """
+    Sales Orders matching every given filter. Dates are inclusive transaction dates;
+    statuses are SuiteQL status codes (e.g. B = Pending Fulfillment); `tranid` is a
+    pattern where * (or %) matches any run of characters.
+    """
+    date_from: dt.date | None = None
+    date_to: dt.date | None = None
+    customers: tuple[int, ...] = ()
+    subsidiaries: tuple[int, ...] = ()
+    statuses: tuple[str, ...] = ()
+    tranid: str | None = None
+
+    def __post_init__(self):
+        if not any((self.date_from, self.date_to, self.customers, self.subsidiaries, self.statuses, self.tranid)):
+            raise ValueError("criteria need at least one filter (date, customer, subsidiary, status or tranid)")
+        bad = [s for s in self.statuses if not _STATUS.match(s)]
+        if bad:
+            raise ValueError(f"invalid status code(s): {', '.join(bad)}")
+
+    def where(self, alias: str = "t") -> str:
+        """SuiteQL conditions on the transaction header `alias` (includes the Sales Order type)."""
+        conds = [f"{alias}.\"type\" = 'SalesOrd'"]
+        if self.date_from:
+            conds.append(f"{alias}.trandate >= TO_DATE('{self.date_from.isoformat()}', 'YYYY-MM-DD')")
+        if self.date_to:
+            conds.append(f"{alias}.trandate <= TO_DATE('{self.date_to.isoformat()}', 'YYYY-MM-DD')")
+        if self.customers:
+            conds.append(f"{alias}.entity IN ({','.join(str(int(c)) for c in self.customers)})")
+        if self.subsidiaries:
+            # The subsidiary lives on the main line of the transaction
+            conds.append(f"{alias}.id IN (SELECT ml.transaction FROM \"transactionline\" ml "
+                         f"WHERE ml.mainline = 'T' AND ml.subsidiary IN "
+                         f"({','.join(str(int(s)) for s in self.subsidiaries)}))")
+        if self.statuses:
+            conds.append(f"{alias}.status IN ({','.join(repr(str(s)) for s in self.statuses)})")
+        if self.tranid:
+            pattern = self.tranid.replace("*", "%").replace("'", "''")
+            conds.append(f"{alias}.tranid LIKE '{pattern}'")
+        return " AND ".join(conds)
+
+    def describe(self) -> str:
+        parts = []
+        if self.date_from:
+            parts.append(f"date>={self.date_from.isoformat()}")
+        if self.date_to:
+            parts.append(f"date<={self.date_to.isoformat()}")
+        for key, values in (("customer", self.customers), ("subsidiary", self.subsidiaries),
+                            ("status", self.statuses)):
+            if values:
+                parts.append(f"{key}={','.join(map(str, values))}")
+        if self.tranid:
+            parts.append(f"tranid={self.tranid}")
+        return " ".join(parts)
+
+def _date(value: str) -> dt.date:
+    try:
+        return dt.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"expected a YYYY-MM-DD date, got {value!r}") from None
+
+def _ints(value: str, key: str) -> tuple[int, ...]:
+    try:
+        return tuple(int(v) for v in value.split(",") if v.strip())
+    except ValueError:
+        raise ValueError(f"{key} expects internal IDs, got {value!r}") from None
+
+def parse_criteria(text: str) -> GroupCriteria:
+    """
+    Parse "key<op>value" filters separated by spaces, semicolons or newlines:
+    date>=YYYY-MM-DD, date<=YYYY-MM-DD (also > / < / =), customer=ID,ID, subsidiary=ID,ID,
+    status=B,D and tranid=PATTERN. Raises ValueError on anything else.
+    """
+    fields: dict = {}
+    for token in re.split(r"[;\n]+|\s+(?=\w+\s*[<>=])", text.strip()):
+        token = token.strip()
+        if not token:
+            continue
+        m = _TOKEN.match(token)
+        if not m or m.group(1).lower() not in _KEYS:
+            raise ValueError(f"Invalid criterion: {token!r} (expected e.g. date>=2024-01-01, customer=123, "
+                             "subsidiary=2, status=B, tranid=SO10*)")
+        key, op, value = _KEYS[m.group(1).lower()], m.group(2), m.group(3).strip()
+        if key == "date":
+            day = _date(value)
+            if op in (">=", "=", ">"):
+                fields["date_from"] = day + dt.timedelta(days=1) if op == ">" else day
+            if op in ("<=", "=", "<"):
+                fields["date_to"] = day - dt.timedelta(days=1) if op == "<" else day
+        elif op != "=":
+            raise ValueError(f"{m.group(1)} only supports '=' (got {token!r})")
+        elif key in ("customers", "subsidiaries"):
+            fields[key] = _ints(value, m.group(1))
+        elif key == "statuses":
+            fields[key] = tuple(v.strip() for v in value.split(",") if v.strip())
+        else:
+            fields[key] = value
+    return GroupCriteria(**fields)
+
+def looks_like_criteria(text: str) -> bool:
+    """True when group text holds filters rather than a list of internal IDs."""
+    return bool(re.search(r"[A-Za-z_]\s*[<>=]", text))
@@ -0,0 +1,244 @@
+# Vectorized diff engine (A-B and N-group matrices) on compact NumPy arrays (no pandas).
+# Lines are (int64 item id, float64 qty) arrays; item names are looked up once,
+# only for the items that survive the diff.
+
+import threading
+
+import numpy as np
+
+# Item id used for lines without an item (description/subtotal lines)
+MISSING_ITEM_ID = -1
+
+# Dense bincount over raw ids is used while max id stays within this factor of the line count
+# (NetSuite internal ids are compact); sparser ids fall back to a sort-based np.unique.
+DENSE_ID_FACTOR = 8
+DENSE_ID_FLOOR = 2_000_000
+
+def _group_index(ids: np.ndarray):
+    """
+    Map ids to group slots in one pass.
+    Returns (unique_ids, inverse, position) where position holds one input index per
+    unique id (used to resolve its name).
+    """
+    if len(ids) == 0:
+        return ids, ids, ids
+    lo, hi = int(ids.min()), int(ids.max())
+    span = hi - lo + 1
+    if span <= max(DENSE_ID_FLOOR, DENSE_ID_FACTOR * len(ids)):
+        slot = ids - lo
+        present = np.bincount(slot, minlength=span) > 0
+        uniq = np.flatnonzero(present) + lo
+        remap = np.cumsum(present) - 1
+        inv = remap[slot]
+        position = np.empty(len(uniq), dtype=np.int64)
+        position[inv] = np.arange(len(ids))
+        return uniq, inv, position
+    uniq, position, inv = np.unique(ids, return_index=True, return_inverse=True)
+    return uniq, inv, position
+
+def item_totals(item_ids, qty, *, absolute: bool = True):
+    """
+    Sum quantities per item id in one pass.
+    Returns (unique_ids, totals, position) where position points at one input line
+    of each item (used to resolve its name).
+    """
+    ids = np.asarray(item_ids, dtype=np.int64)
+    q = np.asarray(qty, dtype=np.float64)
+    if absolute:
+        q = np.abs(q)
+    uniq, inv, position = _group_index(ids)
+    return uniq, np.bincount(inv, weights=q, minlength=len(uniq)), position
+
+def diff_a_minus_b(a_ids, a_qty, b_ids, b_qty, *, a_names=None, b_names=None,
+                   absolute: bool = True) -> dict[str, np.ndarray]:
+    """
+    Compute per-item totals for groups A and B and their difference, keeping only
+    non-zero differences. Output columns match the pandas path:
+    item_id, item_name, qty_A, qty_B, diff_A_minus_B, sorted by (item_name, item_id),
+    with quantity columns cast to int64 when every value is whole.
+    `a_names`/`b_names` are per-line name arrays aligned with the id arrays; they are
+    only indexed at one line per surviving item, never converted wholesale.
+    """
+    a_ids = np.asarray(a_ids, dtype=np.int64)
+    b_ids = np.asarray(b_ids, dtype=np.int64)
+    a_qty = np.asarray(a_qty, dtype=np.float64)
+    b_qty = np.asarray(b_qty, dtype=np.float64)
+    if absolute:
+        a_qty, b_qty = np.abs(a_qty), np.abs(b_qty)
+    n_a, n = len(a_ids), len(a_ids) + len(b_ids)
+
+    lo = min([int(x.min()) for x in (a_ids, b_ids) if len(x)], default=0)
+    hi = max([int(x.max()) for x in (a_ids, b_ids) if len(x)], default=-1)
+    span = hi - lo + 1
+    if span <= max(DENSE_ID_FLOOR, DENSE_ID_FACTOR * n):
+        # Compact ids: sum straight into one slot per id value. Absent ids have a zero
+        # diff and drop out with the zero rows, so no separate unique pass is needed.
+        slot_a, slot_b = a_ids - lo, b_ids - lo
+        qty_a = np.bincount(slot_a, weights=a_qty, minlength=span)
+        qty_b = np.bincount(slot_b, weights=b_qty, minlength=span)
+        diff = qty_a - qty_b
+        kept = np.flatnonzero(diff)
+        uniq, qty_a, qty_b, diff = kept + lo, qty_a[kept], qty_b[kept], diff[kept]
+        # One line index per surviving id: prefer a line from A, else from B
+        where = np.full(span, -1, dtype=np.int64)
+        where[slot_a] = np.arange(n_a)
+        position = where[kept]
+        if (position < 0).any():
+            where[slot_b] = np.arange(n_a, n)
+            position = np.where(position < 0, where[kept], position)
+    else:
+        uniq, inv, position = _group_index(np.concatenate([a_ids, b_ids]))
+        k = len(uniq)
+        qty_a = np.bincount(inv[:n_a], weights=a_qty, minlength=k)
+        qty_b = np.bincount(inv[n_a:], weights=b_qty, minlength=k)
+        diff = qty_a - qty_b
+        keep = diff != 0
+        uniq, position, qty_a, qty_b, diff = uniq[keep], position[keep], qty_a[keep], qty_b[keep], diff[keep]
+
+    # Resolve names once, for surviving items only
+    names = np.full(len(uniq), None, dtype=object)
+    from_a = position < n_a
+    if a_names is not None and from_a.any():
+        names[from_a] = np.asarray(a_names[position[from_a]], dtype=object)
+    if b_names is not None and (~from_a).any():
+        names[~from_a] = np.asarray(b_names[position[~from_a] - n_a], dtype=object)
+    return _item_columns(uniq, names, {"qty_A": qty_a, "qty_B": qty_b, "diff_A_minus_B": diff})
+
+def _item_columns(uniq: np.ndarray, names: np.ndarray, values: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Final output columns: item_id, item_name, then `values`, sorted by (item_name, item_id)
+    with missing names last, and each value column cast to int64 when every value is whole.
+    """
+    # Item names are strings; None/NaN/pd.NA all mean "no name"
+    missing_name = np.array([not isinstance(n, str) for n in names], dtype=bool)
+    names[missing_name] = None
+
+    # Sort by (item_name, item_id) with missing names last, like DataFrame.sort_values
+    name_key = np.where(missing_name, "", names).astype(str)
+    order = np.lexsort((uniq, uniq == MISSING_ITEM_ID, name_key, missing_name))
+
+    out_ids = uniq[order]
+    if (out_ids == MISSING_ITEM_ID).any():
+        out_ids = np.array([None if i == MISSING_ITEM_ID else int(i) for i in out_ids], dtype=object)
+    out = {"item_id": out_ids, "item_name": names[order]}
+    for col, col_values in values.items():
+        col_values = col_values[order]
+        out[col] = col_values.astype(np.int64) if np.all(col_values % 1 == 0) else col_values
+    return out
+
+class ItemTotals:
+    """
+    Running per-item totals for `n_groups` groups, folded in batch by batch (e.g. one
+    SuiteQL page at a time) so the lines themselves are never held. Memory grows with
+    the number of distinct items, not lines. add() may be called from several threads.
+    """
+
+    def __init__(self, n_groups: int, *, absolute: bool = True):
+        self.absolute = absolute
+        self.ids = np.empty(0, dtype=np.int64)               # sorted distinct item ids
+        self.totals = np.zeros((0, n_groups), dtype=np.float64)
+        self.lines = 0
+        self._lock = threading.Lock()
+
+    def add(self, item_ids, qty, group: int) -> None:
+        """Fold a batch of lines into `group`'s totals."""
+        ids = np.asarray(item_ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        q = np.asarray(qty, dtype=np.float64)
+        if self.absolute:
+            q = np.abs(q)
+        # Sum the batch first, then merge its (few) distinct items into the running index
+        uniq, inv = np.unique(ids, return_inverse=True)
+        sums = np.bincount(inv, weights=q, minlength=len(uniq))
+        with self._lock:
+            self._fold(uniq, sums[:, None], [group])
+            self.lines += len(ids)
+
+    def merge(self, other: "ItemTotals") -> None:
+        """Add every group's totals from `other` (same groups), e.g. a batch folded on the side."""
+        with other._lock:
+            ids, totals, lines = other.ids, other.totals, other.lines
+        with self._lock:
+            self._fold(ids, totals, list(range(totals.shape[1])))
+            self.lines += lines
+
+    def _fold(self, uniq: np.ndarray, sums: np.ndarray, groups: list[int]) -> None:
+        """Add `sums` (one row per sorted distinct id in `uniq`) to `groups`; lock held."""
+        new = np.setdiff1d(uniq, self.ids, assume_unique=True)
+        if len(new):
+            merged = np.union1d(self.ids, new)
+            totals = np.zeros((len(merged), self.totals.shape[1]), dtype=np.float64)
+            totals[np.searchsorted(merged, self.ids)] = self.totals
+            self.ids, self.totals = merged, totals
+        self.totals[np.ix_(np.searchsorted(self.ids, uniq), groups)] += sums
+
+    def add_for_members(self, line_so, item_ids, qty, members: dict[int, np.ndarray]) -> None:
+        """
+        Fold a batch of lines from many SOs into each group whose SO ids (`members`:
+        group -> SO id array) include the line's SO; overlapping groups each count it.
+        """
+        so = np.asarray(line_so, dtype=np.int64)
+        ids = np.asarray(item_ids, dtype=np.int64)
+        q = np.asarray(qty, dtype=np.float64)
+        for group, so_ids in members.items():
+            hit = np.isin(so, so_ids)
+            self.add(ids[hit], q[hit], group)
+
+    def diff(self, a: int = 0, b: int = 1) -> dict[str, np.ndarray]:
+        """
+        Same columns and order as diff_a_minus_b for groups `a` and `b` (names left empty;
+        they are resolved for the surviving items afterwards).
+        """
+        qty_a, qty_b = self.totals[:, a], self.totals[:, b]
+        diff = qty_a - qty_b
+        keep = diff != 0
+        uniq = self.ids[keep]
+        return _item_columns(uniq, np.full(len(uniq), None, dtype=object),
+                             {"qty_A": qty_a[keep], "qty_B": qty_b[keep], "diff_A_minus_B": diff[keep]})
+
+def group_totals(line_so, item_ids, qty, groups, *, absolute: bool = True):
+    """
+    Per-item totals for several SO groups from one set of line arrays.
+    `groups` is a sequence of SO id collections; groups may overlap, and a line counts
+    toward every group its SO belongs to. Items are indexed once for all groups.
+    Returns (unique_ids, totals[item, group], position).
+    """
+    so = np.asarray(line_so, dtype=np.int64)
+    ids = np.asarray(item_ids, dtype=np.int64)
+    q = np.asarray(qty, dtype=np.float64)
+    if absolute:
+        q = np.abs(q)
+    uniq, inv, position = _group_index(ids)
+    so_uniq, so_inv, _ = _group_index(so)
+    totals = np.zeros((len(uniq), len(groups)), dtype=np.float64)
+    for g, members in enumerate(groups):
+        # Membership is decided per distinct SO, then broadcast to its lines
+        member = np.isin(so_uniq, np.asarray(list(members), dtype=np.int64))[so_inv]
+        totals[:, g] = np.bincount(inv[member], weights=q[member], minlength=len(uniq))
+    return uniq, totals, position
+
+def group_matrix(line_so, item_ids, qty, groups: dict, pairs, *, names=None,
+                 absolute: bool = True) -> dict[str, np.ndarray]:
+    """
+    Items x groups matrix: item_id, item_name, one qty_<label> column per group and one
+    diff_<x>_minus_<y> column per (x, y) in `pairs`. Rows whose diffs are all zero are dropped.
+    `groups` maps label -> SO ids; `names` is the per-line name array (indexed lazily).
+    """
+    labels = list(groups)
+    uniq, totals, position = group_totals(line_so, item_ids, qty, [groups[k] for k in labels],
+                                          absolute=absolute)
+    col = {label: g for g, label in enumerate(labels)}
+    diffs = {f"diff_{x}_minus_{y}": totals[:, col[x]] - totals[:, col[y]] for x, y in pairs}
+    keep = np.zeros(len(uniq), dtype=bool)
+    for d in diffs.values():
+        keep |= d != 0
+    # Items that only appear in SOs outside every group also drop out here
+    uniq, position, totals = uniq[keep], position[keep], totals[keep]
+
+    resolved = np.full(len(uniq), None, dtype=object)
+    if names is not None and len(uniq):
+        resolved[:] = np.asarray(names[position], dtype=object)
+    values = {f"qty_{label}": totals[:, g] for g, label in enumerate(labels)}
+    values.update((k, d[keep]) for k, d in diffs.items())
+    return _item_columns(uniq, resolved, values)
@@ -0,0 +1,79 @@
+# Local item master: item id -> (itemid, display name, item type). Bulk-loaded from the
+# "item" table on first use and refreshed incrementally by lastmodifieddate afterwards,
+# so line queries return bare item ids and names are attached to the (much smaller)
+# diff result at output time instead of joining "item" in every query.
+
+import threading, time
+
+from bomdiff_cache import ITEM_SYNC_MINUTES
+from bomdiff_metrics import METRICS
+
+class ItemMaster:
+    """
+    `fetch_changed(since)` returns (item_id, itemid, displayname, itemtype, last_modified)
+    rows for every item modified at or after `since` ("YYYY-MM-DD HH24:MI:SS"; None loads
+    all items); `fetch_by_id(ids)` returns the same rows for specific items (ones created
+    since the last sync). `cache` is an optional ItemCache (see bomdiff_cache) keyed by
+    `realm`. Syncs run at most every `sync_minutes` across processes sharing the cache.
+    """
+
+    def __init__(self, fetch_changed, fetch_by_id, *, cache=None, realm: str = "",
+                 sync_minutes: float = ITEM_SYNC_MINUTES):
+        self.fetch_changed = fetch_changed
+        self.fetch_by_id = fetch_by_id
+        self.cache = cache
+        self.realm = realm
+        self.sync_minutes = sync_minutes
+        self._items: dict[int, tuple] = {}
+        self._checked: float | None = None
+        self._lock = threading.Lock()
+        self.stats = {"synced": 0, "cached": 0, "fetched": 0}
+
+    def sync(self, *, force: bool = False) -> int:
+        """
+        Load items changed since the last sync (every item the first time); force=True
+        ignores the sync interval. Returns the number of item rows loaded.
+        """
+        with self._lock:
+            state = self.cache.sync_state(self.realm) if self.cache is not None else None
+            self._checked = time.monotonic()
+            if state is not None and not force and time.time() - state[1] < self.sync_minutes * 60:
+                return 0
+            since = state[0] if state is not None else None
+            rows = self.fetch_changed(since)
+            if self.cache is not None:
+                self.cache.put_many(self.realm, rows)
+                stamps = [r[4] for r in rows if r[4]]
+                self.cache.set_sync_state(self.realm, max(stamps + ([since] if since else []), default=""))
+            for item_id, itemid, displayname, itemtype, _ in rows:
+                self._items[int(item_id)] = (itemid, displayname, itemtype)
+            self.stats["synced"] += len(rows)
+        if rows:
+            print(f"Item master: {'loaded' if since is None else 'refreshed'} {len(rows)} items")
+        return len(rows)
+
+    def lookup(self, item_ids) -> dict[int, tuple]:
+        """{item_id: (itemid, displayname, itemtype)}; items NetSuite does not know map to Nones."""
+        ids = list(dict.fromkeys(int(i) for i in item_ids))
+        if self._checked is None or time.monotonic() - self._checked >= self.sync_minutes * 60:
+            self.sync()
+        missing = [i for i in ids if i not in self._items]
+        known = self.cache.get_many(self.realm, missing) if missing and self.cache is not None else {}
+        fetch = [i for i in missing if i not in known]
+        fetched = self.fetch_by_id(fetch) if fetch else []
+        if self.cache is not None:
+            self.cache.put_many(self.realm, fetched)
+        with self._lock:
+            self._items.update(known)
+            for item_id, itemid, displayname, itemtype, _ in fetched:
+                self._items[int(item_id)] = (itemid, displayname, itemtype)
+            for i in fetch:
+                self._items.setdefault(i, (None, None, None))
+            self.stats["cached"] += len(known)
+            self.stats["fetched"] += len(fetch)
+            METRICS.cache("item", hits=len(ids) - len(fetch), misses=len(fetch))
+            return {i: self._items[i] for i in ids}
+
+    def names(self, item_ids) -> dict[int, str | None]:
+        """{item_id: itemid} (the item name/number shown in outputs)."""
+        return {i: row[0] for i, row in self.lookup(item_ids).items()}
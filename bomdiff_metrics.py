@@ -0,0 +1,211 @@
+# Run instrumentation: per-phase wall time, per-request latency/status/bytes/retries and
+# cache hit rates, collected in-process into one Metrics object (stdlib only, so the GUI
+# can use it without loading the core). Exports a JSON summary or a Chrome trace
+# (chrome://tracing or ui.perfetto.dev); profiled() wraps a block in cProfile.
+#
+#   with METRICS.phase("fetch"): ...          # or decorate with @timed("fetch")
+#   METRICS.write_json("metrics.json"); METRICS.write_chrome_trace("trace.json")
+
+import functools, json, os, re, threading, time
+from contextlib import contextmanager
+
+# Spans/requests kept for the trace and latency percentiles; counters keep counting past it
+MAX_EVENTS = int(os.getenv("BOMDIFF_METRICS_MAX_EVENTS") or 100_000)
+
+# Record ids in REST paths collapse so requests group per endpoint
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+def endpoint(method: str, url: str) -> str:
+    """'GET /services/rest/record/v1/salesorder/{id}' from a full request URL."""
+    path = re.sub(r"^https?://[^/]+", "", url).split("?", 1)[0]
+    return f"{method.upper()} {_ID_SEGMENT.sub('/{id}', path)}"
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[k]
+
+class Metrics:
+    """
+    Thread-safe collector. Phases nest; a phase re-entered on the same thread (e.g. a
+    fetch helper calling another fetch helper) is counted once, at the outermost level.
+    Phase seconds are inclusive wall time, so nested phases overlap their parents.
+    """
+
+    def __init__(self, max_events: int = MAX_EVENTS):
+        self.max_events = max_events
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started = time.perf_counter()
+            self.started_at = time.time()
+            self._phases: dict[str, list] = {}      # name -> [calls, seconds]
+            self._spans: list[tuple] = []           # (name, start, seconds, thread id)
+            self._requests: list[tuple] = []        # (endpoint, start, seconds, status, bytes, retries, thread id)
+            self._endpoints: dict[str, list] = {}   # endpoint -> [count, seconds, bytes]
+            self._statuses: dict[str, int] = {}
+            self._totals = {"requests": 0, "retries": 0, "errors": 0, "bytes": 0}
+            self._cache: dict[str, list] = {}       # kind -> [hits, misses]
+            self._threads: dict[int, str] = {}
+            self.dropped = 0
+
+    # --- recording ---
+    def _stack(self) -> list[str]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _keep(self, bucket: list, event: tuple) -> None:
+        if len(self._spans) + len(self._requests) < self.max_events:
+            bucket.append(event)
+            thread = threading.current_thread()
+            self._threads.setdefault(thread.ident, thread.name)
+        else:
+            self.dropped += 1
+
+    @contextmanager
+    def phase(self, name: str):
+        stack = self._stack()
+        outermost = name not in stack
+        stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - t0
+            stack.pop()
+            if outermost:
+                with self._lock:
+                    entry = self._phases.setdefault(name, [0, 0.0])
+                    entry[0] += 1
+                    entry[1] += seconds
+                    self._keep(self._spans, (name, t0, seconds, threading.get_ident()))
+
+    def record_request(self, method: str, url: str, status: int | None, seconds: float,
+                       nbytes: int = 0, retries: int = 0, *, start: float | None = None) -> None:
+        """One logical request: final status (None = connection error), total seconds incl. retries."""
+        key = endpoint(method, url)
+        start = time.perf_counter() - seconds if start is None else start
+        with self._lock:
+            t = self._totals
+            t["requests"] += 1
+            t["retries"] += retries
+            t["bytes"] += nbytes
+            if status is None or status >= 400:
+                t["errors"] += 1
+            code = str(status) if status is not None else "connection_error"
+            self._statuses[code] = self._statuses.get(code, 0) + 1
+            ep = self._endpoints.setdefault(key, [0, 0.0, 0])
+            ep[0] += 1
+            ep[1] += seconds
+            ep[2] += nbytes
+            self._keep(self._requests, (key, start, seconds, status, nbytes, retries, threading.get_ident()))
+
+    def cache(self, kind: str, *, hits: int = 0, misses: int = 0) -> None:
+        with self._lock:
+            entry = self._cache.setdefault(kind, [0, 0])
+            entry[0] += hits
+            entry[1] += misses
+
+    # --- reporting ---
+    def summary(self) -> dict:
+        with self._lock:
+            latencies = sorted(r[2] for r in self._requests)
+            return {
+                "started_at": self.started_at,
+                "wall_seconds": round(time.perf_counter() - self.started, 4),
+                "phases": {name: {"calls": calls, "seconds": round(seconds, 4)}
+                           for name, (calls, seconds) in self._phases.items()},
+                "requests": {
+                    **self._totals,
+                    "by_status": dict(sorted(self._statuses.items())),
+                    "latency_ms": {
+                        "mean": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                        **{f"p{p}": round(1000 * _percentile(latencies, p), 1) for p in (50, 90, 99)},
+                        "max": round(1000 * latencies[-1], 1) if latencies else 0.0,
+                    },
+                    "by_endpoint": {key: {"count": n, "seconds": round(s, 4), "bytes": b}
+                                    for key, (n, s, b) in sorted(self._endpoints.items())},
+                },
+                "cache": {kind: {"hits": h, "misses": m, "hit_rate": round(h / (h + m), 3) if h + m else None}
+                          for kind, (h, m) in self._cache.items()},
+                "dropped_events": self.dropped,
+            }
+
+    def format_summary(self, summary: dict | None = None) -> str:
+        """Short human-readable report (console and the GUI metrics panel)."""
+        s = summary or self.summary()
+        rq, lat = s["requests"], s["requests"]["latency_ms"]
+        out = [f"Wall time: {s['wall_seconds']:.2f}s", "Phases (inclusive):"]
+        for name, p in sorted(s["phases"].items(), key=lambda kv: -kv[1]["seconds"]):
+            out.append(f"  {name:<10} {p['seconds']:8.3f}s  x{p['calls']}")
+        out.append(f"Requests: {rq['requests']} ({rq['retries']} retries, {rq['errors']} errors, "
+                   f"{rq['bytes'] / 1024:.0f} KiB)  status {rq['by_status']}")
+        out.append(f"  latency ms: mean {lat['mean']}, p50 {lat['p50']}, p90 {lat['p90']}, "
+                   f"p99 {lat['p99']}, max {lat['max']}")
+        for key, ep in rq["by_endpoint"].items():
+            out.append(f"  {ep['count']:6d}  {ep['seconds']:8.3f}s  {key}")
+        if s["cache"]:
+            out.append("Cache:")
+            for kind, c in s["cache"].items():
+                rate = "n/a" if c["hit_rate"] is None else f"{c['hit_rate']:.0%}"
+                out.append(f"  {kind:<14} {c['hits']} hits, {c['misses']} misses ({rate})")
+        return "\n".join(out)
+
+    def write_json(self, path: str | os.PathLike) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def chrome_trace(self) -> dict:
+        """Trace Event Format: one complete ("X") event per phase span and per request."""
+        pid = os.getpid()
+        us = lambda t: round((t - self.started) * 1e6, 1)
+        with self._lock:
+            events = [{"ph": "M", "name": "thread_name", "pid": pid, "tid": tid, "args": {"name": name}}
+                      for tid, name in self._threads.items()]
+            events += [{"ph": "X", "cat": "phase", "name": name, "pid": pid, "tid": tid,
+                        "ts": us(start), "dur": round(seconds * 1e6, 1)}
+                       for name, start, seconds, tid in self._spans]
+            events += [{"ph": "X", "cat": "http", "name": key, "pid": pid, "tid": tid,
+                        "ts": us(start), "dur": round(seconds * 1e6, 1),
+                        "args": {"status": status, "bytes": nbytes, "retries": retries}}
+                       for key, start, seconds, status, nbytes, retries, tid in self._requests]
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": self.summary()}
+
+    def write_chrome_trace(self, path: str | os.PathLike) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+# Process-wide collector used by the client, the core and the GUI
+METRICS = Metrics()
+
+def timed(name: str):
+    """Decorator: run the function inside METRICS.phase(name)."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with METRICS.phase(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+@contextmanager
+def profiled(path: str | os.PathLike | None):
+    """cProfile the block and dump stats to `path` (view with snakeviz or pstats); no-op without a path."""
+    if not path:
+        yield
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(path))
+        print("Wrote profile:", os.path.abspath(path))
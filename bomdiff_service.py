@@ -0,0 +1,276 @@
+# Local diff service: one long-lived process keeps the core imported and the NetSuite
+# connection pool, backend probe and SO/BOM caches warm, and answers A-B diff requests
+# over HTTP on localhost. Requests run concurrently on the shared client (its governor
+# still bounds in-flight NetSuite calls). ServiceClient is a stdlib-only thin client for
+# the GUI, the CLI (--service) and scripts.
+#
+#   python so_bomdiff.py --serve                 # or: python bomdiff_service.py --port 8765
+#   curl -s localhost:8765/diff -d '{"group_a": [842689, 842688], "group_b": "date>=2024-01-01 customer=12"}'
+#
+# Endpoints:
+#   GET  /health    backend, uptime and request counters
+#   GET  /metrics   cumulative phase/request/cache metrics of the process (see bomdiff_metrics)
+#   POST /diff      {"group_a", "group_b", "explode", "pushdown", "refresh", "use_cache", "format"}
+#                   groups are ID lists or criteria text; format "json" (default) returns
+#                   {"columns", "data", "rows", "seconds"}, "csv" returns the output CSV
+
+import argparse, csv, hmac, io, json, os, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import error as urlerror, request as urlrequest
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # settings then come from the environment only
+
+SERVICE_HOST = os.getenv("BOMDIFF_SERVICE_HOST") or "127.0.0.1"
+SERVICE_PORT = int(os.getenv("BOMDIFF_SERVICE_PORT") or 8765)
+# Clients (GUI, CLI) use the service when this is set, e.g. http://127.0.0.1:8765
+SERVICE_URL = (os.getenv("BOMDIFF_SERVICE_URL") or "").strip()
+# Optional shared secret; required when the service binds to a non-loopback address
+SERVICE_TOKEN = os.getenv("BOMDIFF_SERVICE_TOKEN") or ""
+# Diffs computed at once; further requests wait for a slot
+SERVICE_WORKERS = int(os.getenv("BOMDIFF_SERVICE_WORKERS") or 4)
+
+MAX_BODY_BYTES = 1 << 20
+_LOOPBACK = ("127.0.0.1", "localhost", "::1")
+
+def _parse_group(value, label: str):
+    """An ID list, 'ID,ID,...' text or criteria text (see bomdiff_criteria)."""
+    from bomdiff_criteria import looks_like_criteria, parse_criteria
+    if isinstance(value, str):
+        if looks_like_criteria(value):
+            return parse_criteria(value)
+        value = [v for v in value.replace("\n", ",").replace(" ", ",").split(",") if v.strip()]
+    if not isinstance(value, list) or not value:
+        raise ValueError(f"{label} must be a non-empty list of SO internal IDs or criteria text")
+    try:
+        return [int(v) for v in value]
+    except (TypeError, ValueError):
+        raise ValueError(f"{label} holds a value that is not an SO internal ID") from None
+
+def _encode_group(group) -> list[int] | str:
+    from bomdiff_criteria import GroupCriteria
+    return group.describe() if isinstance(group, GroupCriteria) else [int(i) for i in group]
+
+class DiffService:
+    """The HTTP server plus the warm core state it shares across requests."""
+
+    def __init__(self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, *,
+                 token: str = SERVICE_TOKEN, workers: int = SERVICE_WORKERS):
+        if host not in _LOOPBACK and not token:
+            raise SystemExit("BOMDIFF_SERVICE_TOKEN is required to serve on a non-local address.")
+        # Imported here so ServiceClient users never load pandas/numpy
+        import so_bomdiff_application as core
+        self.core = core
+        self.token = token
+        self.slots = threading.BoundedSemaphore(max(1, workers))
+        self.backend: str | None = None
+        self.started = time.time()
+        self.counters = {"diffs": 0, "errors": 0, "in_flight": 0}
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def warm(self) -> None:
+        """Open the client and probe the backend before the first request arrives."""
+        self.core.get_client()
+        self.backend = self.core.probe_backend()
+        print(f"Diff service: backend {self.backend}, listening on {self.url}")
+
+    def serve_forever(self) -> None:
+        self.warm()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.httpd.server_close()
+
+    def start(self) -> threading.Thread:
+        """Serve on a daemon thread (scripts and tests); stop with shutdown()."""
+        self.warm()
+        thread = threading.Thread(target=self.httpd.serve_forever, name="bomdiff-service", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def health(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        return {"status": "ok", "backend": self.backend, "pid": os.getpid(),
+                "uptime_seconds": round(time.time() - self.started, 1), **counters}
+
+    def diff(self, payload: dict):
+        """Run one diff request; returns the output-ordered result frame."""
+        group_a = _parse_group(payload.get("group_a"), "group_a")
+        group_b = _parse_group(payload.get("group_b"), "group_b")
+        use_cache = payload.get("use_cache")
+        with self.slots:
+            with self._lock:
+                self.counters["in_flight"] += 1
+            try:
+                return self.core.compute_diff(
+                    group_a, group_b, use_cache=None if use_cache is None else bool(use_cache),
+                    refresh=bool(payload.get("refresh")), pushdown=bool(payload.get("pushdown")),
+                    explode=bool(payload.get("explode")))
+            finally:
+                with self._lock:
+                    self.counters["in_flight"] -= 1
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counters[key] += 1
+
+def _handler(service: DiffService):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "bomdiff-service"
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            print(f"[service] {self.address_string()} {fmt % args}")
+
+        def _send(self, status: int, body: str, content_type: str = "application/json") -> None:
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _json(self, status: int, obj: dict) -> None:
+            self._send(status, json.dumps(obj))
+
+        def _authorized(self) -> bool:
+            if not service.token:
+                return True
+            given = self.headers.get("Authorization", "")
+            if hmac.compare_digest(given.encode(), f"Bearer {service.token}".encode()):
+                return True
+            self._json(401, {"error": "missing or wrong bearer token"})
+            return False
+
+        def do_GET(self):
+            if not self._authorized():
+                return
+            path = self.path.split("?", 1)[0]
+            if path == "/health":
+                self._json(200, service.health())
+            elif path == "/metrics":
+                from bomdiff_metrics import METRICS
+                self._json(200, METRICS.summary())
+            else:
+                self._json(404, {"error": f"unknown path {path}"})
+
+        def do_POST(self):
+            if not self._authorized():
+                return
+            if self.path.split("?", 1)[0] != "/diff":
+                self._json(404, {"error": f"unknown path {self.path}"})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY_BYTES:
+                self._json(413, {"error": f"request body over {MAX_BODY_BYTES} bytes"})
+                return
+            t0 = time.perf_counter()
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(payload, dict):
+                    raise ValueError("request body must be a JSON object")
+                fmt = str(payload.get("format") or "json").lower()
+                if fmt not in ("json", "csv"):
+                    raise ValueError(f"format must be 'json' or 'csv', not {fmt!r}")
+                df = service.diff(payload)
+            except ValueError as e:
+                service.count("errors")
+                self._json(400, {"error": str(e)})
+                return
+            except (Exception, SystemExit) as e:
+                # The core reports access problems as SystemExit; keep serving
+                service.count("errors")
+                self._json(500, {"error": f"{type(e).__name__}: {e}"})
+                return
+            service.count("diffs")
+            if fmt == "csv":
+                self._send(200, df.to_csv(index=False), "text/csv")
+                return
+            body = json.loads(df.to_json(orient="split", index=False, double_precision=15))
+            self._json(200, {**body, "rows": len(df), "seconds": round(time.perf_counter() - t0, 3)})
+
+    return Handler
+
+class ServiceClient:
+    """Thin client for a running diff service (stdlib only, so it loads instantly)."""
+
+    def __init__(self, url: str | None = None, *, token: str | None = None, timeout: float = 600):
+        self.url = (url or SERVICE_URL or f"http://127.0.0.1:{SERVICE_PORT}").rstrip("/")
+        self.token = SERVICE_TOKEN if token is None else token
+        self.timeout = timeout
+
+    def _call(self, method: str, path: str, payload: dict | None = None) -> tuple[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = None if payload is None else json.dumps(payload).encode("utf-8")
+        req = urlrequest.Request(self.url + path, data=data, headers=headers, method=method)
+        try:
+            with urlrequest.urlopen(req, timeout=self.timeout) as r:
+                return r.headers.get_content_type(), r.read().decode("utf-8")
+        except urlerror.HTTPError as e:
+            body = e.read().decode("utf-8", "replace")
+            try:
+                message = json.loads(body).get("error", body)
+            except ValueError:
+                message = body
+            raise RuntimeError(f"Diff service error {e.code}: {message}") from None
+        except urlerror.URLError as e:
+            raise ConnectionError(f"Diff service not reachable at {self.url}: {e.reason}") from None
+
+    def health(self) -> dict:
+        return json.loads(self._call("GET", "/health")[1])
+
+    def metrics(self) -> dict:
+        return json.loads(self._call("GET", "/metrics")[1])
+
+    def diff(self, group_a, group_b, *, explode: bool = False, pushdown: bool = False,
+             refresh: bool = False, use_cache: bool | None = None, fmt: str = "json"):
+        """
+        A - B for ID lists or GroupCriteria. fmt="json" returns the decoded response
+        ({"columns", "data", "rows", "seconds"}); fmt="csv" returns the CSV text.
+        """
+        payload = {"group_a": _encode_group(group_a), "group_b": _encode_group(group_b),
+                   "explode": explode, "pushdown": pushdown, "refresh": refresh,
+                   "use_cache": use_cache, "format": fmt}
+        _, body = self._call("POST", "/diff", payload)
+        return body if fmt == "csv" else json.loads(body)
+
+    def diff_to_csv(self, group_a, group_b, csv_path: str, **opts) -> int:
+        """Write the service's CSV exactly as write_outputs would; returns the row count."""
+        text = self.diff(group_a, group_b, fmt="csv", **opts)
+        with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+            f.write(text)
+        return max(0, sum(1 for _ in csv.reader(io.StringIO(text))) - 1)
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> None:
+    DiffService(host, port).serve_forever()
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Local BoM diff service (keeps NetSuite sessions and caches warm)")
+    ap.add_argument("--host", default=SERVICE_HOST, help=f"bind address (default {SERVICE_HOST})")
+    ap.add_argument("--port", type=int, default=SERVICE_PORT, help=f"port (default {SERVICE_PORT})")
+    args = ap.parse_args(argv)
+    try:
+        serve(args.host, args.port)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,235 @@
+# Incremental A-B diff for building groups one order at a time (Python API and GUI).
+# A session keeps one item -> quantity vector per fetched SO and running per-group
+# totals. Adding or removing an SO costs time proportional to that SO's lines, and only
+# SOs the session has never seen are fetched. revalidate() checks the lastmodifieddate of
+# fetched SOs not checked within the last `revalidate_after` seconds and forgets the ones
+# edited since (and IDs that were not found but now exist), so the next add/set_groups
+# refetches them.
+#
+#   session = DiffSession()
+#   session.add("A", [842689, 842688]); session.add("B", [675219])
+#   session.remove("A", [842688])
+#   df = session.result()          # same columns as compare_groups_a_minus_b
+
+import threading, time
+
+import pandas as pd
+
+import so_bomdiff_application as core
+from bomdiff_cache import RESULT_TTL_SECONDS
+
+GROUPS = ("A", "B")
+
+# Running totals closer to zero than this are float residue from add/remove and are dropped
+ZERO_TOLERANCE = 1e-9
+# result() rounds running totals to this many decimals, so residue never survives as a diff row
+QTY_DECIMALS = 9
+
+class DiffSession:
+    """
+    Stateful A-B diff. The backend (SuiteQL or REST Records) is probed once per session.
+    explode=True keeps per-SO vectors in leaf components (see explode_lines), reusing
+    one BOM exploder for the whole session. Line quantities are counted with the
+    COUNT_ABSOLUTE_LINE_QTY setting in effect when the session was created.
+    revalidate() trusts SOs fetched or checked within `revalidate_after` seconds (default
+    BOMDIFF_RESULT_TTL_SECONDS, like a memoized diff result).
+    """
+
+    def __init__(self, group_a=(), group_b=(), *, explode: bool = False,
+                 use_cache: bool | None = None, refresh: bool = False,
+                 revalidate_after: float = RESULT_TTL_SECONDS):
+        self.explode = explode
+        self.use_cache = use_cache
+        self.refresh = refresh
+        self.revalidate_after = revalidate_after
+        self.absolute = core.COUNT_ABSOLUTE_LINE_QTY
+        self._backend: str | None = None
+        self._exploder = None
+        self._lock = threading.Lock()
+        self._vectors: dict[int, dict[int, float]] = {}
+        self._names: dict[int, str | None] = {}
+        self._missing: set[int] = set()
+        self._stamps: dict[int, str] = {}
+        self._checked: dict[int, float] = {}     # monotonic time each SO was fetched or last revalidated
+        self._members: dict[str, dict[int, None]] = {g: {} for g in GROUPS}
+        self._totals: dict[str, dict[int, float]] = {g: {} for g in GROUPS}
+        if group_a or group_b:
+            self.set_groups(group_a, group_b)
+
+    # --- group state ---
+    @property
+    def group_a(self) -> list[int]:
+        return list(self._members["A"])
+
+    @property
+    def group_b(self) -> list[int]:
+        return list(self._members["B"])
+
+    @property
+    def not_found(self) -> list[int]:
+        """SO IDs requested so far that NetSuite did not return as Sales Orders."""
+        return sorted(self._missing)
+
+    def add(self, group: str, so_ids, *, progress=None, cancel: threading.Event | None = None) -> list[int]:
+        """
+        Add SOs to group "A" or "B", fetching only SOs this session has not seen.
+        Returns the IDs that were not found (they are not added).
+        """
+        group = self._group(group)
+        ids = [i for i in dict.fromkeys(int(s) for s in so_ids) if i not in self._members[group]]
+        self._fetch([i for i in ids if i not in self._vectors and i not in self._missing],
+                    progress=progress, cancel=cancel)
+        with self._lock:
+            totals = self._totals[group]
+            for so in ids:
+                vector = self._vectors.get(so)
+                if vector is None:
+                    continue
+                self._members[group][so] = None
+                for item, qty in vector.items():
+                    totals[item] = totals.get(item, 0.0) + qty
+        return [i for i in ids if i in self._missing]
+
+    def remove(self, group: str, so_ids) -> None:
+        """Remove SOs from a group; their vectors stay in the session for a later re-add."""
+        group = self._group(group)
+        with self._lock:
+            members, totals = self._members[group], self._totals[group]
+            for so in dict.fromkeys(int(s) for s in so_ids):
+                if so not in members:
+                    continue
+                del members[so]
+                for item, qty in self._vectors[so].items():
+                    left = totals.get(item, 0.0) - qty
+                    if abs(left) < ZERO_TOLERANCE:
+                        totals.pop(item, None)
+                    else:
+                        totals[item] = left
+
+    def revalidate(self, so_ids=None, *, max_age: float | None = None,
+                   cancel: threading.Event | None = None) -> list[int]:
+        """
+        Compare the stamps of already-fetched SOs (all, or those among `so_ids`) not checked
+        within `max_age` seconds (default revalidate_after; 0 checks them all) with
+        NetSuite's lastmodifieddate in one check, and drop the ones that changed, were
+        deleted or have been created since they were reported missing. Returns those IDs.
+        """
+        max_age = self.revalidate_after if max_age is None else max_age
+        now = time.monotonic()
+        with self._lock:
+            known = [i for i in (self._vectors if so_ids is None else dict.fromkeys(int(s) for s in so_ids))
+                     if (i in self._vectors or i in self._missing) and now - self._checked.get(i, 0.0) >= max_age]
+        if not known:
+            return []
+        with core.get_client().cancellation(cancel):
+            stamps = core.so_last_modified(known)
+            core.get_client().raise_if_cancelled()
+        stale = [i for i in known
+                 if (i in self._missing and i in stamps)
+                 or (i in self._vectors and stamps.get(i) != self._stamps.get(i))]
+        for g in GROUPS:
+            self.remove(g, stale)
+        with self._lock:
+            for i in known:
+                self._checked[i] = now
+            for i in stale:
+                self._vectors.pop(i, None)
+                self._missing.discard(i)
+                self._stamps.pop(i, None)
+                self._checked.pop(i, None)
+        if stale:
+            print(f"Session: {len(stale)} Sales Orders changed in NetSuite since they were fetched")
+        return stale
+
+    def set_groups(self, group_a, group_b, *, progress=None, cancel: threading.Event | None = None) -> list[int]:
+        """
+        Bring both groups to exactly these IDs by adding/removing only the differences.
+        New SOs for both groups are fetched in one batch. Returns the IDs not found.
+        """
+        wanted = {"A": [int(i) for i in group_a], "B": [int(i) for i in group_b]}
+        new = [i for i in dict.fromkeys(wanted["A"] + wanted["B"])
+               if i not in self._vectors and i not in self._missing]
+        self._fetch(new, progress=progress, cancel=cancel)
+        missing = []
+        for g in GROUPS:
+            keep = set(wanted[g])
+            self.remove(g, [so for so in self._members[g] if so not in keep])
+            missing.extend(self.add(g, wanted[g]))
+        return list(dict.fromkeys(missing))
+
+    def result(self) -> pd.DataFrame:
+        """Current A - B by item, in the same shape and order as compare_groups_a_minus_b."""
+        with self._lock:
+            frames = [self._totals_frame(g) for g in GROUPS]
+        return core.diff_lines(*frames)
+
+    # --- internals ---
+    @staticmethod
+    def _group(group: str) -> str:
+        g = str(group).strip().upper()
+        if g not in GROUPS:
+            raise ValueError(f"group must be 'A' or 'B', not {group!r}")
+        return g
+
+    def _totals_frame(self, group: str) -> pd.DataFrame:
+        # One pseudo-line per item: diff_lines then aggregates items, not lines. Totals are
+        # rounded so A and B built up in different add/remove orders compare equal.
+        totals = self._totals[group]
+        items = list(totals)
+        return core._normalize_lines(pd.DataFrame({
+            "so_id": [0] * len(items),
+            "item_id": [None if i == core.bomdiff_engine.MISSING_ITEM_ID else i for i in items],
+            "item_name": [self._names.get(i) for i in items],
+            "line_qty": [round(totals[i], QTY_DECIMALS) for i in items],
+        }, columns=core.LINE_COLUMNS))
+
+    def _fetch(self, so_ids: list[int], *, progress=None, cancel: threading.Event | None = None) -> None:
+        if not so_ids:
+            return
+        client = core.get_client()
+        with client.cancellation(cancel):
+            if self._backend is None:
+                self._backend = core.probe_backend()
+            if self._backend == "suiteql":
+                data = core.fetch_so_data(so_ids, use_cache=self.use_cache, refresh=self.refresh,
+                                          progress=progress)
+                found, lines = data.found, data.lines
+                stamps = dict(zip(data.headers["id"].astype(int), data.headers["last_modified"].astype(str)))
+            else:
+                # Stamps first: an edit landing during the download is caught by the next revalidate.
+                # Without SuiteQL stamps, one header GET per SO serves the stamp and the download.
+                headers = None if core.suiteql_reads_transactions() else core.rest_get_headers(so_ids)
+                stamps = core.so_last_modified(so_ids, headers=headers)
+                records = core.fetch_salesorders_rest(so_ids, use_cache=self.use_cache, refresh=self.refresh,
+                                                      progress=progress, headers=headers)
+                found = {so for so, data in records.items() if not data.get("_not_found")}
+                lines = core.fetch_so_lines_rest([i for i in so_ids if i in found], records)
+            if self.explode:
+                if self._exploder is None:
+                    self._exploder = core.bom_exploder(refresh=self.refresh)
+                lines = core.explode_lines(lines, exploder=self._exploder)
+            client.raise_if_cancelled()
+        print(f"Session: fetched {len(found)} new Sales Orders out of {len(so_ids)} IDs")
+        self._store(lines, found, so_ids, stamps)
+
+    def _store(self, lines: pd.DataFrame, found: set[int], so_ids: list[int], stamps: dict[int, str]) -> None:
+        ids = lines["item_id"].to_numpy(dtype="int64", na_value=core.bomdiff_engine.MISSING_ITEM_ID)
+        qty = lines["line_qty"].to_numpy(dtype="float64")
+        work = pd.DataFrame({"so_id": lines["so_id"].to_numpy(dtype="int64", na_value=-1), "item_id": ids,
+                             "qty": abs(qty) if self.absolute else qty})
+        per_so = work.groupby(["so_id", "item_id"], sort=False)["qty"].sum()
+        now = time.monotonic()
+        with self._lock:
+            for so in so_ids:
+                self._checked[so] = now
+                if so in found:
+                    self._vectors.setdefault(so, {})
+                    if so in stamps:
+                        self._stamps[so] = stamps[so]
+                else:
+                    self._missing.add(so)
+            for (so, item), qty in per_so.items():
+                self._vectors[int(so)][int(item)] = float(qty)
+            firsts = ~pd.Series(ids).duplicated().to_numpy()
+            for item, name in zip(ids[firsts], lines["item_name"].to_numpy(dtype=object)[firsts]):
+                self._names.setdefault(int(item), None if not isinstance(name, str) else name)
@@ -0,0 +1,128 @@
+# Offline snapshots of Sales Order lines: a directory of NumPy column files (.npy) plus a
+# manifest, written once from NetSuite and replayed through memory-mapped reads. A replay
+# touches only the pages holding the requested orders' lines, so what-if diffs over a
+# year of orders run locally without a single NetSuite call.
+#
+#   python so_bomdiff.py --a-where "date>=2024-01-01 date<=2024-12-31" --export-snapshot fy2024.bomsnap
+#   python so_bomdiff.py --snapshot fy2024.bomsnap          # GROUP_A/B_SO_IDS against the snapshot
+#
+# Layout (lines are stored grouped by order, orders sorted by internal ID):
+#   manifest.json                        format, realm, source, counts, created_at
+#   so_id, so_start                      order IDs and each order's first line (len orders + 1)
+#   tranid, last_modified                header fields per order
+#   line_item, line_qty                  item id (MISSING_ITEM_ID when empty) and quantity per line
+#   item_id, item_name                   item names known at export time, sorted by item id
+
+import json, os, time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from bomdiff_engine import MISSING_ITEM_ID
+
+SNAPSHOT_FORMAT = 1
+_COLUMNS = ("so_id", "so_start", "tranid", "last_modified", "line_item", "line_qty", "item_id", "item_name")
+
+def _text_array(values) -> np.ndarray:
+    # Fixed-width unicode (not object) so the column can be memory-mapped
+    values = ["" if v is None or v is pd.NA or (isinstance(v, float) and np.isnan(v)) else str(v) for v in values]
+    return np.array(values, dtype=f"<U{max(1, max(map(len, values), default=1))}")
+
+def write_snapshot(path: str | os.PathLike, headers: pd.DataFrame, lines: pd.DataFrame,
+                   names: dict[int, str | None], *, realm: str = "", source: str = "") -> Path:
+    """
+    Write `headers` (id, tranid, last_modified) and `lines` (so_id, item_id, line_qty) of
+    the orders to export, plus `names` ({item_id: name}), as a snapshot directory.
+    The manifest is written last, so a directory without one is an unfinished export.
+    """
+    out = Path(path)
+    out.mkdir(parents=True, exist_ok=True)
+    manifest = out / "manifest.json"
+    if manifest.exists():
+        manifest.unlink()
+
+    heads = headers.drop_duplicates("id").sort_values("id", kind="stable")
+    so_ids = heads["id"].to_numpy(dtype="int64")
+    line_so = lines["so_id"].to_numpy(dtype="int64")
+    keep = np.isin(line_so, so_ids)
+    # Stable sort keeps each order's lines in their NetSuite order
+    order = np.argsort(line_so[keep], kind="stable")
+    line_so = line_so[keep][order]
+    line_item = lines["item_id"].to_numpy(dtype="int64", na_value=MISSING_ITEM_ID)[keep][order]
+    line_qty = lines["line_qty"].to_numpy(dtype="float64")[keep][order]
+    so_start = np.searchsorted(line_so, np.append(so_ids, np.iinfo(np.int64).max)).astype("int64")
+
+    named = sorted((int(i), n) for i, n in names.items() if n is not None)
+    columns = {
+        "so_id": so_ids, "so_start": so_start,
+        "tranid": _text_array(heads["tranid"]), "last_modified": _text_array(heads["last_modified"]),
+        "line_item": line_item, "line_qty": line_qty,
+        "item_id": np.array([i for i, _ in named], dtype="int64"),
+        "item_name": _text_array(n for _, n in named),
+    }
+    for name, values in columns.items():
+        np.save(out / f"{name}.npy", values, allow_pickle=False)
+    manifest.write_text(json.dumps({
+        "format": SNAPSHOT_FORMAT, "realm": realm, "source": source,
+        "orders": int(len(so_ids)), "lines": int(len(line_qty)), "items": len(named),
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }, indent=2), encoding="utf-8")
+    return out
+
+class Snapshot:
+    """A snapshot directory opened for replay; columns are memory-mapped, not loaded."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = Path(path)
+        try:
+            self.manifest = json.loads((self.path / "manifest.json").read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise ValueError(f"{self.path} is not a BoM diff snapshot (no manifest.json; unfinished export?)") from None
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{self.path}: unsupported snapshot format {self.manifest.get('format')!r}")
+        cols = {name: np.load(self.path / f"{name}.npy", mmap_mode="r", allow_pickle=False) for name in _COLUMNS}
+        (self.so_id, self.so_start, self.tranid, self.last_modified,
+         self.line_item, self.line_qty, self.item_id, self.item_name) = (cols[name] for name in _COLUMNS)
+
+    def describe(self) -> str:
+        m = self.manifest
+        return (f"{self.path} ({m['orders']} Sales Orders, {m['lines']} lines, "
+                f"{m.get('source') or 'unknown source'}, taken {m['created_at']})")
+
+    def _positions(self, so_ids) -> np.ndarray:
+        """Positions in so_id of the requested orders present in the snapshot (first-seen order)."""
+        ids = np.array(list(dict.fromkeys(int(i) for i in so_ids)), dtype="int64")
+        pos = np.searchsorted(self.so_id, ids)
+        pos = np.minimum(pos, max(len(self.so_id) - 1, 0))
+        return pos[self.so_id[pos] == ids] if len(self.so_id) else pos[:0]
+
+    def headers_for(self, so_ids) -> pd.DataFrame:
+        """id, tranid, type, last_modified of the requested orders found in the snapshot."""
+        pos = self._positions(so_ids)
+        return pd.DataFrame({
+            "id": pd.array(self.so_id[pos], dtype="Int64"),
+            "tranid": self.tranid[pos].tolist(),
+            "type": "SalesOrd",
+            "last_modified": self.last_modified[pos].tolist(),
+        })
+
+    def lines_for(self, so_ids) -> pd.DataFrame:
+        """so_id, item_id, item_name, line_qty of the requested orders (only their lines are read)."""
+        pos = self._positions(so_ids)
+        starts, ends = self.so_start[pos], self.so_start[pos + 1]
+        counts = ends - starts
+        # Line indices of every requested order: each run starts at its order's so_start
+        idx = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        items = np.asarray(self.line_item[idx])
+        names = np.full(len(items), None, dtype=object)
+        if len(self.item_id):
+            hit = np.minimum(np.searchsorted(self.item_id, items), len(self.item_id) - 1)
+            known = self.item_id[hit] == items
+            names[known] = self.item_name[hit[known]]
+        return pd.DataFrame({
+            "so_id": pd.array(np.repeat(self.so_id[pos], counts), dtype="Int64"),
+            "item_id": pd.arrays.IntegerArray(items, items == MISSING_ITEM_ID),
+            "item_name": names,
+            "line_qty": np.asarray(self.line_qty[idx], dtype="float64"),
+        })
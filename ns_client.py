@@ -0,0 +1,504 @@
+# NetSuite REST client shared by the SuiteQL and REST Records paths.
+# One instance owns a pooled keep-alive requests.Session and a pre-built OAuth1 signer,
+# so repeated calls reuse TCP/TLS connections to the suitetalk domain.
+
+import copy, random, re, threading, time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests_oauthlib import OAuth1
+from oauthlib.oauth1 import SIGNATURE_HMAC_SHA256
+
+from bomdiff_metrics import METRICS, Metrics
+
+# SuiteQL paging: NetSuite caps "limit" at 1000 rows per page. Pages after the first
+# are requested ahead of the consumer so the next page is usually already in flight.
+SUITEQL_PAGE_SIZE = 1000
+SUITEQL_PREFETCH  = 4
+# REST Records sublist paging (e.g. salesorder/{id}/item): lines per page
+SUBLIST_PAGE_SIZE = 1000
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT   = 30
+
+# IN-list chunking: large ID sets are split into chunks whose size adapts to the
+# latency and errors seen so far, and the chunks run concurrently.
+DEFAULT_CHUNK_SIZE    = 500
+DEFAULT_CHUNK_MIN     = 25
+DEFAULT_CHUNK_MAX     = 1000
+DEFAULT_CHUNK_WORKERS = 4
+CHUNK_TARGET_SECONDS  = 3.0
+# Statuses NetSuite returns when a statement is too long / has too many IN values. A 400
+# only counts when its body says so: denied tables and bad SQL are 400s too, and halving
+# those would just repeat the failure (and shrink the chunker for the whole process).
+CHUNK_SPLIT_STATUSES  = (413, 414)
+CHUNK_SPLIT_400_BODY  = re.compile(r"too (?:long|large|many)|exceed|ORA-01795|ORA-01489", re.I)
+
+# Concurrency governor: NetSuite enforces one concurrency pool per account, shared with
+# every other integration, so in-flight requests are capped per realm (not per client).
+DEFAULT_MAX_IN_FLIGHT = 5
+DEFAULT_RATE_PER_SEC  = 0.0     # 0 = no request-rate limit, only the in-flight cap
+DEFAULT_MAX_RETRIES   = 5
+BACKOFF_BASE_SECONDS  = 0.5
+BACKOFF_CAP_SECONDS   = 30.0
+# Throttled (429) and transient server/gateway failures are retried
+RETRY_STATUSES        = (429, 500, 502, 503, 504)
+
+class Cancelled(Exception):
+    """Raised instead of sending a request once the client's active cancel event is set."""
+
+class RequestGovernor:
+    """
+    Per-account request scheduler: a semaphore caps in-flight requests, an optional
+    token bucket caps the start rate, and a 429 pauses every caller until the
+    backoff/Retry-After window has passed. Counts requests, throttles and retries.
+    """
+
+    def __init__(self, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 rate_per_sec: float = DEFAULT_RATE_PER_SEC, burst: int | None = None):
+        self.max_in_flight = max(1, int(max_in_flight))
+        self.rate_per_sec = float(rate_per_sec or 0)
+        self.burst = float(burst or self.max_in_flight)
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._not_before = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "transient_errors": 0, "wait_seconds": 0.0}
+
+    def _wait_turn(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._not_before - now)
+            if self.rate_per_sec > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_per_sec)
+                self._refilled = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate_per_sec)
+            self.stats["requests"] += 1
+            self.stats["wait_seconds"] += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    @contextmanager
+    def slot(self):
+        with self._slots:
+            self._wait_turn()
+            yield
+
+    def note_retry(self, status: int | None, delay: float) -> None:
+        with self._lock:
+            self.stats["retries"] += 1
+            if status == 429:
+                self.stats["throttled"] += 1
+                # Back everyone off, not just the caller that got throttled
+                self._not_before = max(self._not_before, time.monotonic() + delay)
+            else:
+                self.stats["transient_errors"] += 1
+
+    def summary(self) -> str:
+        st = self.stats
+        return (f"{st['requests']} requests, {st['throttled']} throttled (429), "
+                f"{st['transient_errors']} transient errors, {st['retries']} retries, "
+                f"{st['wait_seconds']:.1f}s queued")
+
+_governors: dict[str, RequestGovernor] = {}
+_governors_lock = threading.Lock()
+
+def governor_for(realm: str, **kwargs) -> RequestGovernor:
+    """Return the process-wide governor for an account, creating it on first use."""
+    key = realm.strip().upper()
+    with _governors_lock:
+        if key not in _governors:
+            _governors[key] = RequestGovernor(**kwargs)
+        return _governors[key]
+
+def _retry_after_seconds(r: requests.Response | None) -> float | None:
+    value = r.headers.get("Retry-After") if r is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+def _copy_exception(e: BaseException) -> BaseException:
+    """A copy for each waiting thread, so their tracebacks do not pile onto the shared one."""
+    try:
+        return copy.copy(e).with_traceback(None)
+    except Exception:
+        return e
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: the first caller for a key runs fn(), callers
+    arriving while it is in flight wait for and share its result (or its exception).
+    Nothing is kept once the call completes, so later callers run fn() again.
+    do() returns (result, shared), shared being True for callers that waited.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = [threading.Event(), None, None]
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            call[0].wait()
+            if call[2] is not None:
+                raise _copy_exception(call[2])
+            return call[1], True
+        try:
+            call[1] = fn()
+            return call[1], False
+        except BaseException as e:
+            call[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call[0].set()
+
+def chunk_too_large(e: requests.HTTPError) -> bool:
+    """True if a failed chunked call was rejected for its size (so halving the chunk can help)."""
+    r = e.response
+    if r is None:
+        return False
+    if r.status_code in CHUNK_SPLIT_STATUSES:
+        return True
+    return r.status_code == 400 and CHUNK_SPLIT_400_BODY.search(r.text or "") is not None
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+class AdaptiveChunker:
+    """
+    Hands out chunk sizes for IN-lists. Fast chunks grow the size, slow chunks shrink it,
+    and a rejected chunk halves it. Shared by all chunked calls on one client.
+    """
+
+    def __init__(self, size: int = DEFAULT_CHUNK_SIZE, *,
+                 min_size: int = DEFAULT_CHUNK_MIN, max_size: int = DEFAULT_CHUNK_MAX,
+                 target_seconds: float = CHUNK_TARGET_SECONDS):
+        self.min_size = max(1, int(min_size))
+        self.max_size = max(self.min_size, int(max_size))
+        self.size = min(max(int(size), self.min_size), self.max_size)
+        self.target_seconds = target_seconds
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, n: int, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            if not ok:
+                self.errors += 1
+                self.size = max(self.min_size, min(self.size, n) // 2)
+            elif seconds < self.target_seconds / 2 and n >= self.size:
+                self.size = min(self.max_size, int(self.size * 1.5))
+            elif seconds > self.target_seconds:
+                self.size = max(self.min_size, int(self.size * 0.7))
+
+class NetSuiteClient:
+    def __init__(self, realm: str, domain: str,
+                 consumer_key: str, consumer_secret: str,
+                 token_id: str, token_secret: str, *,
+                 pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: int = DEFAULT_TIMEOUT,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 chunk_workers: int = DEFAULT_CHUNK_WORKERS,
+                 max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+                 rate_per_sec: float = DEFAULT_RATE_PER_SEC,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 metrics: Metrics | None = None):
+        self.realm = realm.strip()
+        self.base_url = domain.strip().rstrip("/")
+        self.timeout = timeout
+        self.pool_size = max(1, int(pool_size))
+        self.max_retries = max(0, int(max_retries))
+        self.governor = governor_for(self.realm, max_in_flight=max_in_flight, rate_per_sec=rate_per_sec)
+        self.chunker = AdaptiveChunker(chunk_size)
+        self.chunk_workers = max(1, int(chunk_workers))
+        self.metrics = metrics or METRICS
+        # The signer is stateless between requests (fresh nonce/timestamp per call)
+        self.auth = OAuth1(
+            consumer_key.strip(), consumer_secret.strip(), token_id.strip(), token_secret.strip(),
+            signature_method=SIGNATURE_HMAC_SHA256,
+            signature_type="AUTH_HEADER",
+            realm=self.realm,
+        )
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.auth = self.auth
+        self.session.headers.update({"Prefer": "transient"})
+        # Per-thread cancel event set by cancellation(): concurrent runs sharing this client
+        # each stop only their own requests. Pool threads inherit it through bind_cancel().
+        self._local = threading.local()
+        self._never = threading.Event()
+        # Identical SuiteQL pages / GETs requested concurrently share one call
+        self.flights = SingleFlight()
+
+    @contextmanager
+    def cancellation(self, event: threading.Event | None):
+        """
+        While active, setting `event` stops new requests made by this thread (and by pool
+        threads it starts through bind_cancel) and cuts their retry backoff short; other
+        threads' requests are unaffected. Requests already on the wire finish or time out.
+        """
+        if event is None:
+            yield
+            return
+        prev = getattr(self._local, "cancel", None)
+        self._local.cancel = event
+        try:
+            yield
+        finally:
+            self._local.cancel = prev
+
+    @property
+    def _cancel(self) -> threading.Event:
+        return getattr(self._local, "cancel", None) or self._never
+
+    def bind_cancel(self, fn):
+        """fn wrapped to run under the calling thread's cancel event, for use in worker threads."""
+        event = self._cancel
+
+        def bound(*args, **kwargs):
+            with self.cancellation(event):
+                return fn(*args, **kwargs)
+        return bound
+
+    def raise_if_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise Cancelled("Cancelled")
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- raw HTTP ---
+    def request(self, method: str, path: str, *, timeout: int | None = None, **kwargs) -> requests.Response:
+        """
+        Send one request through the account governor. Throttled (429) and transient
+        (5xx, connection, timeout) failures are retried with jittered exponential
+        backoff, honoring Retry-After. The last response is returned (or the last
+        connection error raised) once retries are exhausted. Each call is recorded in
+        `metrics` with its final status, total seconds (queueing and retries included)
+        and response bytes.
+        """
+        url = path if path.startswith("http") else self.base_url + path
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            self.raise_if_cancelled()
+            r, err = None, None
+            with self.governor.slot():
+                try:
+                    r = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    err = e
+            if r is not None and r.status_code not in RETRY_STATUSES:
+                self._record(method, url, r, started, attempt)
+                return r
+            if attempt == self.max_retries:
+                self._record(method, url, r, started, attempt)
+                if r is not None:
+                    return r
+                raise err
+            delay = _retry_after_seconds(r)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            self.governor.note_retry(r.status_code if r is not None else None, delay)
+            # Wakes early on cancel; the next attempt then raises Cancelled
+            self._cancel.wait(delay)
+
+    def _record(self, method: str, url: str, r: requests.Response | None, started: float, retries: int) -> None:
+        self.metrics.record_request(method, url, r.status_code if r is not None else None,
+                                    time.perf_counter() - started, len(r.content) if r is not None else 0,
+                                    retries, start=started)
+
+    def _coalesced(self, key, fn):
+        """fn() through the single-flight table; shared calls count as "coalesced" cache hits."""
+        while True:
+            try:
+                value, shared = self.flights.do(key, fn)
+            except Cancelled:
+                # The leading caller's run was cancelled; only give up if ours is too,
+                # otherwise run the call again (leading it ourselves if no one else is)
+                self.raise_if_cancelled()
+                continue
+            self.metrics.cache("coalesced", hits=int(shared), misses=int(not shared))
+            return value
+
+    def get(self, path: str, *, coalesce: bool = True, **kwargs) -> requests.Response:
+        """
+        GET `path`. Concurrent GETs of the same URL and params share one request (and one
+        Response); coalesce=False always sends its own.
+        """
+        if not coalesce or set(kwargs) - {"params"}:
+            return self.request("GET", path, **kwargs)
+        params = kwargs.get("params")
+        key = ("GET", path, tuple(sorted((params or {}).items())))
+        return self._coalesced(key, lambda: self.request("GET", path, **kwargs))
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    # --- SuiteQL ---
+    def suiteql_page(self, sql: str, offset: int = 0, limit: int = SUITEQL_PAGE_SIZE,
+                     *, timeout: int | None = None) -> dict:
+        """
+        One page of a SuiteQL result. Concurrent requests for the same statement and page
+        share one call and its decoded page (treat it as read-only).
+        """
+        def fetch() -> dict:
+            r = self.post("/services/rest/query/v1/suiteql",
+                          params={"limit": limit, "offset": offset}, json={"q": sql}, timeout=timeout)
+            try:
+                r.raise_for_status()
+            except Exception:
+                print("Status:", r.status_code)
+                print("Body:", r.text[:1000])
+                print("SQL:", sql.strip()[:500])
+                raise
+            return r.json()
+        return self._coalesced(("SUITEQL", sql, offset, limit), fetch)
+
+    def suiteql_pages(self, sql: str, *, page_size: int = SUITEQL_PAGE_SIZE,
+                      prefetch: int = SUITEQL_PREFETCH, timeout: int | None = None):
+        """
+        Yield SuiteQL result pages (lists of row dicts) in order until hasMore is false.
+        Once the first page reports totalResults, up to `prefetch` later pages are
+        fetched concurrently while the caller consumes the current one.
+        """
+        first = self.suiteql_page(sql, 0, page_size, timeout=timeout)
+        yield first.get("items", [])
+        if not first.get("hasMore"):
+            return
+
+        total = first.get("totalResults")
+        if total is None or prefetch <= 1:
+            # No total to plan against: walk the pages one at a time
+            offset = page_size
+            while True:
+                page = self.suiteql_page(sql, offset, page_size, timeout=timeout)
+                yield page.get("items", [])
+                if not page.get("hasMore"):
+                    return
+                offset += page_size
+
+        offsets = iter(range(page_size, int(total), page_size))
+        fetch = self.bind_cancel(lambda off: self.suiteql_page(sql, off, page_size, timeout=timeout))
+        with ThreadPoolExecutor(max_workers=min(prefetch, self.pool_size)) as pool:
+            pending = deque(pool.submit(fetch, off) for off in islice(offsets, prefetch))
+            try:
+                while pending:
+                    page = pending.popleft().result()
+                    nxt = next(offsets, None)
+                    if nxt is not None:
+                        pending.append(pool.submit(fetch, nxt))
+                    yield page.get("items", [])
+            finally:
+                for fut in pending:
+                    fut.cancel()
+
+    def suiteql(self, sql: str, **kwargs) -> list[dict]:
+        rows = []
+        for page in self.suiteql_pages(sql, **kwargs):
+            rows.extend(page)
+        return rows
+
+    # --- REST Records ---
+    def get_record(self, record_type: str, record_id: int, *, params: dict | None = None) -> requests.Response:
+        return self.get(f"/services/rest/record/v1/{record_type}/{int(record_id)}", params=params)
+
+    def get_sublist(self, record_type: str, record_id: int, sublist: str, *,
+                    params: dict | None = None) -> requests.Response:
+        """One page of a record's sublist, e.g. salesorder/{id}/item (use limit/offset to page)."""
+        return self.get(f"/services/rest/record/v1/{record_type}/{int(record_id)}/{sublist}", params=params)
+
+    # --- IN-list chunking ---
+    def map_chunks(self, ids: list[int], fn, *, workers: int | None = None, on_progress=None,
+                   id_weight: float = 1.0) -> list:
+        """
+        Split the de-duplicated `ids` into adaptive chunks, call fn(chunk) for each
+        concurrently (up to `workers`), and return the results in ID order.
+        A chunk rejected as too large (see chunk_too_large) is split in half and retried;
+        any other failure is raised at once.
+        id_weight: how many times fn writes each ID into its statement on average (e.g. an
+        IN-list repeated inside CASE expressions); chunks are that much smaller, so the
+        statement carries about as many IDs as one plain IN-list of the chunker's size.
+        on_progress(done_ids, total_ids) is called from the worker threads as chunks finish.
+        """
+        ids = list(dict.fromkeys(int(i) for i in ids or []))
+        if not ids:
+            return []
+        results: dict[int, object] = {}
+        cursor = [0]
+        done = [0]
+        lock = threading.Lock()
+
+        def take():
+            with lock:
+                start = cursor[0]
+                cursor[0] += max(1, int(self.chunker.size / id_weight))
+                return start, ids[start:cursor[0]]
+
+        def run(start: int, chunk: list[int]) -> None:
+            t0 = time.perf_counter()
+            try:
+                res = fn(chunk)
+            except requests.HTTPError as e:
+                if not chunk_too_large(e):
+                    raise
+                self.chunker.record(round(len(chunk) * id_weight), time.perf_counter() - t0, ok=False)
+                if len(chunk) <= 1 or len(chunk) * id_weight <= self.chunker.min_size:
+                    raise
+                half = len(chunk) // 2
+                run(start, chunk[:half])
+                run(start + half, chunk[half:])
+                return
+            self.chunker.record(round(len(chunk) * id_weight), time.perf_counter() - t0)
+            with lock:
+                results[start] = res
+                done[0] += len(chunk)
+                if on_progress is not None:
+                    on_progress(done[0], len(ids))
+
+        @self.bind_cancel
+        def worker() -> None:
+            while True:
+                self.raise_if_cancelled()
+                start, chunk = take()
+                if not chunk:
+                    return
+                run(start, chunk)
+
+        n = max(1, min(workers or self.chunk_workers, -(-len(ids) // self.chunker.min_size)))
+        with ThreadPoolExecutor(max_workers=n) as pool:
+            for fut in [pool.submit(worker) for _ in range(n)]:
+                fut.result()
+        return [results[k] for k in sorted(results)]
@@ -31,11 +31,13 @@ if fw_core.is_dir():
 
 print(f"[runtime_fix] removed={removed or 'none'} moved={moved or 'none'}")
 
-try:
-    import numpy
-    # Verify presence of compiled extension in the expected underscore dir
-    so_files = list((res_core).glob("_multiarray_umath*.so"))
-    print(f"[runtime_fix] numpy.__file__={numpy.__file__}")
-    print(f"[runtime_fix] _core so present={bool(so_files)} count={len(so_files)} names={[s.name for s in so_files]}")
-except Exception as e:
-    print(f"[runtime_fix] numpy probe failed: {e}")
\ No newline at end of file
+# The numpy import probe costs a full numpy import before the window shows: diagnostics only
+if "--diag" in sys.argv or (os.getenv("BOMDIFF_DIAG") or "").strip().lower() in ("1", "true", "yes", "on"):
+    try:
+        import numpy
+        # Verify presence of compiled extension in the expected underscore dir
+        so_files = list((res_core).glob("_multiarray_umath*.so"))
+        print(f"[runtime_fix] numpy.__file__={numpy.__file__}")
+        print(f"[runtime_fix] _core so present={bool(so_files)} count={len(so_files)} names={[s.name for s in so_files]}")
+    except Exception as e:
+        print(f"[runtime_fix] numpy probe failed: {e}")
\ No newline at end of file
@@ -4,339 +4,214 @@ GROUP_A_SO_IDS = [842689, 842688, 842687]  # ← Group A: Sales Order internal I
 GROUP_B_SO_IDS = [675219, 675227, 675220]  # ← Group B: Sales Order internal IDs
 OUTPUT_CSV  = "bomdiff_A_minus_B.csv"
 OUTPUT_XLSX = "bomdiff_A_minus_B.xlsx"
+# Outputs for N-group runs (--group LABEL=ID,ID,... given more than once)
+OUTPUT_MATRIX_CSV  = "bomdiff_group_matrix.csv"
+OUTPUT_MATRIX_XLSX = "bomdiff_group_matrix.xlsx"
 # ========================================================
 
 # If True, aggregate uses absolute value of each line's quantity (treat negative as positive count)
 COUNT_ABSOLUTE_LINE_QTY = True
 
-import os, requests, pandas as pd, time
-from requests_oauthlib import OAuth1
-from oauthlib.oauth1 import SIGNATURE_HMAC_SHA256
-from dotenv import load_dotenv
-
-load_dotenv(override=True)  # force .env to override any OS env vars
-
-REALM  = os.getenv("NS_ACCOUNT_REALM")
-DOMAIN = os.getenv("NS_REST_DOMAIN")
-CK     = os.getenv("NS_CONSUMER_KEY")
-CS     = os.getenv("NS_CONSUMER_SECRET")
-TID    = os.getenv("NS_TOKEN_ID")
-TS     = os.getenv("NS_TOKEN_SECRET")
-
-def mask(v):
-    if not v: return "(missing)"
-    v = v.strip()
-    return f"{v[:4]}…{v[-4:]} (len {len(v)})"
-
-def debug_env():
-    print("\n--- DEBUG ENV ---")
-    print("CWD:", os.getcwd())
-    print("REALM:", repr(REALM))
-    print("DOMAIN:", repr(DOMAIN))
-    print("CK:", mask(CK))
-    print("CS:", mask(CS))
-    print("TID:", mask(TID))
-    print("TS:", mask(TS))
-    print("--- END DEBUG ---\n")
-
-def suiteql(sql: str, *, timeout: int = 30):
-    if not all([REALM, DOMAIN, CK, CS, TID, TS]):
-        raise SystemExit("Missing one or more values in .env (realm/domain/keys/tokens).")
-    url = DOMAIN.rstrip("/") + "/services/rest/query/v1/suiteql"
-    auth = OAuth1(
-        CK.strip(), CS.strip(), TID.strip(), TS.strip(),
-        signature_method=SIGNATURE_HMAC_SHA256,
-        signature_type="AUTH_HEADER",
-        realm=REALM.strip(),
-    )
-    r = requests.post(url, json={"q": sql}, auth=auth, headers={"Prefer": "transient"}, timeout=timeout)
+# All NetSuite/diff helpers live in the core module shared with the GUI
+import os
+import so_bomdiff_application as core
+from bomdiff_metrics import METRICS, profiled
+from so_bomdiff_application import (
+    debug_env, probe_backend, verify_so_ids, verify_so_ids_rest, fetch_salesorders_rest,
+    debug_negative_lines, fetch_so_data,
+    compare_groups_a_minus_b, compare_groups_a_minus_b_rest, compare_groups_a_minus_b_pushdown,
+    write_outputs, run_matrix, run_diff,
+)
+from bomdiff_criteria import parse_criteria
+
+core.COUNT_ABSOLUTE_LINE_QTY = COUNT_ABSOLUTE_LINE_QTY
+
+def _parse_group(text: str) -> tuple[str, list[int]]:
+    import argparse
+    label, sep, ids = text.partition("=")
     try:
-        r.raise_for_status()
-    except Exception:
-        print("Status:", r.status_code)
-        print("Body:", r.text[:1000])
-        print("SQL:", sql.strip()[:500])
-        raise
-    return r.json().get("items", [])
-
-def suiteql_df(sql: str) -> pd.DataFrame:
-    rows = suiteql(sql)
-    return pd.DataFrame(rows) if rows else pd.DataFrame()
-
-# --- REST Records helpers (fallback when SuiteQL tables are unavailable) ---
-def _make_auth():
-    return OAuth1(
-        CK.strip(), CS.strip(), TID.strip(), TS.strip(),
-        signature_method=SIGNATURE_HMAC_SHA256,
-        signature_type="AUTH_HEADER",
-        realm=REALM.strip(),
-    )
-
-def rest_get_salesorder(so_id: int) -> dict:
-    url = DOMAIN.rstrip("/") + f"/services/rest/record/v1/salesorder/{int(so_id)}?expandSubResources=true"
-    r = requests.get(url, auth=_make_auth(), headers={"Prefer": "transient"}, timeout=30)
-    if r.status_code == 404:
-        return {"_not_found": True}
-    if not r.ok:
-        # Always show the server response to diagnose
-        print(f"REST Records HTTP {r.status_code} for SO {so_id}. Response body:\n{r.text[:1000]}")
-        raise SystemExit(
-            "REST Records call was denied. Likely role access to the record is restricted. Check:\n"
-            "- You are using the same 'Developer' role as the access token when testing in the UI\n"
-            "- Transactions → Sales Order: View\n"
-            "- Transactions → Find Transactions: View\n"
-            "- Lists → Items: View and Lists → Customers: View\n"
-            "- Role Subsidiaries include the SO's subsidiary (or set to All). If OneWorld, consider 'Allow Cross-Subsidiary Record Viewing'\n"
-            "Open one SO in the UI with the Developer role; if it fails there, adjust the role and retry."
-        )
-    return r.json()
-
-def verify_so_ids_rest(so_ids: list[int], label: str):
-    if not so_ids:
-        print(f"{label}: 0 IDs provided")
-        return
-    found = []
-    missing = []
-    for i in so_ids:
-        data = rest_get_salesorder(int(i))
-        if data.get("_not_found"):
-            missing.append(i)
-        else:
-            tranid = data.get("tranId") or data.get("tranid") or ""
-            found.append((i, tranid))
-    print(f"{label} (REST): found {len(found)} Sales Orders out of {len(so_ids)} IDs")
-    for i, tran in found[:10]:
-        print(f"  {i} → {tran}")
-    if missing:
-        print("  Missing:", ", ".join(map(str, missing)))
-
-def fetch_so_lines_rest(so_ids: list[int]) -> pd.DataFrame:
-    rows = []
-    for so in so_ids or []:
-        data = rest_get_salesorder(int(so))
-        if data.get("_not_found"):
-            continue
-        # Sublist may be named "item"
-        sub = data.get("item") or []
-        for line in sub:
-            # Skip closed/description-only lines if present
-            if line.get("isClosed") is True:
-                continue
-            itm = line.get("item") or {}
-            item_id_raw = itm.get("id") or itm.get("value")
-            try:
-                item_id = int(item_id_raw) if item_id_raw is not None else None
-            except Exception:
-                item_id = None
-            item_name = itm.get("refName") or itm.get("text") or itm.get("name") or ""
-            qty = line.get("quantity")
-            try:
-                qty = float(qty) if qty is not None else 0.0
-            except Exception:
-                qty = 0.0
-            rows.append({"so_id": int(so), "item_id": item_id, "item_name": item_name, "line_qty": qty})
-    return pd.DataFrame(rows, columns=["so_id","item_id","item_name","line_qty"])
-
-def verify_so_ids(so_ids: list[int], label: str):
-    """
-    Verifies that the provided Sales Order internal IDs exist and are of type 'SalesOrd'.
-    """
-    if not so_ids:
-        print(f"{label}: 0 IDs provided")
-        return
-    id_list = ",".join(str(int(i)) for i in so_ids)
-    sql = f"""
-        SELECT id, tranid, "type"
-        FROM "transaction"
-        WHERE id IN ({id_list})
-          AND "type" = 'SalesOrd'
-    """
-    df = suiteql_df(sql)
-    print(f"{label}: found {len(df)} Sales Orders out of {len(so_ids)} IDs")
-    if not df.empty:
-        print(df[["id","tranid","type"]].to_string(index=False))
-
-def fetch_so_lines(so_ids: list[int]) -> pd.DataFrame:
-    """
-    Fetch non-mainline Sales Order lines for the given internal IDs.
-    Returns: so_id, item_id, item_name, line_qty
-    """
-    if not so_ids:
-        return pd.DataFrame(columns=["so_id","item_id","item_name","line_qty"])
-    id_list = ",".join(str(int(i)) for i in so_ids)
-    sql = f"""
-        SELECT
-            tl.transaction AS so_id,
-            tl.item        AS item_id,
-            i.itemid       AS item_name,
-            tl.quantity    AS line_qty
-        FROM "transactionline" tl
-        LEFT JOIN "item" i ON i.id = tl.item
-        WHERE tl.transaction IN ({id_list})
-          AND tl.mainline = 'F'
-    """
-    df = suiteql_df(sql)
-    if df.empty:
-        return pd.DataFrame(columns=["so_id","item_id","item_name","line_qty"])
-    df["line_qty"] = pd.to_numeric(df["line_qty"], errors="coerce").fillna(0.0)
-    return df
-
-def aggregate_by_item(lines: pd.DataFrame) -> pd.DataFrame:
-    """
-    Aggregate total quantity per item across all provided SO lines.
-    If COUNT_ABSOLUTE_LINE_QTY is True, negative line quantities are converted to positive
-    before summing (useful when negative lines represent reversals/credits you still want to
-    count as occurrences of the part).
-    """
-    if lines.empty:
-        return pd.DataFrame(columns=["item_id","item_name","total_qty"])
-    work = lines.copy()
-    if COUNT_ABSOLUTE_LINE_QTY:
-        work["line_qty_for_sum"] = work["line_qty"].abs()
-    else:
-        work["line_qty_for_sum"] = work["line_qty"]
-
-    agg = (
-        work.groupby(["item_id","item_name"], dropna=False, as_index=False)["line_qty_for_sum"]
-        .sum()
-        .rename(columns={"line_qty_for_sum":"total_qty"})
-    )
-    return agg
-
-def debug_negative_lines(so_ids: list[int]):
-    """
-    List any transaction lines with negative quantity (before absolute normalization)
-    so you can audit why they appeared.
-    """
-    if not so_ids:
-        return
-    id_list = ",".join(str(int(i)) for i in so_ids)
-    sql = f"""
-        SELECT
-            tl.transaction AS so_id,
-            tl.item        AS item_id,
-            i.itemid       AS item_name,
-            tl.quantity    AS line_qty
-        FROM "transactionline" tl
-        LEFT JOIN "item" i ON i.id = tl.item
-        WHERE tl.transaction IN ({id_list})
-          AND tl.mainline = 'F'
-          AND tl.quantity < 0
-        ORDER BY so_id, item_name
-    """
-    df = suiteql_df(sql)
-    if df.empty:
-        print("No negative line quantities in these SOs.")
-    else:
-        print("Negative line quantities (raw, before abs):")
-        print(df.to_string(index=False))
-
-def compare_groups_a_minus_b(group_a: list[int], group_b: list[int]) -> pd.DataFrame:
-    """
-    Compute (A - B) by item. Missing items count as 0. Drop zero diffs.
-    """
-    a_items = aggregate_by_item(fetch_so_lines(group_a)).rename(columns={"total_qty":"qty_A"})
-    b_items = aggregate_by_item(fetch_so_lines(group_b)).rename(columns={"total_qty":"qty_B"})
-
-    merged = pd.merge(a_items, b_items, on=["item_id","item_name"], how="outer").fillna({"qty_A":0.0, "qty_B":0.0})
-    merged["diff_A_minus_B"] = merged["qty_A"] - merged["qty_B"]
-    merged = merged[merged["diff_A_minus_B"] != 0].copy()
-    # If values are whole numbers, cast to int for cleaner output
-    for c in ("qty_A","qty_B","diff_A_minus_B"):
-        if (merged[c] % 1 == 0).all():
-            merged[c] = merged[c].astype(int)
-    merged = merged.sort_values(by=["item_name","item_id"]).reset_index(drop=True)
-    return merged
-
-def compare_groups_a_minus_b_rest(group_a: list[int], group_b: list[int]) -> pd.DataFrame:
-    a_items = aggregate_by_item(fetch_so_lines_rest(group_a)).rename(columns={"total_qty":"qty_A"})
-    b_items = aggregate_by_item(fetch_so_lines_rest(group_b)).rename(columns={"total_qty":"qty_B"})
-    merged = pd.merge(a_items, b_items, on=["item_id","item_name"], how="outer").fillna({"qty_A":0.0, "qty_B":0.0})
-    merged["diff_A_minus_B"] = merged["qty_A"] - merged["qty_B"]
-    merged = merged[merged["diff_A_minus_B"] != 0].copy()
-    for c in ("qty_A","qty_B","diff_A_minus_B"):
-        if (merged[c] % 1 == 0).all():
-            merged[c] = merged[c].astype(int)
-    merged = merged.sort_values(by=["item_name","item_id"]).reset_index(drop=True)
-    return merged
-
-# NEW: return a boolean instead of hard stop; we’ll fall back to REST if needed
-def check_required_records(required: tuple[str, ...] = ("item","transaction","transactionline")) -> bool:
-    inaccessible = []
-    for rec in required:
-        try:
-            suiteql(f'SELECT 1 FROM "{rec}" FETCH NEXT 1 ROWS ONLY')
-        except Exception:
-            inaccessible.append(rec)
-    if inaccessible:
-        print(
-            "SuiteQL record catalog not available for: " + ", ".join(inaccessible) + "\n"
-            "Falling back to REST Records for Sales Order lines."
-        )
-        return False
-    print("Record access OK for:", ", ".join(required))
-    return True
-
-def _detect_excel_engine() -> str | None:
+        so_ids = [int(x) for x in ids.replace(" ", ",").split(",") if x.strip()]
+    except ValueError:
+        so_ids = []
+    if not sep or not label.strip() or not so_ids:
+        raise argparse.ArgumentTypeError(f"expected LABEL=ID,ID,... but got {text!r}")
+    return label.strip(), so_ids
+
+def _parse_where(text: str):
+    import argparse
     try:
-        import openpyxl  # noqa: F401
-        return "openpyxl"
-    except Exception:
-        try:
-            import xlsxwriter  # noqa: F401
-            return "xlsxwriter"
-        except Exception:
-            return None
-
-def write_outputs(df: pd.DataFrame, csv_path: str, xlsx_path: str) -> None:
-    # Ensure a DataFrame and sane column order
-    df = df if isinstance(df, pd.DataFrame) else pd.DataFrame()
-    preferred = [c for c in ["item_id","item_name","qty_A","qty_B","diff_A_minus_B"] if c in df.columns]
-    if preferred:
-        df = df[preferred]
-
-    # Always write CSV (no extra deps)
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-
-    # Optionally write XLSX if a writer is available and a path was provided
-    wrote_xlsx = False
-    if xlsx_path:
-        engine = _detect_excel_engine()
-        if engine:
-            with pd.ExcelWriter(xlsx_path, engine=engine) as xw:
-                df.to_excel(xw, index=False, sheet_name="A_minus_B")
-            wrote_xlsx = True
-
-    print("Wrote outputs:")
-    print(" -", os.path.abspath(csv_path))
-    if wrote_xlsx:
-        print(" -", os.path.abspath(xlsx_path))
-    else:
-        if xlsx_path:
-            print(" - Skipped XLSX (install 'openpyxl' or 'xlsxwriter' to enable)")
-
-if __name__ == "__main__":
+        return parse_criteria(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def _parse_args(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="BoM diff (A minus B) on Sales Order line items")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="bypass the local SO cache and fetch everything from NetSuite")
+    ap.add_argument("--refresh", action="store_true",
+                    help="refetch every SO and rewrite its cache entry")
+    ap.add_argument("--reprobe", action="store_true",
+                    help="ignore the cached SuiteQL/REST backend choice and probe table access again")
+    ap.add_argument("--pushdown", action="store_true",
+                    help="compute the A - B totals inside NetSuite and download only non-zero items")
+    ap.add_argument("--explode", action="store_true",
+                    help="expand assembly/kit lines into their leaf components before diffing")
+    ap.add_argument("--stream", action="store_true",
+                    help="fold SuiteQL pages into running per-item totals instead of holding every line "
+                         "(bounded memory for very large groups; bypasses the SO cache)")
+    ap.add_argument("--a-where", type=_parse_where, metavar="CRITERIA",
+                    help="select Group A by criteria instead of GROUP_A_SO_IDS, e.g. "
+                         "'date>=2024-01-01 date<=2024-03-31 customer=5012 status=B,D tranid=SO10*'")
+    ap.add_argument("--b-where", type=_parse_where, metavar="CRITERIA",
+                    help="select Group B by criteria instead of GROUP_B_SO_IDS")
+    ap.add_argument("--group", action="append", type=_parse_group, metavar="LABEL=ID,ID,...",
+                    help="compare N groups in one run (repeat per group); writes an items x groups matrix")
+    ap.add_argument("--baseline", metavar="LABEL",
+                    help="group the others are diffed against (default: the first --group)")
+    ap.add_argument("--pairwise", action="store_true",
+                    help="diff every pair of groups instead of each group against the baseline")
+    ap.add_argument("--batch", metavar="JOBS",
+                    help="run every A/B job in a CSV/JSON/YAML job file, fetching each distinct SO once")
+    ap.add_argument("--restart", action="store_true",
+                    help="with --batch: ignore the checkpoint and rerun every job")
+    ap.add_argument("--serve", action="store_true",
+                    help="run the local diff service (see bomdiff_service) instead of a single diff")
+    ap.add_argument("--service", nargs="?", const="", metavar="URL",
+                    help="send the A/B diff to a running diff service and write its CSV "
+                         "(default URL: BOMDIFF_SERVICE_URL or http://127.0.0.1:8765)")
+    ap.add_argument("--export-snapshot", metavar="DIR",
+                    help="write the lines of every SO in Group A and B (IDs or --a-where/--b-where) "
+                         "to an offline snapshot instead of diffing")
+    ap.add_argument("--snapshot", metavar="DIR",
+                    help="replay the A/B diff from a snapshot written by --export-snapshot (no NetSuite calls)")
+    ap.add_argument("--metrics", metavar="PATH",
+                    help="write phase timings, request stats and cache hit rates as JSON")
+    ap.add_argument("--trace", metavar="PATH",
+                    help="write a Chrome trace (chrome://tracing, ui.perfetto.dev) of phases and requests")
+    ap.add_argument("--profile", metavar="PATH",
+                    help="run under cProfile and dump the stats (pstats/snakeviz format)")
+    args = ap.parse_args(argv)
+    if args.explode and args.pushdown:
+        ap.error("--explode cannot be combined with --pushdown")
+    if args.stream and (args.explode or args.pushdown or args.snapshot or args.export_snapshot
+                        or args.group or args.batch or args.service is not None or args.serve):
+        ap.error("--stream runs one A/B diff from SuiteQL and cannot be combined with --explode, --pushdown, "
+                 "--snapshot, --export-snapshot, --group, --batch, --service or --serve")
+    if args.group and (args.a_where or args.b_where):
+        ap.error("--a-where/--b-where select the A/B groups and cannot be combined with --group")
+    if args.service is not None and (args.group or args.batch or args.serve):
+        ap.error("--service runs one A/B diff and cannot be combined with --group, --batch or --serve")
+    if args.snapshot and (args.export_snapshot or args.group or args.batch or args.service is not None
+                          or args.serve or args.pushdown or args.a_where or args.b_where):
+        ap.error("--snapshot replays one A/B diff of SO IDs and cannot be combined with --export-snapshot, "
+                 "--group, --batch, --service, --serve, --pushdown or --a-where/--b-where")
+    if args.export_snapshot and (args.group or args.batch or args.service is not None or args.serve):
+        ap.error("--export-snapshot exports Group A and B and cannot be combined with --group, --batch, "
+                 "--service or --serve")
+    if args.group:
+        labels = [label for label, _ in args.group]
+        if len(args.group) < 2 or len(set(labels)) != len(labels):
+            ap.error("--group needs at least two groups with distinct labels")
+        if args.baseline is not None and args.baseline not in labels:
+            ap.error(f"--baseline {args.baseline!r} is not one of {labels}")
+    return args
+
+def main(args) -> int:
+    cache_opts = {"use_cache": False if args.no_cache else None, "refresh": args.refresh}
     debug_env()
-    print("SuiteQL ok →", suiteql("SELECT 1 AS ok"))
-    suiteql_ok = check_required_records()
+    if args.serve:
+        from bomdiff_service import serve
+        serve()
+        return 0
+    if args.service is not None:
+        return _run_via_service(args)
+    if args.batch:
+        from bomdiff_batch import run_batch
+        results = run_batch(args.batch, resume=not args.restart, reprobe=args.reprobe, **cache_opts)
+        return 1 if any(r["status"] == "failed" for r in results) else 0
+    if args.group:
+        # N-group mode: one fetch over the union of SOs, one matrix output
+        run_matrix(dict(args.group), OUTPUT_MATRIX_CSV, OUTPUT_MATRIX_XLSX,
+                   baseline=args.baseline, pairwise=args.pairwise, reprobe=args.reprobe,
+                   explode=args.explode, **cache_opts)
+        return 0
+    if args.export_snapshot:
+        core.export_snapshot([args.a_where or GROUP_A_SO_IDS, args.b_where or GROUP_B_SO_IDS],
+                             args.export_snapshot, **cache_opts)
+        return 0
+    if args.snapshot:
+        # Offline replay: no probe, no NetSuite session
+        run_diff(GROUP_A_SO_IDS, GROUP_B_SO_IDS, OUTPUT_CSV, OUTPUT_XLSX,
+                 explode=args.explode, snapshot=args.snapshot, refresh=args.refresh)
+        return 0
+    if args.a_where or args.b_where or args.stream:
+        # Criteria are resolved inside the line query, and streaming folds pages without
+        # keeping lines for the negative-line audit; run_diff handles both backends
+        run_diff(args.a_where or GROUP_A_SO_IDS, args.b_where or GROUP_B_SO_IDS, OUTPUT_CSV, OUTPUT_XLSX,
+                 pushdown=args.pushdown, reprobe=args.reprobe, explode=args.explode, stream=args.stream,
+                 **cache_opts)
+        return 0
+    suiteql_ok = probe_backend(refresh=args.reprobe) == "suiteql"
 
     if suiteql_ok:
-        verify_so_ids(GROUP_A_SO_IDS, "Group A")
-        verify_so_ids(GROUP_B_SO_IDS, "Group B")
+        # One fetch over both groups; verification and the negative-line audit are read from it
+        # (pushdown skips the line download, so its audit still queries the negative lines)
+        data = fetch_so_data(GROUP_A_SO_IDS + GROUP_B_SO_IDS, lines=not args.pushdown, **cache_opts)
+        verify_so_ids(GROUP_A_SO_IDS, "Group A", data)
+        verify_so_ids(GROUP_B_SO_IDS, "Group B", data)
         # Optional diagnostics (comment out later)
         print("\n-- Negative lines in Group A (raw) --")
-        debug_negative_lines(GROUP_A_SO_IDS)
+        debug_negative_lines(GROUP_A_SO_IDS, data)
         print("\n-- Negative lines in Group B (raw) --")
-        debug_negative_lines(GROUP_B_SO_IDS)
-        result = compare_groups_a_minus_b(GROUP_A_SO_IDS, GROUP_B_SO_IDS)
+        debug_negative_lines(GROUP_B_SO_IDS, data)
+        if args.pushdown:
+            result = compare_groups_a_minus_b_pushdown(GROUP_A_SO_IDS, GROUP_B_SO_IDS)
+        else:
+            result = compare_groups_a_minus_b(GROUP_A_SO_IDS, GROUP_B_SO_IDS, explode=args.explode,
+                                              data=data, **cache_opts)
     else:
-        verify_so_ids_rest(GROUP_A_SO_IDS, "Group A")
-        verify_so_ids_rest(GROUP_B_SO_IDS, "Group B")
-        result = compare_groups_a_minus_b_rest(GROUP_A_SO_IDS, GROUP_B_SO_IDS)
+        records = fetch_salesorders_rest(GROUP_A_SO_IDS + GROUP_B_SO_IDS, **cache_opts)
+        verify_so_ids_rest(GROUP_A_SO_IDS, "Group A", records)
+        verify_so_ids_rest(GROUP_B_SO_IDS, "Group B", records)
+        result = compare_groups_a_minus_b_rest(GROUP_A_SO_IDS, GROUP_B_SO_IDS, records,
+                                               explode=args.explode, refresh=args.refresh)
 
     print(f"Rows in A − B with non-zero diff: {len(result)}")
     write_outputs(result, OUTPUT_CSV, OUTPUT_XLSX)
     # Optional probe:
     # probe_line_fields(GROUP_A_SO_IDS[0], limit_rows=3)
+    return 0
 
+def _run_via_service(args) -> int:
+    # Thin client: the service holds the warm session pool, probe and caches
+    from bomdiff_service import ServiceClient
+    client = ServiceClient(args.service or None)
+    try:
+        rows = client.diff_to_csv(args.a_where or GROUP_A_SO_IDS, args.b_where or GROUP_B_SO_IDS, OUTPUT_CSV,
+                                  explode=args.explode, pushdown=args.pushdown, refresh=args.refresh,
+                                  use_cache=False if args.no_cache else None)
+    except (ConnectionError, RuntimeError) as e:
+        raise SystemExit(str(e))
+    print(f"Rows in A − B with non-zero diff: {rows} (computed by {client.url})")
+    print("Wrote CSV:", os.path.abspath(OUTPUT_CSV), "(no XLSX in --service mode)")
+    return 0
+
+def _export_metrics(args) -> None:
+    print("\n-- Metrics --")
+    print(METRICS.format_summary())
+    if args.metrics:
+        METRICS.write_json(args.metrics)
+        print("Wrote metrics:", os.path.abspath(args.metrics))
+    if args.trace:
+        METRICS.write_chrome_trace(args.trace)
+        print("Wrote trace:", os.path.abspath(args.trace))
 
+if __name__ == "__main__":
+    args = _parse_args()
+    try:
+        with profiled(args.profile):
+            code = main(args)
+    finally:
+        _export_metrics(args)
+    raise SystemExit(code)
@@ -9,11 +9,23 @@ OUTPUT_XLSX = "bomdiff_A_minus_B.xlsx"
 # If True, aggregate uses absolute value of each line's quantity (treat negative as positive count)
 COUNT_ABSOLUTE_LINE_QTY = True
 
-import os, requests, pandas as pd, time
-from requests_oauthlib import OAuth1
-from oauthlib.oauth1 import SIGNATURE_HMAC_SHA256
+import os, hashlib, threading, pandas as pd, requests, time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from dotenv import load_dotenv
 
+from ns_client import (
+    NetSuiteClient, Cancelled, RETRY_STATUSES, SUBLIST_PAGE_SIZE, DEFAULT_POOL_SIZE, DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNK_WORKERS, DEFAULT_MAX_IN_FLIGHT, DEFAULT_RATE_PER_SEC, DEFAULT_MAX_RETRIES,
+)
+from bomdiff_cache import SOCache, ProbeCache, BOMCache, ItemCache, ResultMemo
+from bomdiff_bom import BOMExploder
+from bomdiff_items import ItemMaster
+from bomdiff_snapshot import Snapshot, write_snapshot
+from bomdiff_criteria import GroupCriteria
+from bomdiff_metrics import METRICS, timed
+import bomdiff_engine
+
 load_dotenv(override=True)  # force .env to override any OS env vars
 
 REALM  = os.getenv("NS_ACCOUNT_REALM")
@@ -23,6 +35,9 @@ CS     = os.getenv("NS_CONSUMER_SECRET")
 TID    = os.getenv("NS_TOKEN_ID")
 TS     = os.getenv("NS_TOKEN_SECRET")
 
+# Diff engine: "numpy" (vectorized, bomdiff_engine) or "pandas" (groupby + outer merge)
+DIFF_ENGINE = os.getenv("BOMDIFF_ENGINE") or "numpy"
+
 def mask(v):
     if not v: return "(missing)"
     v = v.strip()
@@ -39,44 +54,165 @@ def debug_env():
     print("TS:", mask(TS))
     print("--- END DEBUG ---\n")
 
+# Shared NetSuite client: one pooled keep-alive session + signer for every call in the process
+POOL_SIZE = int(os.getenv("NS_POOL_SIZE") or DEFAULT_POOL_SIZE)
+# Large ID groups are split into IN-list chunks (starting size, adapted per run) run in parallel
+CHUNK_SIZE    = int(os.getenv("NS_IN_CHUNK_SIZE") or DEFAULT_CHUNK_SIZE)
+CHUNK_WORKERS = int(os.getenv("NS_CHUNK_WORKERS") or DEFAULT_CHUNK_WORKERS)
+# Account-wide governor: in-flight cap (keep below the account's concurrency limit so other
+# integrations still get slots), optional requests/second cap, and retries for 429/5xx
+MAX_IN_FLIGHT = int(os.getenv("NS_MAX_IN_FLIGHT") or DEFAULT_MAX_IN_FLIGHT)
+RATE_PER_SEC  = float(os.getenv("NS_MAX_RPS") or DEFAULT_RATE_PER_SEC)
+MAX_RETRIES   = int(os.getenv("NS_MAX_RETRIES") or DEFAULT_MAX_RETRIES)
+
+_client: NetSuiteClient | None = None
+_client_lock = threading.Lock()
+
+def get_client() -> NetSuiteClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not all([REALM, DOMAIN, CK, CS, TID, TS]):
+                    raise SystemExit("Missing one or more values in .env (realm/domain/keys/tokens).")
+                _client = NetSuiteClient(REALM, DOMAIN, CK, CS, TID, TS, pool_size=POOL_SIZE,
+                                         chunk_size=CHUNK_SIZE, chunk_workers=CHUNK_WORKERS,
+                                         max_in_flight=MAX_IN_FLIGHT, rate_per_sec=RATE_PER_SEC,
+                                         max_retries=MAX_RETRIES)
+    return _client
+
+def suiteql_pages(sql: str, **kwargs):
+    """Yield SuiteQL result pages in order (see NetSuiteClient.suiteql_pages)."""
+    return get_client().suiteql_pages(sql, **kwargs)
+
 def suiteql(sql: str, *, timeout: int = 30):
-    if not all([REALM, DOMAIN, CK, CS, TID, TS]):
-        raise SystemExit("Missing one or more values in .env (realm/domain/keys/tokens).")
-    url = DOMAIN.rstrip("/") + "/services/rest/query/v1/suiteql"
-    auth = OAuth1(
-        CK.strip(), CS.strip(), TID.strip(), TS.strip(),
-        signature_method=SIGNATURE_HMAC_SHA256,
-        signature_type="AUTH_HEADER",
-        realm=REALM.strip(),
-    )
-    r = requests.post(url, json={"q": sql}, auth=auth, headers={"Prefer": "transient"}, timeout=timeout)
+    rows = []
+    for page in suiteql_pages(sql, timeout=timeout):
+        rows.extend(page)
+    return rows
+
+def suiteql_df(sql: str) -> pd.DataFrame:
+    frames = [pd.DataFrame(page) for page in suiteql_pages(sql) if page]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def suiteql_df_chunked(so_ids: list[int], build_sql) -> pd.DataFrame:
+    """
+    Run build_sql(id_list) once per IN-list chunk of `so_ids` (concurrently, chunk size
+    adapted to this run's latency/errors) and concatenate the frames in ID order.
+    """
+    frames = get_client().map_chunks(so_ids, lambda chunk: suiteql_df(build_sql(",".join(map(str, chunk)))))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+# --- Local per-SO cache, validated against transaction.lastmodifieddate ---
+# Set BOMDIFF_CACHE=0 (or pass use_cache=False / --no-cache) to always go to NetSuite.
+USE_SO_CACHE = (os.getenv("BOMDIFF_CACHE") or "1").strip().lower() not in ("0", "false", "no", "off")
+
+_so_cache: SOCache | None = None
+
+def get_so_cache() -> SOCache:
+    global _so_cache
+    if _so_cache is None:
+        with _client_lock:
+            if _so_cache is None:
+                _so_cache = SOCache()
+    return _so_cache
+
+def so_last_modified(so_ids: list[int], *, headers: dict[int, dict] | None = None) -> dict[int, str]:
+    """
+    Return {so_id: last-modified stamp} for the Sales Orders that exist.
+    One SuiteQL query per IN-list chunk when probe_backend() found the transaction table
+    readable; otherwise (or if that query fails) one small REST header GET per SO (see
+    rest_get_header), without sending SuiteQL the role is known to be refused.
+    `headers` (from rest_get_headers) are read instead when the caller already has them.
+    """
+    ids = list(dict.fromkeys(int(i) for i in so_ids or []))
+    if not ids:
+        return {}
+    if headers is not None:
+        return _rest_stamps(ids, headers)
+    if not suiteql_reads_transactions():
+        return _rest_stamps(ids)
+    sql = lambda id_list: f"""
+        SELECT id, TO_CHAR(lastmodifieddate, 'YYYY-MM-DD HH24:MI:SS') AS last_modified
+        FROM "transaction"
+        WHERE id IN ({id_list})
+          AND "type" = 'SalesOrd'
+        ORDER BY id
+    """
     try:
-        r.raise_for_status()
-    except Exception:
-        print("Status:", r.status_code)
-        print("Body:", r.text[:1000])
-        print("SQL:", sql.strip()[:500])
+        chunks = get_client().map_chunks(ids, lambda chunk: suiteql(sql(",".join(map(str, chunk)))))
+        return {int(r["id"]): str(r["last_modified"]) for rows in chunks for r in rows}
+    except Cancelled:
         raise
-    return r.json().get("items", [])
+    except Exception:
+        print("lastmodifieddate check via SuiteQL failed; probing REST Records instead.")
+    return _rest_stamps(ids)
 
-def suiteql_df(sql: str) -> pd.DataFrame:
-    rows = suiteql(sql)
-    return pd.DataFrame(rows) if rows else pd.DataFrame()
+def _rest_stamps(ids: list[int], headers: dict[int, dict] | None = None) -> dict[int, str]:
+    """so_last_modified from REST headers (fetched unless given); missing SOs are left out."""
+    headers = rest_get_headers(ids) if headers is None else headers
+    return {i: headers[i]["lastModifiedDate"] for i in ids if (headers.get(i) or {}).get("lastModifiedDate")}
+
+def _report(progress, phase: str, done: int | None = None, total: int | None = None) -> None:
+    """Forward a progress event (phase, SOs done, SOs total) to an optional callback."""
+    if progress is not None:
+        progress(phase, done, total)
+
+def _cached_per_so(kind: str, so_ids: list[int], fetch_missing, *, refresh: bool = False,
+                   progress=None, phase: str = "Fetching SOs",
+                   stamps: dict[int, str] | None = None) -> dict[int, object]:
+    """
+    Serve per-SO payloads from the local cache when their stamp still matches
+    NetSuite's lastmodifieddate; call `fetch_missing(stale_ids, on_done) -> {so_id: payload}`
+    for the rest and store what came back. fetch_missing reports its own count of
+    finished SOs through on_done(n); cache hits count as done up front.
+    `stamps` ({so_id: last-modified}) skips the stamp lookup when the caller already has them.
+    """
+    ids = list(dict.fromkeys(int(i) for i in so_ids or []))
+    if not ids:
+        return {}
+    if stamps is None:
+        stamps = so_last_modified(ids)
+    cache = get_so_cache()
+    cached = {} if refresh else cache.get_many(REALM, kind, ids)
+    out: dict[int, object] = {}
+    stale = []
+    for i in ids:
+        hit = cached.get(i)
+        if hit is not None and i in stamps and hit[0] == stamps[i]:
+            out[i] = hit[1]
+        else:
+            stale.append(i)
+    reused = len(ids) - len(stale)
+    METRICS.cache(kind, hits=reused, misses=len(stale))
+    _report(progress, phase, reused, len(ids))
+    if stale:
+        fetched = fetch_missing(stale, lambda n: _report(progress, phase, reused + n, len(ids)))
+        out.update(fetched)
+        # Only cache SOs NetSuite reported a stamp for (i.e. that exist)
+        cache.put_many(REALM, kind, {i: (stamps[i], fetched[i]) for i in stale if i in stamps and i in fetched})
+    print(f"SO cache ({kind}): {len(ids) - len(stale)} reused, {len(stale)} fetched")
+    return out
 
 # --- REST Records helpers (fallback when SuiteQL tables are unavailable) ---
-def _make_auth():
-    return OAuth1(
-        CK.strip(), CS.strip(), TID.strip(), TS.strip(),
-        signature_method=SIGNATURE_HMAC_SHA256,
-        signature_type="AUTH_HEADER",
-        realm=REALM.strip(),
-    )
+REST_WORKERS = int(os.getenv("NS_REST_WORKERS") or 8)
 
-def rest_get_salesorder(so_id: int) -> dict:
-    url = DOMAIN.rstrip("/") + f"/services/rest/record/v1/salesorder/{int(so_id)}?expandSubResources=true"
-    r = requests.get(url, auth=_make_auth(), headers={"Prefer": "transient"}, timeout=30)
-    if r.status_code == 404:
-        return {"_not_found": True}
+# Header fields read by verification and the cache stamp, and item sublist fields read
+# by line extraction
+REST_HEADER_FIELDS = ("tranId", "lastModifiedDate")
+REST_LINE_FIELDS = ("item", "quantity", "isClosed")
+
+def _check_record_response(r: requests.Response, so_id: int) -> None:
+    """Raise for a REST Records failure on `so_id` (404s are handled by the caller)."""
+    if r.status_code in RETRY_STATUSES:
+        # Still throttled/failing after the client's retries: not an access problem
+        print(f"REST Records HTTP {r.status_code} for SO {so_id} after retries.")
+        r.raise_for_status()
     if not r.ok:
         # Always show the server response to diagnose
         print(f"REST Records HTTP {r.status_code} for SO {so_id}. Response body:\n{r.text[:1000]}")
@@ -89,16 +225,127 @@ def rest_get_salesorder(so_id: int) -> dict:
             "- Role Subsidiaries include the SO's subsidiary (or set to All). If OneWorld, consider 'Allow Cross-Subsidiary Record Viewing'\n"
             "Open one SO in the UI with the Developer role; if it fails there, adjust the role and retry."
         )
+
+def rest_get_salesorder(so_id: int) -> dict:
+    """The full record with every sublist expanded (large; the diff only needs rest_get_item_lines)."""
+    r = get_client().get_record("salesorder", so_id, params={"expandSubResources": "true"})
+    if r.status_code == 404:
+        return {"_not_found": True}
+    _check_record_response(r, so_id)
+    return r.json()
+
+def rest_get_header(so_id: int) -> dict:
+    """Only the REST_HEADER_FIELDS of a Sales Order (one small GET), or {"_not_found": True}."""
+    r = get_client().get_record("salesorder", so_id, params={"fields": ",".join(REST_HEADER_FIELDS)})
+    if r.status_code == 404:
+        return {"_not_found": True}
+    _check_record_response(r, so_id)
     return r.json()
 
-def verify_so_ids_rest(so_ids: list[int], label: str):
+def rest_get_headers(so_ids: list[int]) -> dict[int, dict]:
+    """rest_get_header for each SO through a bounded thread pool."""
+    ids = list(dict.fromkeys(int(i) for i in so_ids or []))
+    with ThreadPoolExecutor(max_workers=max(1, min(REST_WORKERS, len(ids)))) as pool:
+        return dict(zip(ids, pool.map(get_client().bind_cancel(rest_get_header), ids)))
+
+def rest_get_item_lines(so_id: int, *, header: dict | None = None) -> dict:
+    """
+    The header (`header` if the caller already has it from rest_get_header, else one
+    small GET) and the item sublist restricted to REST_LINE_FIELDS, following sublist
+    paging for long orders. The sublist endpoint carries no header fields.
+    Returns a slim record {"tranId": ..., "item": {"items": [...]}} or {"_not_found": True}.
+    """
+    client = get_client()
+    header = rest_get_header(so_id) if header is None else header
+    if header.get("_not_found"):
+        return header
+    params = {"expandSubResources": "true", "fields": ",".join(REST_LINE_FIELDS),
+              "limit": SUBLIST_PAGE_SIZE, "offset": 0}
+    lines: list[dict] = []
+    r = client.get_sublist("salesorder", so_id, "item", params=params)
+    while True:
+        if r.status_code == 404:
+            return {"_not_found": True}
+        _check_record_response(r, so_id)
+        body = r.json()
+        page = body.get("items") or []
+        lines.extend(page)
+        if not body.get("hasMore") or not page:
+            break
+        nxt = next((l.get("href") for l in body.get("links") or [] if l.get("rel") == "next"), None)
+        if nxt:
+            r = client.get(nxt)
+        else:
+            params["offset"] = int(body.get("offset") or params["offset"]) + len(page)
+            r = client.get_sublist("salesorder", so_id, "item", params=params)
+    return _slim_salesorder({**header, "item": lines})
+
+def _slim_salesorder(data: dict) -> dict:
+    """Keep only what verification and line extraction read from a REST record."""
+    if data.get("_not_found"):
+        return data
+    sub = data.get("item") or []
+    if isinstance(sub, dict):
+        sub = sub.get("items") or []
+    lines = [{"item": line.get("item") or {}, "quantity": line.get("quantity"), "isClosed": line.get("isClosed")}
+             for line in sub]
+    return {"tranId": data.get("tranId") or data.get("tranid") or "", "item": {"items": lines}}
+
+@timed("fetch")
+def fetch_salesorders_rest(so_ids: list[int], *, max_workers: int = REST_WORKERS,
+                           use_cache: bool | None = None, refresh: bool = False,
+                           progress=None, headers: dict[int, dict] | None = None) -> dict[int, dict]:
+    """
+    Download the item lines of each distinct Sales Order once through a bounded thread pool.
+    Returns {so_id: record}; IDs that 404 map to {"_not_found": True}.
+    Verification and line extraction are both derived from this one download.
+    Unchanged SOs are served from the local cache unless use_cache is False.
+    progress(phase, done, total) is called as SOs finish (from worker threads).
+    `headers` (from rest_get_headers) saves the header GET for the SOs they cover.
+    """
+    unique = list(dict.fromkeys(int(i) for i in so_ids or []))
+    if not unique:
+        return {}
+    phase = "Fetching Sales Orders"
+    headers = dict(headers or {})
+
+    def download(ids: list[int], on_done=None) -> dict[int, dict]:
+        done, lock = [0], threading.Lock()
+
+        def get_one(so_id: int) -> dict:
+            data = rest_get_item_lines(so_id, header=headers.get(so_id))
+            with lock:
+                done[0] += 1
+                if on_done is not None:
+                    on_done(done[0])
+            return data
+
+        workers = max(1, min(max_workers, len(ids)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return dict(zip(ids, pool.map(get_client().bind_cancel(get_one), ids)))
+
+    if not (USE_SO_CACHE if use_cache is None else use_cache):
+        return download(unique, lambda n: _report(progress, phase, n, len(unique)))
+    stamps = None
+    if not suiteql_reads_transactions():
+        # No SuiteQL stamp query: one header GET per SO gives the cache stamp and, for the
+        # SOs downloaded below, the tranId, so each SO costs at most that GET + its sublist
+        headers.update(rest_get_headers([i for i in unique if i not in headers]))
+        stamps = _rest_stamps(unique, headers)
+    return _cached_per_so("rest_record", unique, download, refresh=refresh, progress=progress, phase=phase,
+                          stamps=stamps)
+
+@timed("verify")
+def verify_so_ids_rest(so_ids: list[int], label: str, records: dict[int, dict] | None = None):
     if not so_ids:
         print(f"{label}: 0 IDs provided")
         return
+    if records is None:
+        records = fetch_salesorders_rest(so_ids)
     found = []
     missing = []
     for i in so_ids:
-        data = rest_get_salesorder(int(i))
+        data = records[int(i)]
         if data.get("_not_found"):
             missing.append(i)
         else:
@@ -110,77 +357,415 @@ def verify_so_ids_rest(so_ids: list[int], label: str):
     if missing:
         print("  Missing:", ", ".join(map(str, missing)))
 
-def fetch_so_lines_rest(so_ids: list[int]) -> pd.DataFrame:
+def _salesorder_lines_rest(so: int, data: dict) -> list[dict]:
+    rows = []
+    # Sublist may be named "item"; expanded sublists arrive as {"items": [...], ...}
+    sub = data.get("item") or []
+    if isinstance(sub, dict):
+        sub = sub.get("items") or []
+    for line in sub:
+        # Skip closed/description-only lines if present
+        if line.get("isClosed") is True:
+            continue
+        itm = line.get("item") or {}
+        item_id_raw = itm.get("id") or itm.get("value")
+        try:
+            item_id = int(item_id_raw) if item_id_raw is not None else None
+        except Exception:
+            item_id = None
+        item_name = itm.get("refName") or itm.get("text") or itm.get("name") or ""
+        qty = line.get("quantity")
+        try:
+            qty = float(qty) if qty is not None else 0.0
+        except Exception:
+            qty = 0.0
+        rows.append({"so_id": int(so), "item_id": item_id, "item_name": item_name, "line_qty": qty})
+    return rows
+
+@timed("fetch")
+def fetch_so_lines_rest(so_ids: list[int], records: dict[int, dict] | None = None) -> pd.DataFrame:
+    if records is None:
+        records = fetch_salesorders_rest(so_ids)
     rows = []
     for so in so_ids or []:
-        data = rest_get_salesorder(int(so))
+        data = records[int(so)]
         if data.get("_not_found"):
             continue
-        # Sublist may be named "item"
-        sub = data.get("item") or []
-        for line in sub:
-            # Skip closed/description-only lines if present
-            if line.get("isClosed") is True:
-                continue
-            itm = line.get("item") or {}
-            item_id_raw = itm.get("id") or itm.get("value")
-            try:
-                item_id = int(item_id_raw) if item_id_raw is not None else None
-            except Exception:
-                item_id = None
-            item_name = itm.get("refName") or itm.get("text") or itm.get("name") or ""
-            qty = line.get("quantity")
-            try:
-                qty = float(qty) if qty is not None else 0.0
-            except Exception:
-                qty = 0.0
-            rows.append({"so_id": int(so), "item_id": item_id, "item_name": item_name, "line_qty": qty})
-    return pd.DataFrame(rows, columns=["so_id","item_id","item_name","line_qty"])
-
-def verify_so_ids(so_ids: list[int], label: str):
+        rows.extend(_salesorder_lines_rest(int(so), data))
+    return _normalize_lines(pd.DataFrame(rows, columns=LINE_COLUMNS))
+
+@timed("verify")
+def verify_so_ids(so_ids: list[int], label: str, data: "SOData | None" = None):
     """
     Verifies that the provided Sales Order internal IDs exist and are of type 'SalesOrd'.
+    With `data` (see fetch_so_data) the check is answered locally, without a query.
     """
     if not so_ids:
         print(f"{label}: 0 IDs provided")
         return
-    id_list = ",".join(str(int(i)) for i in so_ids)
-    sql = f"""
-        SELECT id, tranid, "type"
+    df = data.headers_for(so_ids) if data is not None else _query_sales_orders(so_ids)
+    print(f"{label}: found {len(df)} Sales Orders out of {len(so_ids)} IDs")
+    if not df.empty:
+        print(df[["id","tranid","type"]].to_string(index=False))
+
+def _query_sales_orders(so_ids: list[int]) -> pd.DataFrame:
+    # The stamp rides along so one header query serves verification and cache validation
+    return suiteql_df_chunked(so_ids, lambda id_list: f"""
+        SELECT id, tranid, "type", TO_CHAR(lastmodifieddate, 'YYYY-MM-DD HH24:MI:SS') AS last_modified
         FROM "transaction"
         WHERE id IN ({id_list})
           AND "type" = 'SalesOrd'
+        ORDER BY id
+    """)
+
+@timed("verify")
+def found_sales_orders(so_ids: list[int]) -> set[int]:
+    """The subset of `so_ids` that exist as Sales Orders (one chunked query)."""
+    if not so_ids:
+        return set()
+    df = _query_sales_orders(so_ids)
+    return set(pd.to_numeric(df["id"], errors="coerce").dropna().astype(int)) if not df.empty else set()
+
+@timed("verify")
+def verify_groups(groups: dict[str, list[int]], data: "SOData | None" = None) -> None:
+    """
+    Verify several groups with one query over the union of their IDs (none with `data`)
+    and report the found count per group.
+    """
+    found = data.found if data is not None else found_sales_orders(union_ids(groups))
+    for label, ids in groups.items():
+        print(f"Group {label}: found {sum(int(i) in found for i in ids)} Sales Orders out of {len(ids)} IDs")
+
+LINE_COLUMNS = ["so_id","item_id","item_name","line_qty"]
+
+def _normalize_lines(df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a lines frame to compact dtypes: nullable integer ids and float quantities."""
+    df = df.reindex(columns=LINE_COLUMNS)
+    for c in ("so_id","item_id"):
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype("Int64")
+    df["line_qty"] = pd.to_numeric(df["line_qty"], errors="coerce").fillna(0.0).astype("float64")
+    return df
+
+def _so_lines_sql(chunk: list[int], *, sales_orders_only: bool = False) -> str:
+    id_list = ",".join(str(int(i)) for i in chunk)
+    # sales_orders_only: callers that skip header verification (streaming) join the header
+    # so lines of other transaction types with a requested id are not counted
+    join, only_so = ("""JOIN "transaction" t ON t.id = tl.transaction""",
+                     """AND t."type" = 'SalesOrd'""") if sales_orders_only else ("", "")
+    # Bare item ids: names come from the local item master (see item_names)
+    return f"""
+        SELECT
+            tl.transaction AS so_id,
+            tl.item        AS item_id,
+            tl.quantity    AS line_qty
+        FROM "transactionline" tl
+        {join}
+        WHERE tl.transaction IN ({id_list})
+          AND tl.mainline = 'F'
+          {only_so}
+        ORDER BY tl.transaction, tl.id
     """
-    df = suiteql_df(sql)
-    print(f"{label}: found {len(df)} Sales Orders out of {len(so_ids)} IDs")
-    if not df.empty:
-        print(df[["id","tranid","type"]].to_string(index=False))
 
-def fetch_so_lines(so_ids: list[int]) -> pd.DataFrame:
+def _query_so_lines_chunk(chunk: list[int]) -> pd.DataFrame:
+    cols = ["so_id","item_id","item_name","line_qty"]
+    frames = []
+    for page in suiteql_pages(_so_lines_sql(chunk)):
+        if not page:
+            continue
+        frames.append(_normalize_lines(pd.DataFrame(page)))
+    if not frames:
+        return _normalize_lines(pd.DataFrame(columns=cols))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+def _query_so_lines(so_ids: list[int], on_done=None) -> pd.DataFrame:
+    cols = ["so_id","item_id","item_name","line_qty"]
+    on_progress = (lambda done, total: on_done(done)) if on_done is not None else None
+    frames = [f for f in get_client().map_chunks(so_ids, _query_so_lines_chunk, on_progress=on_progress)
+              if not f.empty]
+    if not frames:
+        return _normalize_lines(pd.DataFrame(columns=cols))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+@timed("fetch")
+def fetch_so_lines(so_ids: list[int], *, use_cache: bool | None = None, refresh: bool = False,
+                   progress=None, stamps: dict[int, str] | None = None) -> pd.DataFrame:
     """
     Fetch non-mainline Sales Order lines for the given internal IDs.
-    Returns: so_id, item_id, item_name, line_qty
+    Unchanged SOs are served from the local cache unless use_cache is False;
+    refresh=True refetches everything and rewrites the cache; `stamps` are last-modified
+    values the caller already holds (see fetch_so_data).
+    progress(phase, done, total) is called as SOs finish (from worker threads).
+    Returns: so_id, item_id, item_name, line_qty; item_name is left empty (names are
+    attached to results from the item master, see item_names).
     """
+    cols = LINE_COLUMNS
+    phase = "Fetching SO lines"
     if not so_ids:
-        return pd.DataFrame(columns=["so_id","item_id","item_name","line_qty"])
-    id_list = ",".join(str(int(i)) for i in so_ids)
-    sql = f"""
+        return _normalize_lines(pd.DataFrame(columns=cols))
+    if not (USE_SO_CACHE if use_cache is None else use_cache):
+        total = len(set(int(i) for i in so_ids))
+        return _query_so_lines(so_ids, lambda n: _report(progress, phase, n, total))
+
+    def download(ids: list[int], on_done=None) -> dict[int, list]:
+        per_so: dict[int, list] = {i: [] for i in ids}
+        df = _query_so_lines(ids, on_done)
+        for so_id, item_id, item_name, qty in df[cols].itertuples(index=False):
+            per_so.setdefault(int(so_id), []).append([
+                None if pd.isna(item_id) else int(item_id),
+                None if pd.isna(item_name) else item_name,
+                float(qty),
+            ])
+        return per_so
+
+    per_so = _cached_per_so("suiteql_lines", so_ids, download, refresh=refresh, progress=progress,
+                            phase=phase, stamps=stamps)
+    rows = [(so_id, *line) for so_id, lines in per_so.items() for line in lines]
+    return _normalize_lines(pd.DataFrame(rows, columns=cols))
+
+# --- One fetch per run: headers and lines for the union of SOs; checks are derived locally ---
+@dataclass(frozen=True)
+class SOData:
+    """
+    Header rows (id, tranid, type, last_modified) of the Sales Orders found and, unless
+    fetched with lines=False, their lines. Verification, the negative-line audit and
+    each group's lines are all answered from this one fetch.
+    """
+    headers: pd.DataFrame
+    lines: pd.DataFrame | None = None
+
+    @property
+    def found(self) -> set[int]:
+        return set(self.headers["id"].tolist())
+
+    def headers_for(self, so_ids) -> pd.DataFrame:
+        return self.headers[self.headers["id"].isin([int(i) for i in so_ids])]
+
+    def lines_for(self, so_ids) -> pd.DataFrame:
+        if self.lines is None:
+            raise ValueError("SOData was fetched without lines")
+        return self.lines[self.lines["so_id"].isin([int(i) for i in so_ids])].reset_index(drop=True)
+
+@timed("fetch")
+def fetch_so_data(so_ids: list[int], *, lines: bool = True, use_cache: bool | None = None,
+                  refresh: bool = False, progress=None) -> SOData:
+    """
+    One header query over the distinct `so_ids` (existence, tranid and the cache stamp),
+    then the lines of the Sales Orders found (served from the SO cache where unchanged).
+    lines=False stops after the header query (verification only).
+    """
+    ids = list(dict.fromkeys(int(i) for i in so_ids or []))
+    headers = _query_sales_orders(ids) if ids else pd.DataFrame()
+    headers = headers.reindex(columns=["id","tranid","type","last_modified"])
+    headers["id"] = pd.to_numeric(headers["id"], errors="coerce").astype("Int64")
+    headers = headers.dropna(subset=["id"]).reset_index(drop=True)
+    if not lines:
+        return SOData(headers)
+    stamps = dict(zip(headers["id"].astype(int), headers["last_modified"].astype(str)))
+    found = [i for i in ids if i in stamps]
+    return SOData(headers, fetch_so_lines(found, use_cache=use_cache, refresh=refresh,
+                                          progress=progress, stamps=stamps))
+
+# --- Criteria groups: the group is selected inside the line query itself ---
+def _criteria_lines_sql(criteria: GroupCriteria) -> str:
+    return f"""
         SELECT
             tl.transaction AS so_id,
             tl.item        AS item_id,
-            i.itemid       AS item_name,
             tl.quantity    AS line_qty
         FROM "transactionline" tl
-        LEFT JOIN "item" i ON i.id = tl.item
-        WHERE tl.transaction IN ({id_list})
+        JOIN "transaction" t ON t.id = tl.transaction
+        WHERE {criteria.where("t")}
           AND tl.mainline = 'F'
+        ORDER BY tl.transaction, tl.id
+    """
+
+@timed("fetch")
+def fetch_criteria_lines(criteria: GroupCriteria) -> pd.DataFrame:
+    """
+    Lines of every Sales Order matching `criteria`, in one paged SuiteQL statement that
+    joins the transaction header (no separate ID lookup or verify query).
+    Not cached: which orders match can change between runs.
+    Returns: so_id, item_id, item_name (empty, see item_names), line_qty
+    """
+    frames = [_normalize_lines(pd.DataFrame(page)) for page in suiteql_pages(_criteria_lines_sql(criteria)) if page]
+    if not frames:
+        return _normalize_lines(pd.DataFrame(columns=LINE_COLUMNS))
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+@timed("verify")
+def criteria_so_ids(criteria: GroupCriteria) -> list[int]:
+    """Internal IDs of the Sales Orders matching `criteria` (header-only query, paged)."""
+    rows = suiteql(f"""
+        SELECT t.id
+        FROM "transaction" t
+        WHERE {criteria.where("t")}
+        ORDER BY t.id
+    """)
+    return [int(r["id"]) for r in rows]
+
+def fetch_group_lines(group: list[int] | GroupCriteria, *, use_cache: bool | None = None,
+                      refresh: bool = False, progress=None, data: SOData | None = None) -> pd.DataFrame:
+    """
+    Lines for a group given either as SO internal IDs or as GroupCriteria.
+    ID groups are sliced from `data` when given (see fetch_so_data).
     """
-    df = suiteql_df(sql)
+    if isinstance(group, GroupCriteria):
+        _report(progress, "Fetching SO lines")
+        lines = fetch_criteria_lines(group)
+        print(f"Criteria [{group.describe()}]: {lines['so_id'].nunique()} Sales Orders, {len(lines)} lines")
+        return lines
+    if data is not None:
+        return data.lines_for(group)
+    return fetch_so_lines(group, use_cache=use_cache, refresh=refresh, progress=progress)
+
+# --- Item master: names resolved locally instead of joining "item" in every line query ---
+_item_master: ItemMaster | None = None
+# Set once NetSuite refuses the item table; later lookups skip the request
+_item_table_refused = False
+
+def _item_rows(df: pd.DataFrame) -> list[tuple]:
     if df.empty:
-        return pd.DataFrame(columns=["so_id","item_id","item_name","line_qty"])
-    df["line_qty"] = pd.to_numeric(df["line_qty"], errors="coerce").fillna(0.0)
+        return []
+    df = df.reindex(columns=["id","itemid","displayname","itemtype","last_modified"])
+    df = df.astype(object).where(df.notna(), None)
+    return [(int(i), *rest) for i, *rest in df.itertuples(index=False)]
+
+_ITEM_COLUMNS = """
+            id, itemid, displayname, itemtype,
+            TO_CHAR(lastmodifieddate, 'YYYY-MM-DD HH24:MI:SS') AS last_modified
+"""
+
+def fetch_items_changed(since: str | None) -> list[tuple]:
+    """Item master rows modified at or after `since` (every item when None), paged."""
+    where = f"WHERE lastmodifieddate >= TO_DATE('{since}', 'YYYY-MM-DD HH24:MI:SS')" if since else ""
+    return _item_rows(suiteql_df(f"""
+        SELECT {_ITEM_COLUMNS}
+        FROM "item"
+        {where}
+        ORDER BY id
+    """))
+
+def fetch_items_by_id(item_ids: list[int]) -> list[tuple]:
+    """Item master rows for specific items (chunked IN lists)."""
+    return _item_rows(suiteql_df_chunked(item_ids, lambda id_list: f"""
+        SELECT {_ITEM_COLUMNS}
+        FROM "item"
+        WHERE id IN ({id_list})
+        ORDER BY id
+    """))
+
+def get_item_master() -> ItemMaster:
+    global _item_master
+    if _item_master is None:
+        with _client_lock:
+            if _item_master is None:
+                _item_master = ItemMaster(fetch_items_changed, fetch_items_by_id, cache=ItemCache(), realm=REALM)
+    return _item_master
+
+def item_names(item_ids) -> dict[int, str | None]:
+    """
+    {item_id: itemid} from the local item master. Returns {} when the role cannot read
+    the item table (REST-only accounts), where lines carry their own names.
+    """
+    global _item_table_refused
+    ids = [int(i) for i in item_ids if i is not None and not pd.isna(i) and int(i) != bomdiff_engine.MISSING_ITEM_ID]
+    if not ids or _item_table_refused:
+        return {}
+    try:
+        return get_item_master().names(ids)
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status is None or not 400 <= status < 500:
+            raise
+        _item_table_refused = True
+        print(f"Item names unavailable (item table refused, HTTP {status}); using names from the lines.")
+        return {}
+
+def _attach_item_names(df: pd.DataFrame, *, sort: bool = True) -> pd.DataFrame:
+    """
+    Fill missing item_name values from the item master. Results are re-sorted by
+    (item_name, item_id) when names were filled, matching the diff engines' order.
+    """
+    if df.empty or "item_name" not in df.columns:
+        return df
+    todo = df["item_name"].isna() & df["item_id"].notna()
+    if not todo.any():
+        return df
+    names = item_names(df.loc[todo, "item_id"].unique())
+    if not names:
+        return df
+    df = df.copy()
+    filled = df.loc[todo, "item_id"].map(lambda i: names.get(int(i)))
+    df["item_name"] = df["item_name"].astype(object).where(~todo, filled).infer_objects()
+    if sort:
+        df = df.sort_values(by=["item_name","item_id"]).reset_index(drop=True)
     return df
 
+# --- Optional multi-level BOM explosion (assembly/kit lines -> leaf components) ---
+_bom_cache: BOMCache | None = None
+
+def get_bom_cache() -> BOMCache:
+    global _bom_cache
+    if _bom_cache is None:
+        with _client_lock:
+            if _bom_cache is None:
+                _bom_cache = BOMCache()
+    return _bom_cache
+
+def fetch_item_members(parent_ids: list[int]) -> dict[int, list]:
+    """
+    One level of item members for many items (chunked SuiteQL on itemmember):
+    {parent_id: [(child_id, child_name, qty), ...]}. Items without members are absent.
+    child_name is None: leaf names come from the item master with the rest of the result.
+    """
+    try:
+        df = suiteql_df_chunked(parent_ids, lambda id_list: f"""
+            SELECT
+                im.parentitem AS parent_id,
+                im.item       AS item_id,
+                im.quantity   AS qty
+            FROM "itemmember" im
+            WHERE im.parentitem IN ({id_list})
+            ORDER BY im.parentitem, im.id
+        """)
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        if status is None or not 400 <= status < 500:
+            raise
+        raise SystemExit(
+            "BOM explosion reads assembly/kit members through SuiteQL (the itemmember table), "
+            f"and this role was refused (HTTP {status}). Grant Lists → Items: View to the token's role, "
+            "or run without BOM explosion."
+        )
+    members: dict[int, list] = {}
+    if df.empty:
+        return members
+    df["qty"] = pd.to_numeric(df["qty"], errors="coerce").fillna(0.0)
+    for parent, child, qty in df[["parent_id","item_id","qty"]].itertuples(index=False):
+        if pd.isna(child):
+            continue
+        members.setdefault(int(parent), []).append((int(child), None, float(qty)))
+    return members
+
+def bom_exploder(*, refresh: bool = False) -> BOMExploder:
+    """A per-run exploder: member lists memoized in memory and in the local BOM cache."""
+    return BOMExploder(fetch_item_members, cache=get_bom_cache(), realm=REALM, refresh=refresh)
+
+@timed("explode")
+def explode_lines(lines: pd.DataFrame, *, exploder: BOMExploder | None = None,
+                  refresh: bool = False) -> pd.DataFrame:
+    """
+    Expand assembly/kit lines into their leaf components (quantities multiplied down
+    the tree). Share one `exploder` across groups so common subassemblies resolve once.
+    """
+    exploder = exploder or bom_exploder(refresh=refresh)
+    return _normalize_lines(exploder.explode(lines))
+
+def _report_bom(exploder: BOMExploder) -> None:
+    st = exploder.stats
+    print(f"BOM explosion: {st['levels']} levels, {st['cached']} member lists cached, {st['fetched']} fetched")
+
+@timed("aggregate")
 def aggregate_by_item(lines: pd.DataFrame) -> pd.DataFrame:
     """
     Aggregate total quantity per item across all provided SO lines.
@@ -203,43 +788,63 @@ def aggregate_by_item(lines: pd.DataFrame) -> pd.DataFrame:
     )
     return agg
 
-def debug_negative_lines(so_ids: list[int]):
+@timed("debug")
+def debug_negative_lines(so_ids: list[int], data: SOData | None = None):
     """
     List any transaction lines with negative quantity (before absolute normalization)
-    so you can audit why they appeared.
+    so you can audit why they appeared. With `data` holding lines (see fetch_so_data)
+    they are picked out locally instead of scanning transactionline again.
     """
     if not so_ids:
         return
-    id_list = ",".join(str(int(i)) for i in so_ids)
-    sql = f"""
+    if data is not None and data.lines is not None:
+        df = negative_lines(data.lines_for(so_ids))
+    else:
+        df = _query_negative_lines(so_ids)
+    if df.empty:
+        print("No negative line quantities in these SOs.")
+    else:
+        print("Negative line quantities (raw, before abs):")
+        print(df.to_string(index=False))
+
+def negative_lines(lines: pd.DataFrame) -> pd.DataFrame:
+    """Lines with a negative quantity, ordered by SO then item name, names attached."""
+    df = lines[lines["line_qty"] < 0].reset_index(drop=True)
+    if df.empty:
+        return df
+    if (df["line_qty"] % 1 == 0).all():
+        df["line_qty"] = df["line_qty"].astype(int)
+    df = _attach_item_names(df, sort=False)
+    return df.sort_values(by=["so_id","item_name"], ignore_index=True)
+
+def _query_negative_lines(so_ids: list[int]) -> pd.DataFrame:
+    df = suiteql_df_chunked(so_ids, lambda id_list: f"""
         SELECT
             tl.transaction AS so_id,
             tl.item        AS item_id,
-            i.itemid       AS item_name,
             tl.quantity    AS line_qty
         FROM "transactionline" tl
-        LEFT JOIN "item" i ON i.id = tl.item
         WHERE tl.transaction IN ({id_list})
           AND tl.mainline = 'F'
           AND tl.quantity < 0
-        ORDER BY so_id, item_name
-    """
-    df = suiteql_df(sql)
-    if df.empty:
-        print("No negative line quantities in these SOs.")
-    else:
-        print("Negative line quantities (raw, before abs):")
-        print(df.to_string(index=False))
+        ORDER BY tl.transaction, tl.id
+    """)
+    if not df.empty:
+        df.insert(2, "item_name", None)
+        df = _attach_item_names(df, sort=False)
+        # Chunks come back in ID order; restore the per-SO ordering across chunks
+        df = df.sort_values(by=["so_id","item_name"],
+                            key=lambda col: pd.to_numeric(col, errors="coerce") if col.name == "so_id" else col,
+                            ignore_index=True)
+    return df
 
-def compare_groups_a_minus_b(group_a: list[int], group_b: list[int]) -> pd.DataFrame:
-    """
-    Compute (A - B) by item. Missing items count as 0. Drop zero diffs.
-    """
-    a_items = aggregate_by_item(fetch_so_lines(group_a)).rename(columns={"total_qty":"qty_A"})
-    b_items = aggregate_by_item(fetch_so_lines(group_b)).rename(columns={"total_qty":"qty_B"})
+def _diff_lines_pandas(lines_a: pd.DataFrame, lines_b: pd.DataFrame) -> pd.DataFrame:
+    a_items = aggregate_by_item(lines_a).rename(columns={"total_qty":"qty_A"})
+    b_items = aggregate_by_item(lines_b).rename(columns={"total_qty":"qty_B"})
 
-    merged = pd.merge(a_items, b_items, on=["item_id","item_name"], how="outer").fillna({"qty_A":0.0, "qty_B":0.0})
-    merged["diff_A_minus_B"] = merged["qty_A"] - merged["qty_B"]
+    with METRICS.phase("merge"):
+        merged = pd.merge(a_items, b_items, on=["item_id","item_name"], how="outer").fillna({"qty_A":0.0, "qty_B":0.0})
+        merged["diff_A_minus_B"] = merged["qty_A"] - merged["qty_B"]
     merged = merged[merged["diff_A_minus_B"] != 0].copy()
     # If values are whole numbers, cast to int for cleaner output
     for c in ("qty_A","qty_B","diff_A_minus_B"):
@@ -248,35 +853,386 @@ def compare_groups_a_minus_b(group_a: list[int], group_b: list[int]) -> pd.DataF
     merged = merged.sort_values(by=["item_name","item_id"]).reset_index(drop=True)
     return merged
 
-def compare_groups_a_minus_b_rest(group_a: list[int], group_b: list[int]) -> pd.DataFrame:
-    a_items = aggregate_by_item(fetch_so_lines_rest(group_a)).rename(columns={"total_qty":"qty_A"})
-    b_items = aggregate_by_item(fetch_so_lines_rest(group_b)).rename(columns={"total_qty":"qty_B"})
-    merged = pd.merge(a_items, b_items, on=["item_id","item_name"], how="outer").fillna({"qty_A":0.0, "qty_B":0.0})
+def _line_arrays(lines: pd.DataFrame):
+    ids = lines["item_id"]
+    if ids.dtype != "Int64":
+        ids = pd.to_numeric(ids, errors="coerce").astype("Int64")
+    # Names stay a pandas array: the engine only indexes the rows it needs
+    return (ids.to_numpy(dtype="int64", na_value=bomdiff_engine.MISSING_ITEM_ID),
+            lines["line_qty"].to_numpy(dtype="float64"),
+            lines["item_name"].array)
+
+@timed("diff")
+def diff_lines(lines_a: pd.DataFrame, lines_b: pd.DataFrame, *, engine: str | None = None,
+               lookup_names: bool = True) -> pd.DataFrame:
+    """
+    A - B per item from two lines frames (so_id, item_id, item_name, line_qty).
+    Missing items count as 0; zero diffs are dropped. `engine` picks "numpy"
+    (default, see DIFF_ENGINE) or the original "pandas" groupby/merge path.
+    lookup_names=False keeps the names the lines carry instead of filling gaps from
+    the item master (snapshot replays, which must not reach NetSuite).
+    """
+    attach = _attach_item_names if lookup_names else (lambda df: df)
+    if (engine or DIFF_ENGINE) == "pandas":
+        return attach(_diff_lines_pandas(lines_a, lines_b))
+    a_ids, a_qty, a_names = _line_arrays(lines_a)
+    b_ids, b_qty, b_names = _line_arrays(lines_b)
+    cols = bomdiff_engine.diff_a_minus_b(a_ids, a_qty, b_ids, b_qty, a_names=a_names, b_names=b_names,
+                                         absolute=COUNT_ABSOLUTE_LINE_QTY)
+    out = pd.DataFrame(cols, columns=["item_id","item_name","qty_A","qty_B","diff_A_minus_B"])
+    out["item_id"] = out["item_id"].astype("Int64")
+    return attach(out)
+
+@timed("explode")
+def _explode_groups(*lines: pd.DataFrame, refresh: bool = False, progress=None) -> list[pd.DataFrame]:
+    _report(progress, "Exploding assemblies")
+    exploder = bom_exploder(refresh=refresh)
+    # Resolve every group's items together: one batched lookup per tree level in total
+    exploder.load(int(i) for df in lines for i in df["item_id"].dropna().unique())
+    out = [explode_lines(df, exploder=exploder) for df in lines]
+    _report_bom(exploder)
+    return out
+
+def compare_groups_a_minus_b(group_a: list[int] | GroupCriteria, group_b: list[int] | GroupCriteria, *,
+                             use_cache: bool | None = None, refresh: bool = False,
+                             explode: bool = False, progress=None, data: SOData | None = None) -> pd.DataFrame:
+    """
+    Compute (A - B) by item. Missing items count as 0. Drop zero diffs.
+    Either group may be GroupCriteria, selected inside the line query (see fetch_criteria_lines).
+    ID groups come from one fetch over their union: `data` if given, else fetch_so_data.
+    explode=True compares leaf components of assemblies/kits instead of the top-level items.
+    """
+    id_groups = [g for g in (group_a, group_b) if not isinstance(g, GroupCriteria)]
+    if data is None and id_groups:
+        data = fetch_so_data([i for g in id_groups for i in g], use_cache=use_cache, refresh=refresh,
+                             progress=lambda _, done, total: _report(progress, "Fetching SO lines", done, total))
+    lines_a = fetch_group_lines(group_a, data=data,
+                                progress=lambda _, done, total: _report(progress, "Fetching Group A lines", done, total))
+    lines_b = fetch_group_lines(group_b, data=data,
+                                progress=lambda _, done, total: _report(progress, "Fetching Group B lines", done, total))
+    if explode:
+        lines_a, lines_b = _explode_groups(lines_a, lines_b, refresh=refresh, progress=progress)
+    _report(progress, "Computing diff")
+    return diff_lines(lines_a, lines_b)
+
+def compare_groups_a_minus_b_rest(group_a: list[int], group_b: list[int],
+                                  records: dict[int, dict] | None = None, *,
+                                  explode: bool = False, refresh: bool = False) -> pd.DataFrame:
+    if records is None:
+        records = fetch_salesorders_rest(list(group_a) + list(group_b))
+    lines_a, lines_b = fetch_so_lines_rest(group_a, records), fetch_so_lines_rest(group_b, records)
+    if explode:
+        lines_a, lines_b = _explode_groups(lines_a, lines_b, refresh=refresh)
+    return diff_lines(lines_a, lines_b)
+
+# --- Streaming aggregation: SuiteQL pages fold straight into per-item totals ---
+def _page_columns(page: list[dict]):
+    """so_id, item_id (MISSING_ITEM_ID when empty) and quantity arrays of one SuiteQL page."""
+    col = lambda key: pd.to_numeric(pd.Series([r.get(key) for r in page], dtype=object), errors="coerce")
+    return (col("so_id").to_numpy(dtype="int64", na_value=0),
+            col("item_id").to_numpy(dtype="int64", na_value=bomdiff_engine.MISSING_ITEM_ID),
+            col("line_qty").to_numpy(dtype="float64", na_value=0.0))
+
+@timed("fetch")
+def stream_group_totals(groups: list[list[int] | GroupCriteria], *, progress=None) -> bomdiff_engine.ItemTotals:
+    """
+    Per-item totals of each group, folded page by page into bomdiff_engine.ItemTotals as
+    SuiteQL returns them. No lines frame is built, so memory is bounded by the pages in
+    flight and the distinct items, not by the number of SOs. ID groups share one chunked
+    query over their union (an SO in several groups counts toward each); criteria groups
+    run their own paged query. Lines are always read from NetSuite (no SO cache).
+    """
+    totals = bomdiff_engine.ItemTotals(len(groups), absolute=COUNT_ABSOLUTE_LINE_QTY)
+    members = {g: pd.Index(ids, dtype="int64").unique().to_numpy()
+               for g, ids in enumerate(groups) if not isinstance(ids, GroupCriteria)}
+    ids = [int(i) for so_ids in members.values() for i in so_ids]
+    total = len(set(ids))
+
+    def fold(chunk: list[int]) -> None:
+        # Fold into chunk-local totals: map_chunks reruns a chunk's halves when it is
+        # rejected as too large mid-way, so pages already read must not reach the shared totals
+        part = bomdiff_engine.ItemTotals(len(groups), absolute=COUNT_ABSOLUTE_LINE_QTY)
+        for page in suiteql_pages(_so_lines_sql(chunk, sales_orders_only=True)):
+            if page:
+                part.add_for_members(*_page_columns(page), members)
+        totals.merge(part)
+
+    _report(progress, "Fetching SO lines", 0, total)
+    get_client().map_chunks(ids, fold, on_progress=lambda done, _: _report(progress, "Fetching SO lines", done, total))
+    for g, criteria in enumerate(groups):
+        if isinstance(criteria, GroupCriteria):
+            _report(progress, "Fetching SO lines")
+            for page in suiteql_pages(_criteria_lines_sql(criteria)):
+                if page:
+                    _, item_ids, qty = _page_columns(page)
+                    totals.add(item_ids, qty, g)
+    print(f"Streamed {totals.lines} lines into {len(totals.ids)} item totals")
+    return totals
+
+def compare_groups_a_minus_b_streaming(group_a: list[int] | GroupCriteria, group_b: list[int] | GroupCriteria, *,
+                                       progress=None) -> pd.DataFrame:
+    """A - B by item from streamed totals (see stream_group_totals); same result as compare_groups_a_minus_b."""
+    totals = stream_group_totals([group_a, group_b], progress=progress)
+    _report(progress, "Computing diff")
+    with METRICS.phase("diff"):
+        out = pd.DataFrame(totals.diff(0, 1), columns=["item_id","item_name","qty_A","qty_B","diff_A_minus_B"])
+        out["item_id"] = out["item_id"].astype("Int64")
+    return _attach_item_names(out)
+
+# --- Offline snapshots: export lines once, replay diffs from memory-mapped columns ---
+@timed("fetch")
+def export_snapshot(groups: list[list[int] | GroupCriteria], path: str, *,
+                    use_cache: bool | None = None, refresh: bool = False, progress=None) -> Snapshot:
+    """
+    Write the headers and lines of every Sales Order in `groups` (ID lists and/or
+    GroupCriteria, resolved to IDs first) to a snapshot directory (see bomdiff_snapshot),
+    with the item names known now. Lines come through the SO cache like any other run.
+    """
+    ids = [i for n, group in enumerate(groups, 1) for i in _group_ids(group, f"Snapshot group {n}")]
+    if probe_backend() == "suiteql":
+        data = fetch_so_data(ids, use_cache=use_cache, refresh=refresh, progress=progress)
+        headers, lines = data.headers, data.lines
+    else:
+        records = fetch_salesorders_rest(ids, use_cache=use_cache, refresh=refresh, progress=progress)
+        found = [i for i, rec in records.items() if not rec.get("_not_found")]
+        headers = pd.DataFrame({"id": found, "tranid": [records[i].get("tranId") or "" for i in found],
+                                "last_modified": ""})
+        lines = fetch_so_lines_rest(found, records)
+    # Names the lines carry (REST) are kept where the item master has none
+    named = lines.dropna(subset=["item_id","item_name"])
+    names = {**dict(zip(named["item_id"].astype(int), named["item_name"])),
+             **{i: n for i, n in item_names(lines["item_id"].dropna().unique()).items() if n is not None}}
+    source = "; ".join(g.describe() if isinstance(g, GroupCriteria) else f"{len(g)} SO IDs" for g in groups)
+    write_snapshot(path, headers, lines, names, realm=REALM or "", source=source)
+    snap = Snapshot(path)
+    print(f"Wrote snapshot: {snap.describe()}")
+    return snap
+
+def compare_groups_snapshot(group_a: list[int], group_b: list[int], snapshot: Snapshot | str, *,
+                            explode: bool = False, refresh: bool = False, progress=None) -> pd.DataFrame:
+    """
+    A - B replayed from a snapshot: verification and lines are read from its memory-mapped
+    columns and names from its item table, so nothing is sent to NetSuite (explode=True
+    still resolves BOMs through the BOM cache and the item master).
+    """
+    if any(isinstance(g, GroupCriteria) for g in (group_a, group_b)):
+        raise ValueError("criteria are resolved by NetSuite; replay a snapshot with SO ID groups")
+    snap = snapshot if isinstance(snapshot, Snapshot) else Snapshot(snapshot)
+    print(f"Snapshot: {snap.describe()}")
+    _report(progress, "Reading snapshot")
+    data = SOData(snap.headers_for(list(group_a) + list(group_b)))
+    verify_so_ids(group_a, "Group A", data)
+    verify_so_ids(group_b, "Group B", data)
+    lines_a, lines_b = snap.lines_for(group_a), snap.lines_for(group_b)
+    if explode:
+        lines_a, lines_b = _explode_groups(lines_a, lines_b, refresh=refresh, progress=progress)
+    _report(progress, "Computing diff")
+    return diff_lines(lines_a, lines_b, lookup_names=explode)
+
+def union_ids(groups: dict[str, list[int]]) -> list[int]:
+    """Distinct SO IDs across all groups, in first-seen order."""
+    return list(dict.fromkeys(int(i) for ids in groups.values() for i in ids))
+
+def group_pairs(labels: list[str], *, baseline: str | None = None, pairwise: bool = False) -> list[tuple[str, str]]:
+    """
+    Diff columns for a group matrix: every (x, y) pair when pairwise, otherwise each
+    group against `baseline` (default: the first group).
+    """
+    labels = list(labels)
+    if pairwise:
+        return [(x, y) for i, x in enumerate(labels) for y in labels[i + 1:]]
+    baseline = labels[0] if baseline is None else baseline
+    if baseline not in labels:
+        raise ValueError(f"Baseline group {baseline!r} is not one of {labels}")
+    return [(x, baseline) for x in labels if x != baseline]
+
+@timed("diff")
+def diff_groups_matrix(lines: pd.DataFrame, groups: dict[str, list[int]], *,
+                       baseline: str | None = None, pairwise: bool = False) -> pd.DataFrame:
+    """
+    Items x groups matrix from one lines frame covering every group's SOs:
+    item_id, item_name, qty_<group>..., diff_<x>_minus_<y>... (see group_pairs).
+    Rows where every diff is zero are dropped.
+    """
+    if len(groups) < 2:
+        raise ValueError("A group matrix needs at least two groups")
+    pairs = group_pairs(list(groups), baseline=baseline, pairwise=pairwise)
+    ids, qty, names = _line_arrays(lines)
+    so = lines["so_id"].to_numpy(dtype="int64", na_value=-1)
+    cols = bomdiff_engine.group_matrix(so, ids, qty, groups, pairs, names=names,
+                                       absolute=COUNT_ABSOLUTE_LINE_QTY)
+    out = pd.DataFrame(cols, columns=list(cols))
+    out["item_id"] = out["item_id"].astype("Int64")
+    return _attach_item_names(out)
+
+def compare_groups_matrix(groups: dict[str, list[int]], *, baseline: str | None = None,
+                          pairwise: bool = False, use_cache: bool | None = None,
+                          refresh: bool = False, explode: bool = False,
+                          data: SOData | None = None) -> pd.DataFrame:
+    """
+    N-group comparison: fetch the lines of every distinct SO once (or take them from
+    `data`), then aggregate each group from that single set of lines.
+    """
+    if data is None:
+        data = fetch_so_data(union_ids(groups), use_cache=use_cache, refresh=refresh)
+    lines = data.lines
+    if explode:
+        (lines,) = _explode_groups(lines, refresh=refresh)
+    return diff_groups_matrix(lines, groups, baseline=baseline, pairwise=pairwise)
+
+def compare_groups_matrix_rest(groups: dict[str, list[int]], *, baseline: str | None = None,
+                               pairwise: bool = False, records: dict[int, dict] | None = None,
+                               explode: bool = False, refresh: bool = False) -> pd.DataFrame:
+    union = union_ids(groups)
+    lines = fetch_so_lines_rest(union, records)
+    if explode:
+        (lines,) = _explode_groups(lines, refresh=refresh)
+    return diff_groups_matrix(lines, groups, baseline=baseline, pairwise=pairwise)
+
+@timed("pushdown")
+def compare_groups_a_minus_b_pushdown(group_a: list[int], group_b: list[int]) -> pd.DataFrame:
+    """
+    Compute (A - B) by item inside NetSuite. One SuiteQL statement per IN-list chunk tags
+    each line with its group, applies COUNT_ABSOLUTE_LINE_QTY and groups by item, so the
+    response holds distinct items rather than every line. When one chunk covers every ID,
+    HAVING also keeps only non-zero differences on the wire; with several chunks each
+    returns all of its items and zero differences are dropped after combining them.
+    An SO listed in both groups counts towards both, as in the client-side path.
+    """
+    cols = ["item_id","item_name","qty_A","qty_B","diff_A_minus_B"]
+    ids_a = list(dict.fromkeys(int(i) for i in group_a or []))
+    ids_b = list(dict.fromkeys(int(i) for i in group_b or []))
+    ids_all = list(dict.fromkeys(ids_a + ids_b))
+    if not ids_all:
+        return pd.DataFrame(columns=cols)
+
+    qty = "ABS(NVL(tl.quantity, 0))" if COUNT_ABSOLUTE_LINE_QTY else "NVL(tl.quantity, 0)"
+    set_a, set_b = set(ids_a), set(ids_b)
+
+    def query_chunk(chunk: list[int]) -> pd.DataFrame:
+        def group_sum(ids: list[int]) -> str:
+            if not ids:
+                return "0"
+            return f"SUM(CASE WHEN tl.transaction IN ({','.join(map(str, ids))}) THEN {qty} ELSE 0 END)"
+        sum_a = group_sum([i for i in chunk if i in set_a])
+        sum_b = group_sum([i for i in chunk if i in set_b])
+        # Groups larger than one IN-list chunk are summed per chunk and combined below,
+        # so HAVING can only filter when a single statement covers every ID
+        having = f"HAVING {sum_a} - {sum_b} <> 0" if len(chunk) == len(ids_all) else ""
+        return suiteql_df(f"""
+            SELECT
+                tl.item   AS item_id,
+                {sum_a}   AS qty_a,
+                {sum_b}   AS qty_b
+            FROM "transactionline" tl
+            WHERE tl.transaction IN ({','.join(map(str, chunk))})
+              AND tl.mainline = 'F'
+            GROUP BY tl.item
+            {having}
+            ORDER BY tl.item
+        """)
+
+    # Each ID is written once in the WHERE IN-list and again in its group's CASE (twice
+    # for SOs in both groups), so chunks are sized for that longer statement
+    id_weight = (len(ids_all) + len(ids_a) + len(ids_b)) / len(ids_all)
+    frames = [f for f in get_client().map_chunks(ids_all, query_chunk, id_weight=id_weight) if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=cols)
+    merged = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    merged = merged.rename(columns={"qty_a":"qty_A", "qty_b":"qty_B"}).reindex(columns=cols)
+    # SuiteQL returns ids as strings; same nullable integer ids as the client-side path
+    merged["item_id"] = pd.to_numeric(merged["item_id"], errors="coerce").astype("Int64")
+    for c in ("qty_A","qty_B"):
+        merged[c] = pd.to_numeric(merged[c], errors="coerce").fillna(0.0)
+    if len(frames) > 1:
+        merged = merged.groupby(["item_id","item_name"], dropna=False, as_index=False)[["qty_A","qty_B"]].sum()
     merged["diff_A_minus_B"] = merged["qty_A"] - merged["qty_B"]
     merged = merged[merged["diff_A_minus_B"] != 0].copy()
     for c in ("qty_A","qty_B","diff_A_minus_B"):
         if (merged[c] % 1 == 0).all():
             merged[c] = merged[c].astype(int)
     merged = merged.sort_values(by=["item_name","item_id"]).reset_index(drop=True)
-    return merged
+    return _attach_item_names(merged)
+
+REQUIRED_RECORDS = ("item","transaction","transactionline")
+
+def _probe_record(rec: str) -> bool | None:
+    """True if SuiteQL can read the table, False if NetSuite refused it, None if undetermined."""
+    try:
+        suiteql(f'SELECT 1 FROM "{rec}" FETCH NEXT 1 ROWS ONLY')
+        return True
+    except requests.HTTPError as e:
+        status = e.response.status_code if e.response is not None else None
+        return False if status is not None and 400 <= status < 500 else None
+    except requests.RequestException:
+        return None
 
 # NEW: return a boolean instead of hard stop; we’ll fall back to REST if needed
-def check_required_records(required: tuple[str, ...] = ("item","transaction","transactionline")) -> bool:
-    inaccessible = []
-    for rec in required:
-        try:
-            suiteql(f'SELECT 1 FROM "{rec}" FETCH NEXT 1 ROWS ONLY')
-        except Exception:
-            inaccessible.append(rec)
+def check_required_records(required: tuple[str, ...] = REQUIRED_RECORDS) -> bool:
+    return _report_record_access(_probe_records(required))
+
+def _probe_records(required: tuple[str, ...]) -> dict[str, bool | None]:
+    # Independent one-row probes: run them side by side instead of back to back
+    with ThreadPoolExecutor(max_workers=len(required) or 1) as pool:
+        return dict(zip(required, pool.map(get_client().bind_cancel(_probe_record), required)))
+
+def _report_record_access(access: dict[str, bool | None]) -> bool:
+    inaccessible = [rec for rec, ok in access.items() if not ok]
     if inaccessible:
         print(
             "SuiteQL record catalog not available for: " + ", ".join(inaccessible) + "\n"
             "Falling back to REST Records for Sales Order lines."
         )
         return False
-    print("Record access OK for:", ", ".join(required))
+    print("Record access OK for:", ", ".join(access))
     return True
 
+_probe_cache: ProbeCache | None = None
+# Table access found by probe_backend in this process per (realm, token identity)
+_access: dict[tuple[str, str], dict[str, bool | None]] = {}
+
+def _token_identity() -> str:
+    # The access token is bound to one role, so it stands in for realm + role
+    return hashlib.sha256((TID or "").strip().encode()).hexdigest()[:16]
+
+@timed("probe")
+def probe_backend(*, refresh: bool = False) -> str:
+    """
+    Decide between the "suiteql" and "rest" backends. The decision is cached per
+    realm and token (role) for BOMDIFF_PROBE_TTL_HOURS, so most runs and GUI
+    launches skip the probes entirely; when stale, the table probes run concurrently.
+    Only definitive answers are cached: network errors and 5xx are retried next run.
+    """
+    global _probe_cache
+    if _probe_cache is None:
+        with _client_lock:
+            if _probe_cache is None:
+                _probe_cache = ProbeCache()
+    identity = _token_identity()
+    if not refresh:
+        hit = _probe_cache.get(REALM, identity)
+        METRICS.cache("probe", hits=hit is not None, misses=hit is None)
+        if hit is not None:
+            print(f"Backend: {hit[0]} (cached probe)")
+            _access[(REALM, identity)] = hit[1]
+            return hit[0]
+    access = _probe_records(REQUIRED_RECORDS)
+    backend = "suiteql" if _report_record_access(access) else "rest"
+    if all(ok is not None for ok in access.values()):
+        _probe_cache.put(REALM, identity, backend, access)
+    _access[(REALM, identity)] = access
+    return backend
+
+def suiteql_reads_transactions() -> bool:
+    """
+    True if probe_backend found the transaction table readable through SuiteQL for this
+    realm and role (probing only if it has not run), so SO stamps take one query.
+    """
+    key = (REALM, _token_identity())
+    if key not in _access:
+        probe_backend()
+    return bool(_access.get(key, {}).get("transaction"))
+
 def _detect_excel_engine() -> str | None:
     try:
         import openpyxl  # noqa: F401
@@ -288,12 +1244,17 @@ def _detect_excel_engine() -> str | None:
         except Exception:
             return None
 
-def write_outputs(df: pd.DataFrame, csv_path: str, xlsx_path: str) -> None:
-    # Ensure a DataFrame and sane column order
+def output_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """A result frame in output column order: ids, per-group quantities, then diffs."""
     df = df if isinstance(df, pd.DataFrame) else pd.DataFrame()
-    preferred = [c for c in ["item_id","item_name","qty_A","qty_B","diff_A_minus_B"] if c in df.columns]
-    if preferred:
-        df = df[preferred]
+    preferred = ([c for c in ["item_id","item_name"] if c in df.columns]
+                 + [c for c in df.columns if c.startswith("qty_")]
+                 + [c for c in df.columns if c.startswith("diff_")])
+    return df[preferred] if preferred else df
+
+@timed("write")
+def write_outputs(df: pd.DataFrame, csv_path: str, xlsx_path: str, *, sheet_name: str = "A_minus_B") -> None:
+    df = output_frame(df)
 
     # Always write CSV (no extra deps)
     df.to_csv(csv_path, index=False, encoding="utf-8-sig")
@@ -304,7 +1265,7 @@ def write_outputs(df: pd.DataFrame, csv_path: str, xlsx_path: str) -> None:
         engine = _detect_excel_engine()
         if engine:
             with pd.ExcelWriter(xlsx_path, engine=engine) as xw:
-                df.to_excel(xw, index=False, sheet_name="A_minus_B")
+                df.to_excel(xw, index=False, sheet_name=sheet_name)
             wrote_xlsx = True
 
     print("Wrote outputs:")
@@ -315,26 +1276,183 @@ def write_outputs(df: pd.DataFrame, csv_path: str, xlsx_path: str) -> None:
         if xlsx_path:
             print(" - Skipped XLSX (install 'openpyxl' or 'xlsxwriter' to enable)")
 
-def run_diff(group_a_ids: list[int], group_b_ids: list[int],
+def _group_ids(group: list[int] | GroupCriteria, label: str) -> list[int]:
+    """SO IDs of a group; criteria are resolved with one header query (REST and pushdown paths)."""
+    if not isinstance(group, GroupCriteria):
+        return group
+    try:
+        ids = criteria_so_ids(group)
+    except requests.HTTPError as e:
+        raise SystemExit(f"{label} is defined by criteria, which are resolved through SuiteQL on the "
+                         f"transaction table, and that query failed: {e}")
+    print(f"{label} criteria [{group.describe()}]: {len(ids)} Sales Orders")
+    return ids
+
+# Finished A-B results, reused while fresh (BOMDIFF_RESULT_MEMO_SIZE / BOMDIFF_RESULT_TTL_SECONDS)
+_result_memo = ResultMemo()
+
+def _result_key(group_a: list[int], group_b: list[int], **options) -> tuple:
+    """Memo key: each group's sorted distinct IDs plus every option that shapes the result."""
+    return (REALM, tuple(sorted(set(group_a))), tuple(sorted(set(group_b))),
+            COUNT_ABSOLUTE_LINE_QTY, DIFF_ENGINE, *sorted(options.items()))
+
+@timed("run")
+def compute_diff(group_a_ids: list[int] | GroupCriteria, group_b_ids: list[int] | GroupCriteria,
+                 *,
+                 use_cache: bool | None = None, refresh: bool = False,
+                 pushdown: bool = False, reprobe: bool = False, explode: bool = False,
+                 snapshot: Snapshot | str | None = None, stream: bool = False,
+                 progress=None, cancel: threading.Event | None = None) -> pd.DataFrame:
+    """
+    Produce the A-B diff without writing outputs (see run_diff, and the diff service).
+    Each group is a list of SO internal IDs or GroupCriteria (see bomdiff_criteria); on the
+    SuiteQL backend criteria are applied inside the line query, so they need no verify step.
+    use_cache/refresh control the local SO cache (default: USE_SO_CACHE).
+    pushdown=True computes the diff inside NetSuite (SuiteQL backend only).
+    explode=True expands assemblies/kits into leaf components before aggregating
+    (not combinable with pushdown, which aggregates top-level items in NetSuite).
+    reprobe=True ignores the cached backend choice and probes again.
+    snapshot (a path or Snapshot, see export_snapshot) replays ID groups offline instead.
+    stream=True folds SuiteQL pages into running per-item totals instead of holding every
+    line (bounded memory for very large groups; bypasses the SO cache, see stream_group_totals).
+    progress(phase, done, total) receives phase changes and SO counts (from any thread);
+    setting `cancel` stops further requests and raises Cancelled before outputs are written.
+    A result computed in this process for the same distinct IDs and options is reused
+    until it is BOMDIFF_RESULT_TTL_SECONDS old, unless caching is off, refresh or reprobe
+    (never for criteria groups).
+    Returns the resulting DataFrame (in output column order, see output_frame).
+    """
+    if pushdown and explode:
+        raise ValueError("pushdown aggregates top-level items inside NetSuite and cannot be combined with explode")
+    if stream and (explode or pushdown or snapshot is not None):
+        raise ValueError("stream aggregates top-level items from NetSuite pages and cannot be combined "
+                         "with explode, pushdown or a snapshot")
+    # Duplicate IDs count once on every backend
+    group_a_ids, group_b_ids = (g if isinstance(g, GroupCriteria) else list(dict.fromkeys(int(i) for i in g))
+                                for g in (group_a_ids, group_b_ids))
+    if snapshot is not None:
+        if pushdown:
+            raise ValueError("pushdown computes the diff inside NetSuite and cannot replay a snapshot")
+        result = compare_groups_snapshot(group_a_ids, group_b_ids, snapshot, explode=explode,
+                                         refresh=refresh, progress=progress)
+        print(f"Rows in A − B with non-zero diff: {len(result)}")
+        return output_frame(result)
+    # Criteria groups are not memoized: which orders match (and their lines) can change
+    # between runs, like fetch_criteria_lines which is never cached either
+    memoize = (USE_SO_CACHE if use_cache is None else use_cache) and not any(
+        isinstance(g, GroupCriteria) for g in (group_a_ids, group_b_ids))
+    key = _result_key(group_a_ids, group_b_ids, explode=bool(explode), pushdown=bool(pushdown)) if memoize else None
+    if memoize and not (refresh or reprobe):
+        hit = _result_memo.get(key)
+        METRICS.cache("result", hits=int(hit is not None), misses=int(hit is None))
+        if hit is not None:
+            print(f"Reused the diff computed earlier in this process: {len(hit)} rows")
+            return hit.copy()
+    client = get_client()
+    with client.cancellation(cancel):
+        _report(progress, "Checking table access")
+        suiteql_ok = probe_backend(refresh=reprobe) == "suiteql"
+        client.raise_if_cancelled()
+        if suiteql_ok and stream:
+            # Headers only for verification; lines are folded into totals page by page
+            id_groups = [(g, label) for g, label in ((group_a_ids, "Group A"), (group_b_ids, "Group B"))
+                         if not isinstance(g, GroupCriteria)]
+            if id_groups:
+                _report(progress, "Verifying Sales Orders")
+                data = fetch_so_data([i for g, _ in id_groups for i in g], lines=False)
+                for group, label in id_groups:
+                    verify_so_ids(group, label, data)
+            client.raise_if_cancelled()
+            result = compare_groups_a_minus_b_streaming(group_a_ids, group_b_ids, progress=progress)
+        elif suiteql_ok and not pushdown:
+            # One header + line fetch over the ID groups feeds verification and the diff
+            id_groups = [(g, label) for g, label in ((group_a_ids, "Group A"), (group_b_ids, "Group B"))
+                         if not isinstance(g, GroupCriteria)]
+            data = None
+            if id_groups:
+                data = fetch_so_data([i for g, _ in id_groups for i in g], use_cache=use_cache, refresh=refresh,
+                                     progress=lambda _, done, total: _report(progress, "Fetching SO lines", done, total))
+                for group, label in id_groups:
+                    verify_so_ids(group, label, data)
+            client.raise_if_cancelled()
+            result = compare_groups_a_minus_b(group_a_ids, group_b_ids, explode=explode,
+                                              progress=progress, data=data)
+        elif suiteql_ok:
+            _report(progress, "Verifying Sales Orders")
+            group_a_ids, group_b_ids = _group_ids(group_a_ids, "Group A"), _group_ids(group_b_ids, "Group B")
+            data = fetch_so_data(group_a_ids + group_b_ids, lines=False)
+            verify_so_ids(group_a_ids, "Group A", data)
+            verify_so_ids(group_b_ids, "Group B", data)
+            client.raise_if_cancelled()
+            _report(progress, "Computing diff in NetSuite")
+            result = compare_groups_a_minus_b_pushdown(group_a_ids, group_b_ids)
+        else:
+            if stream:
+                print("Streaming aggregation reads SuiteQL pages; using the REST Records path instead.")
+            group_a_ids, group_b_ids = _group_ids(group_a_ids, "Group A"), _group_ids(group_b_ids, "Group B")
+            # One concurrent download per distinct SO feeds both verification and the diff
+            records = fetch_salesorders_rest(list(group_a_ids) + list(group_b_ids),
+                                             use_cache=use_cache, refresh=refresh, progress=progress)
+            verify_so_ids_rest(group_a_ids, "Group A", records)
+            verify_so_ids_rest(group_b_ids, "Group B", records)
+            _report(progress, "Exploding assemblies" if explode else "Computing diff")
+            result = compare_groups_a_minus_b_rest(group_a_ids, group_b_ids, records,
+                                                   explode=explode, refresh=refresh)
+        client.raise_if_cancelled()
+
+    print(f"Rows in A − B with non-zero diff: {len(result)}")
+    print("NetSuite:", client.governor.summary())
+    result = output_frame(result)
+    if memoize:
+        _result_memo.put(key, result.copy())
+    return result
+
+@timed("run")
+def run_diff(group_a_ids: list[int] | GroupCriteria, group_b_ids: list[int] | GroupCriteria,
              output_csv_path: str,
-             output_xlsx_path: str | None = None) -> pd.DataFrame:
+             output_xlsx_path: str | None = None, *,
+             use_cache: bool | None = None, refresh: bool = False,
+             pushdown: bool = False, reprobe: bool = False, explode: bool = False,
+             snapshot: Snapshot | str | None = None, stream: bool = False,
+             progress=None, cancel: threading.Event | None = None) -> pd.DataFrame:
+    """
+    Reusable entry point: produce A-B diff (see compute_diff for the options) and write outputs.
+    Returns the resulting DataFrame.
     """
-    Reusable entry point: produce A-B diff and write outputs.
+    result = compute_diff(group_a_ids, group_b_ids, use_cache=use_cache, refresh=refresh, pushdown=pushdown,
+                          reprobe=reprobe, explode=explode, snapshot=snapshot, stream=stream,
+                          progress=progress, cancel=cancel)
+    _report(progress, "Writing outputs")
+    write_outputs(result, output_csv_path, output_xlsx_path or "")
+    return result
+
+@timed("run")
+def run_matrix(groups: dict[str, list[int]], output_csv_path: str,
+               output_xlsx_path: str | None = None, *,
+               baseline: str | None = None, pairwise: bool = False,
+               use_cache: bool | None = None, refresh: bool = False,
+               reprobe: bool = False, explode: bool = False) -> pd.DataFrame:
+    """
+    N-group entry point: one header and line fetch over the union of all groups' SOs
+    (verification is derived from it), then an items x groups matrix (see diff_groups_matrix) written to outputs.
+    explode=True expands assemblies/kits into leaf components first.
     Returns the resulting DataFrame.
     """
-    print("SuiteQL ok →", suiteql("SELECT 1 AS ok"))
-    suiteql_ok = check_required_records()
-    if suiteql_ok:
-        verify_so_ids(group_a_ids, "Group A")
-        verify_so_ids(group_b_ids, "Group B")
-        result = compare_groups_a_minus_b(group_a_ids, group_b_ids)
+    if probe_backend(refresh=reprobe) == "suiteql":
+        data = fetch_so_data(union_ids(groups), use_cache=use_cache, refresh=refresh)
+        verify_groups(groups, data)
+        result = compare_groups_matrix(groups, baseline=baseline, pairwise=pairwise,
+                                       explode=explode, data=data)
     else:
-        verify_so_ids_rest(group_a_ids, "Group A")
-        verify_so_ids_rest(group_b_ids, "Group B")
-        result = compare_groups_a_minus_b_rest(group_a_ids, group_b_ids)
+        records = fetch_salesorders_rest(union_ids(groups), use_cache=use_cache, refresh=refresh)
+        for label, ids in groups.items():
+            verify_so_ids_rest(ids, f"Group {label}", records)
+        result = compare_groups_matrix_rest(groups, baseline=baseline, pairwise=pairwise, records=records,
+                                            explode=explode, refresh=refresh)
 
-    print(f"Rows in A − B with non-zero diff: {len(result)}")
-    write_outputs(result, output_csv_path, output_xlsx_path or "")
+    print(f"Rows in group matrix with a non-zero diff: {len(result)}")
+    print("NetSuite:", get_client().governor.summary())
+    write_outputs(result, output_csv_path, output_xlsx_path or "", sheet_name="group_matrix")
     return result
 
 if __name__ == "__main__":
@@ -0,0 +1,104 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bomdiff_batch as batch
+import so_bomdiff_application as core
+
+LINES = core._normalize_lines(pd.DataFrame([
+    (1, 10, "Bolt", 4), (2, 10, "Bolt", 1), (3, 11, "Nut", 2), (4, 11, "Nut", 5), (5, 12, "Washer", 1),
+], columns=core.LINE_COLUMNS))
+
+
+class BatchResumeTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.job_path = os.path.join(self.dir, "jobs.json")
+        self.plans = []
+        # The plan's lines come from LINES instead of NetSuite; each call records its plan
+        fetch = mock.patch.object(batch, "fetch_plan_lines", side_effect=self._fetch)
+        client = mock.patch.object(core, "get_client")
+        fetch.start(), client.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _fetch(self, so_ids, **_):
+        self.plans.append(list(so_ids))
+        return LINES[LINES["so_id"].isin(so_ids)], set(so_ids) & set(LINES["so_id"])
+
+    def write_jobs(self, jobs):
+        with open(self.job_path, "w", encoding="utf-8") as fh:
+            json.dump({"jobs": jobs}, fh)
+
+    def run_batch(self, **kw):
+        return {r["name"]: r for r in batch.run_batch(self.job_path, workers=2, **kw)}
+
+    def test_resume_skips_finished_jobs(self):
+        # "second" fails: a file sits where its output folder should be
+        blocker = os.path.join(self.dir, "blocked")
+        open(blocker, "w").close()
+        self.write_jobs([
+            {"name": "first", "group_a": "1 2", "group_b": [3], "output_csv": "first.csv"},
+            {"name": "second", "group_a": "4|9", "group_b": "5", "output_csv": "blocked/second.csv"},
+        ])
+        results = self.run_batch()
+        self.assertEqual(results["first"]["status"], "done")
+        self.assertEqual(results["second"]["status"], "failed")
+        self.assertEqual(self.plans, [[1, 2, 3, 4, 9, 5]])
+        written = pd.read_csv(os.path.join(self.dir, "first.csv"), encoding="utf-8-sig")
+        expected = core.diff_lines(LINES[LINES["so_id"].isin([1, 2])], LINES[LINES["so_id"] == 3])
+        self.assertEqual(len(written), len(expected))
+
+        os.remove(blocker)
+        results = self.run_batch()
+        self.assertEqual(results["first"]["status"], "skipped")
+        self.assertEqual(results["second"]["status"], "done")
+        self.assertEqual(results["second"]["missing"], [9])
+        # Only the unfinished job's SOs are fetched on resume
+        self.assertEqual(self.plans[1], [4, 9, 5])
+
+        results = self.run_batch()
+        self.assertEqual({r["status"] for r in results.values()}, {"skipped"})
+        self.assertEqual(len(self.plans), 2)
+
+    def test_changed_or_deleted_outputs_rerun(self):
+        self.write_jobs([{"name": "first", "group_a": "1", "group_b": "3", "output_csv": "first.csv"},
+                         {"name": "second", "group_a": "2", "group_b": "4", "output_csv": "second.csv"}])
+        self.run_batch()
+        # Changed inputs change the fingerprint; a deleted CSV no longer counts as done
+        self.write_jobs([{"name": "first", "group_a": "1 2", "group_b": "3", "output_csv": "first.csv"},
+                         {"name": "second", "group_a": "2", "group_b": "4", "output_csv": "second.csv"}])
+        results = self.run_batch()
+        self.assertEqual((results["first"]["status"], results["second"]["status"]), ("done", "skipped"))
+        os.remove(os.path.join(self.dir, "second.csv"))
+        results = self.run_batch()
+        self.assertEqual((results["first"]["status"], results["second"]["status"]), ("skipped", "done"))
+        results = self.run_batch(resume=False)
+        self.assertEqual({r["status"] for r in results.values()}, {"done"})
+        self.assertEqual(self.plans[-1], [1, 2, 3, 4])
+
+    def test_checkpoint_ignores_truncated_line(self):
+        path = os.path.join(self.dir, "cp.jsonl")
+        job = batch.BatchJob("first", (1,), (3,), os.path.join(self.dir, "first.csv"))
+        open(job.output_csv, "w").close()
+        batch.Checkpoint(path).mark_done(job, rows=1)
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write('{"name": "sec')
+        cp = batch.Checkpoint(path)
+        self.assertTrue(cp.is_done(job))
+        cp.clear()
+        self.assertFalse(cp.is_done(job))
+        self.assertFalse(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import datetime as dt
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bomdiff_criteria import GroupCriteria, looks_like_criteria, parse_criteria
+
+
+class ParseCriteriaTest(unittest.TestCase):
+
+    def test_all_filters(self):
+        c = parse_criteria("date>=2024-01-01 date<=2024-03-31 customer=5012,5013; subsidiary=2\n"
+                           "status=B,D tranid=SO6*")
+        self.assertEqual(c, GroupCriteria(date_from=dt.date(2024, 1, 1), date_to=dt.date(2024, 3, 31),
+                                          customers=(5012, 5013), subsidiaries=(2,),
+                                          statuses=("B", "D"), tranid="SO6*"))
+        self.assertEqual(parse_criteria(c.describe()), c)
+
+    def test_date_operators(self):
+        self.assertEqual(parse_criteria("trandate=2024-02-29"),
+                         GroupCriteria(date_from=dt.date(2024, 2, 29), date_to=dt.date(2024, 2, 29)))
+        c = parse_criteria("date>2024-01-31 date<2024-03-01")
+        self.assertEqual((c.date_from, c.date_to), (dt.date(2024, 2, 1), dt.date(2024, 2, 29)))
+
+    def test_invalid_input(self):
+        for text in ("", "   ", "colour=red", "customer>5", "customer=abc", "date>=2024-13-01",
+                     "status=B'--", "842689"):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_criteria(text)
+        with self.assertRaisesRegex(ValueError, "criteria need at least one filter"):
+            parse_criteria("")
+
+    def test_looks_like_criteria(self):
+        self.assertTrue(looks_like_criteria("customer=5"))
+        self.assertFalse(looks_like_criteria("842689, 842688\n675219"))
+
+
+class WhereTest(unittest.TestCase):
+
+    def test_conditions(self):
+        where = parse_criteria("date>=2024-01-01 customer=7,8 subsidiary=2 status=B,SalesOrd:D").where("h")
+        self.assertEqual(where.split(" AND ")[:4], [
+            "h.\"type\" = 'SalesOrd'",
+            "h.trandate >= TO_DATE('2024-01-01', 'YYYY-MM-DD')",
+            "h.entity IN (7,8)",
+            "h.id IN (SELECT ml.transaction FROM \"transactionline\" ml WHERE ml.mainline = 'T'",
+        ])
+        self.assertIn("ml.subsidiary IN (2))", where)
+        self.assertTrue(where.endswith("h.status IN ('B','SalesOrd:D')"))
+
+    def test_tranid_quoting(self):
+        where = GroupCriteria(tranid="O'Brien*").where()
+        self.assertTrue(where.endswith("t.tranid LIKE 'O''Brien%'"))
+        self.assertEqual(where.count("'"), 6)
+
+    def test_ids_rendered_as_integers(self):
+        self.assertIn("t.entity IN (1,2)", GroupCriteria(customers=("1", 2.0)).where())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bomdiff_engine
+import so_bomdiff_application as core
+
+
+def _lines(rows):
+    return core._normalize_lines(pd.DataFrame(rows, columns=core.LINE_COLUMNS))
+
+
+def _diff(engine, lines_a, lines_b):
+    return core.diff_lines(lines_a, lines_b, engine=engine, lookup_names=False)
+
+
+class EngineParityTest(unittest.TestCase):
+    """The NumPy engine must give the same frame as the original pandas groupby/merge path."""
+
+    def assertParity(self, lines_a, lines_b):
+        fast = _diff("numpy", lines_a, lines_b)
+        slow = _diff("pandas", lines_a, lines_b)
+        self.assertEqual(fast["item_id"].tolist(), slow["item_id"].tolist())
+        self.assertEqual(fast["item_name"].tolist(), slow["item_name"].tolist())
+        for c in ("qty_A", "qty_B", "diff_A_minus_B"):
+            self.assertEqual(fast[c].tolist(), slow[c].tolist(), c)
+            self.assertEqual(fast[c].dtype.kind, slow[c].dtype.kind, c)
+        return fast
+
+    def test_dense_path(self):
+        a = _lines([(1, 10, "Bolt", 4), (1, 11, "Nut", 2), (2, 10, "Bolt", 1), (2, 12, "Washer", 3)])
+        b = _lines([(3, 10, "Bolt", 5), (3, 12, "Washer", 1), (3, 13, "Pin", 2)])
+        out = self.assertParity(a, b)
+        self.assertEqual(out["item_name"].tolist(), ["Nut", "Pin", "Washer"])
+        self.assertEqual(out["diff_A_minus_B"].tolist(), [2, -2, 2])
+
+    def test_sparse_ids_use_unique_path(self):
+        a = _lines([(1, 10**12, "Far", 2), (1, 7, "Near", 1)])
+        b = _lines([(2, 7, "Near", 3)])
+        with mock.patch.object(bomdiff_engine, "DENSE_ID_FLOOR", 0), \
+             mock.patch.object(bomdiff_engine, "DENSE_ID_FACTOR", 0), \
+             mock.patch.object(bomdiff_engine, "_group_index", wraps=bomdiff_engine._group_index) as spy:
+            out = self.assertParity(a, b)
+        spy.assert_called_once()
+        self.assertEqual(out["item_id"].tolist(), [10**12, 7])
+        self.assertEqual(out["diff_A_minus_B"].tolist(), [2, -2])
+
+    def test_missing_item_id(self):
+        a = _lines([(1, None, "Freight", 1), (1, 10, "Bolt", 2)])
+        b = _lines([(2, 10, "Bolt", 1)])
+        out = self.assertParity(a, b)
+        self.assertTrue(pd.isna(out["item_id"].iloc[1]))
+        self.assertEqual(out["item_name"].tolist(), ["Bolt", "Freight"])
+        self.assertNotIn(bomdiff_engine.MISSING_ITEM_ID, out["item_id"].dropna().tolist())
+
+    def test_int_cast_only_when_whole(self):
+        whole = _diff("numpy", _lines([(1, 10, "Bolt", 2)]), _lines([(2, 10, "Bolt", 1)]))
+        self.assertEqual(whole["diff_A_minus_B"].dtype.kind, "i")
+        frac = self.assertParity(_lines([(1, 10, "Bolt", 2.5)]), _lines([(2, 10, "Bolt", 1)]))
+        self.assertEqual(frac["diff_A_minus_B"].dtype.kind, "f")
+        self.assertEqual(frac["diff_A_minus_B"].tolist(), [1.5])
+
+    def test_zero_diffs_dropped(self):
+        out = self.assertParity(_lines([(1, 10, "Bolt", 2)]), _lines([(2, 10, "Bolt", 2)]))
+        self.assertTrue(out.empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
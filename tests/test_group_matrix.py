@@ -0,0 +1,51 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bomdiff_engine
+
+
+class GroupMatrixTest(unittest.TestCase):
+    # SO 2 sits in both A and B, SO 3 in B and C; SO 9 is in no group
+    LINE_SO = np.array([1, 1, 2, 2, 3, 9])
+    ITEM_IDS = np.array([10, 11, 10, 12, 11, 13])
+    QTY = np.array([1.0, 2.0, 4.0, -3.0, 5.0, 7.0])
+    NAMES = np.array(["Bolt", "Nut", "Bolt", "Washer", "Nut", "Pin"], dtype=object)
+    GROUPS = {"A": [1, 2], "B": [2, 3], "C": [3]}
+
+    def matrix(self, pairs, **kw):
+        return bomdiff_engine.group_matrix(self.LINE_SO, self.ITEM_IDS, self.QTY, self.GROUPS, pairs,
+                                           names=self.NAMES, **kw)
+
+    def manual_totals(self, label, absolute):
+        qty = np.abs(self.QTY) if absolute else self.QTY
+        in_group = np.isin(self.LINE_SO, self.GROUPS[label])
+        return {i: qty[in_group & (self.ITEM_IDS == i)].sum() for i in (10, 11, 12)}
+
+    def test_overlapping_groups_count_for_each(self):
+        for absolute in (True, False):
+            out = self.matrix([("A", "B"), ("B", "C")], absolute=absolute)
+            self.assertEqual(out["item_id"].tolist(), [10, 11, 12])
+            self.assertEqual(out["item_name"].tolist(), ["Bolt", "Nut", "Washer"])
+            for label in self.GROUPS:
+                totals = self.manual_totals(label, absolute)
+                self.assertEqual(out[f"qty_{label}"].tolist(), [totals[i] for i in (10, 11, 12)], label)
+            self.assertEqual(out["diff_A_minus_B"].tolist(),
+                             (out["qty_A"] - out["qty_B"]).tolist())
+            self.assertEqual(out["diff_B_minus_C"].tolist(),
+                             (out["qty_B"] - out["qty_C"]).tolist())
+
+    def test_rows_with_all_zero_diffs_dropped(self):
+        # Washer only appears in SO 2, which is in both A and B; Pin is in no group
+        out = self.matrix([("A", "B")])
+        self.assertEqual(out["item_id"].tolist(), [10, 11])
+        self.assertEqual(out["diff_A_minus_B"].tolist(), [1, -3])
+        self.assertEqual(out["qty_C"].tolist(), [0, 5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+import os, sys, threading, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bomdiff_application_gui as gui
+import so_bomdiff_application as core
+
+def _drain() -> list[tuple]:
+    events = []
+    while not gui._events.empty():
+        events.append(gui._events.get_nowait())
+    return events
+
+class RunJobTest(unittest.TestCase):
+    def setUp(self):
+        _drain()
+        self._saved = (core.REALM, core._client)
+
+    def tearDown(self):
+        core.REALM, core._client = self._saved
+
+    def test_system_exit_from_fetch_path_posts_error(self):
+        # get_client() reports a missing .env as SystemExit
+        core.REALM, core._client = None, None
+        gui.run_job(core.run_diff, [1], [2], os.devnull, {}, threading.Event())
+        events = _drain()
+        self.assertEqual([e[0] for e in events], ["error"])
+        self.assertIsInstance(events[0][1], SystemExit)
+        self.assertIn("Missing one or more values in .env", str(events[0][1]))
+
+    def test_system_exit_after_cancel_posts_cancelled(self):
+        cancel = threading.Event()
+        cancel.set()
+
+        def fn(*args, **kwargs):
+            raise SystemExit("REST Records call was denied.")
+
+        gui.run_job(fn, [1], [2], os.devnull, {}, cancel)
+        self.assertEqual([e[0] for e in _drain()], ["cancelled"])
+
+    def test_success_posts_done(self):
+        gui.run_job(lambda a, b, out: "ok", [1], [2], os.devnull, {}, threading.Event())
+        self.assertEqual(_drain(), [("done", "ok")])
+
+if __name__ == "__main__":
+    unittest.main()
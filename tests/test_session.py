@@ -0,0 +1,82 @@
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import so_bomdiff_application as core
+from bomdiff_session import DiffSession
+
+LINES = core._normalize_lines(pd.DataFrame([
+    (1, 10, "Bolt", 4), (1, 11, "Nut", 0.25),
+    (2, 10, "Bolt", 1), (2, 12, "Washer", -3), (2, None, "Freight", 1),
+    (3, 11, "Nut", 0.5), (3, 13, "Pin", 2),
+    (4, 10, "Bolt", 5), (4, 12, "Washer", 3),
+    (5, 11, "Nut", 0.1), (6, 11, "Nut", 0.2), (7, 11, "Nut", 0.3), (8, 11, "Nut", 0.7),
+], columns=core.LINE_COLUMNS))
+FOUND = set(range(1, 9))
+
+
+def _session():
+    # Pre-populated with every SO, so add() never reaches NetSuite
+    session = DiffSession(revalidate_after=float("inf"))
+    session._store(LINES, FOUND, sorted(FOUND) + [99], {})
+    return session
+
+
+def _full_compare(group_a, group_b):
+    return core.diff_lines(LINES[LINES["so_id"].isin(group_a)], LINES[LINES["so_id"].isin(group_b)])
+
+
+class DiffSessionTest(unittest.TestCase):
+
+    def assertMatchesFullCompare(self, session):
+        expected = _full_compare(session.group_a, session.group_b)
+        got = session.result()
+        self.assertEqual(got["item_id"].tolist(), expected["item_id"].tolist())
+        self.assertEqual(got["item_name"].tolist(), expected["item_name"].tolist())
+        for c in ("qty_A", "qty_B", "diff_A_minus_B"):
+            self.assertEqual(got[c].tolist(), expected[c].tolist(), c)
+
+    def test_add_remove_matches_full_compare(self):
+        session = _session()
+        self.assertEqual(session.add("A", [1, 2, 3]), [])
+        self.assertEqual(session.add("b", [4]), [])
+        self.assertMatchesFullCompare(session)
+        session.remove("A", [2])
+        self.assertMatchesFullCompare(session)
+        session.add("B", [2, 3])
+        session.remove("A", [3])
+        self.assertMatchesFullCompare(session)
+        session.set_groups([1, 4], [2])
+        self.assertEqual(session.group_a, [1, 4])
+        self.assertMatchesFullCompare(session)
+
+    def test_not_found_ids_are_not_added(self):
+        session = _session()
+        self.assertEqual(session.add("A", [1, 99]), [99])
+        self.assertEqual(session.group_a, [1])
+        self.assertEqual(session.not_found, [99])
+
+    def test_float_residue_leaves_no_rows(self):
+        session = _session()
+        session.add("A", [5, 6, 8])
+        session.remove("A", [8])
+        session.add("B", [7])
+        # 0.1 + 0.2 + 0.7 - 0.7 is not exactly 0.3; the session must still call it equal
+        self.assertNotEqual(session._totals["A"][11], session._totals["B"][11])
+        self.assertTrue(session.result().empty)
+        session.remove("A", [5, 6])
+        session.remove("B", [7])
+        self.assertEqual(session._totals, {"A": {}, "B": {}})
+        self.assertTrue(session.result().empty)
+
+    def test_unknown_group_rejected(self):
+        with self.assertRaises(ValueError):
+            _session().add("C", [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
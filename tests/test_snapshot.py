@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import so_bomdiff_application as core
+from bomdiff_snapshot import Snapshot, write_snapshot
+
+HEADERS = pd.DataFrame({"id": [30, 10, 20, 10], "tranid": ["SO30", "SO10", "SO'20", "SO10"],
+                        "last_modified": ["2024-03-01 10:00:00", "2024-01-01 09:00:00", None,
+                                          "2024-01-01 09:00:00"]})
+LINES = core._normalize_lines(pd.DataFrame([
+    (30, 12, None, 2), (10, 11, None, 1.5), (30, 11, None, -4),
+    (20, None, None, 1), (10, 10, None, 3), (99, 10, None, 8),
+], columns=core.LINE_COLUMNS))
+NAMES = {10: "Bolt", 11: "Nut", 13: None}
+
+
+class SnapshotRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "test.bomsnap")
+        write_snapshot(self.path, HEADERS, LINES, NAMES, realm="TSTDRV1", source="3 SO IDs")
+        self.snap = Snapshot(self.path)
+
+    def test_manifest(self):
+        m = self.snap.manifest
+        self.assertEqual((m["orders"], m["lines"], m["items"]), (3, 5, 2))
+        self.assertEqual((m["realm"], m["source"]), ("TSTDRV1", "3 SO IDs"))
+
+    def test_headers_for(self):
+        heads = self.snap.headers_for([20, 99, 30, 20])
+        self.assertEqual(heads["id"].tolist(), [20, 30])
+        self.assertEqual(heads["tranid"].tolist(), ["SO'20", "SO30"])
+        self.assertEqual(heads["last_modified"].tolist(), ["", "2024-03-01 10:00:00"])
+        self.assertTrue((heads["type"] == "SalesOrd").all())
+
+    def test_lines_for(self):
+        lines = self.snap.lines_for([30, 20, 10, 99])
+        # Requested order, each order's lines in their original order; SO 99 has no header
+        self.assertEqual(lines["so_id"].tolist(), [30, 30, 20, 10, 10])
+        self.assertEqual(lines["item_id"].tolist()[:2], [12, 11])
+        self.assertTrue(pd.isna(lines["item_id"].iloc[2]))
+        self.assertEqual(lines["item_id"].tolist()[3:], [11, 10])
+        self.assertEqual(lines["item_name"].isna().tolist(), [True, False, True, False, False])
+        self.assertEqual(lines["item_name"].dropna().tolist(), ["Nut", "Nut", "Bolt"])
+        self.assertEqual(lines["line_qty"].tolist(), [2.0, -4.0, 1.0, 1.5, 3.0])
+        self.assertTrue(self.snap.lines_for([]).empty)
+
+    def test_replay_matches_live_diff(self):
+        named = LINES.assign(item_name=LINES["item_id"].map(lambda i: NAMES.get(i) if pd.notna(i) else None))
+        expected = core.diff_lines(named[named["so_id"].isin([10, 30])], named[named["so_id"] == 20],
+                                   lookup_names=False)
+        got = core.compare_groups_snapshot([10, 30], [20], self.path)
+        pd.testing.assert_frame_equal(got, expected)
+
+    def test_unfinished_export_rejected(self):
+        os.remove(os.path.join(self.path, "manifest.json"))
+        with self.assertRaisesRegex(ValueError, "unfinished export"):
+            Snapshot(self.path)
+
+    def test_rewrite_replaces_snapshot(self):
+        write_snapshot(self.path, HEADERS[HEADERS["id"] == 10], LINES, NAMES)
+        snap = Snapshot(self.path)
+        self.assertEqual(snap.manifest["orders"], 1)
+        self.assertEqual(snap.lines_for([10, 30])["so_id"].tolist(), [10, 10])
+
+
+if __name__ == "__main__":
+    unittest.main()